@@ -48,6 +48,18 @@ class TaskAreaAdmin(admin.ModelAdmin):
     """
     任务区管理后台
     """
-    list_display = ('name', 'description', 'created_at')
+    list_display = ('name', 'description', 'task_area_manager', 'employees_total', 'users_total', 'created_at')
     search_fields = ('name', 'description')
     ordering = ('name',)
+
+    def get_queryset(self, request):
+        # 人员统计随列表一次查出，避免逐行查询
+        return super().get_queryset(request).with_stats()
+
+    @admin.display(description='员工数', ordering='employees_total')
+    def employees_total(self, obj):
+        return obj.employees_total
+
+    @admin.display(description='总人数', ordering='users_total')
+    def users_total(self, obj):
+        return obj.users_total
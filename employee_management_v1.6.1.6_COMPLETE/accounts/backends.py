@@ -0,0 +1,92 @@
+"""
+认证后端 - 缓存已登录用户
+
+每个请求由 get_user() 加载 request.user。这里一次查询取出用户及其任务区
+（select_related），总部负责人同时解析管辖任务区ID，与用户一起放入缓存；
+之后的请求直接从缓存读取，不再查询 users 表。
+缓存键带版本号，User 保存/删除、管辖任务区变化时由 accounts.signals 递增版本，
+任务区变化时递增全局版本。
+只有配置了多进程共享的缓存（settings 中的 REDIS_URL）时才缓存：进程内缓存（LocMemCache）
+无法跨进程失效，修改密码或停用账号后其他进程仍会在缓存有效期内接受旧会话。
+未配置共享缓存时本后端与 ModelBackend 相同（每个请求仍查询用户，只是关联了任务区）。
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError
+
+from .cache_versions import bump_versions, get_versions
+from .models import User
+from .scope import ScopeResolver, get_scope_resolver
+
+# 缓存有效期（秒），作为多进程部署时信号无法跨进程失效的兜底
+AUTH_USER_CACHE_TIMEOUT = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300)
+
+GLOBAL_VERSION_KEY = 'accounts:auth_user:version'
+
+
+def _user_version_key(user_id):
+    return f'accounts:auth_user:version:{user_id}'
+
+
+def _cache_key(user_id, versions):
+    return f'accounts:auth_user:{user_id}:{versions[0]}:{versions[1]}'
+
+
+def _versions(user_id):
+    """读取全局及用户的缓存版本号（缺失时初始化）"""
+    return get_versions([GLOBAL_VERSION_KEY, _user_version_key(user_id)])
+
+
+def invalidate_cached_user(user_ids=None):
+    """使指定用户（None 表示全部用户）的缓存失效"""
+    if user_ids is None:
+        bump_versions([GLOBAL_VERSION_KEY])
+        return
+    bump_versions([_user_version_key(user_id) for user_id in user_ids])
+
+
+def load_user(user_id):
+    """加载用户（关联任务区，总部负责人预先解析管辖任务区ID）"""
+    user = User._default_manager.select_related('task_area_fk').filter(pk=user_id).first()
+    if user is not None and user.role == User.Role.HEAD_MANAGER:
+        get_scope_resolver(user).task_area_ids
+    return user
+
+
+def is_shared_cache():
+    """默认缓存是否在进程间共享"""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def get_cached_user(user_id):
+    """从缓存读取用户，未命中时加载并写入缓存（缓存不在进程间共享时直接查询）"""
+    if not is_shared_cache():
+        return load_user(user_id)
+    key = _cache_key(user_id, _versions(user_id))
+    entry = cache.get(key)
+    if entry is None:
+        user = load_user(user_id)
+        if user is not None:
+            # 权限范围解析器不随用户序列化，单独保存已解析的管辖任务区ID
+            managed_ids = get_scope_resolver(user).managed_task_area_ids
+            cache.set(key, (user, managed_ids), AUTH_USER_CACHE_TIMEOUT)
+        return user
+    user, managed_ids = entry
+    if user.role == User.Role.HEAD_MANAGER:
+        user._scope_resolver = ScopeResolver(user, managed_ids)
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    """与 ModelBackend 相同，但 get_user() 使用缓存"""
+
+    def get_user(self, user_id):
+        try:
+            user_id = User._meta.pk.to_python(user_id)
+        except ValidationError:
+            return None
+        user = get_cached_user(user_id)
+        return user if self.user_can_authenticate(user) else None
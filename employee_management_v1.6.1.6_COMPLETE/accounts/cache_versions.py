@@ -0,0 +1,34 @@
+"""
+缓存版本号
+
+缓存键中带上相关范围的版本号，数据变化时递增版本号，旧的缓存键随之失效（等待过期淘汰），
+不需要逐个删除缓存。用于登录用户缓存（accounts.backends）、仪表盘统计（dashboard.stats）
+和报告提交情况矩阵（reports.compliance）。
+"""
+import time
+
+from django.core.cache import cache
+
+
+def new_version():
+    # 版本号缺失（如被缓存淘汰）时用时间戳初始化，避免与旧缓存键重复
+    return int(time.time() * 1000)
+
+
+def get_versions(keys):
+    """按顺序读取各版本号（缺失时初始化）"""
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(keys):
+    """递增版本号"""
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_version(), None)
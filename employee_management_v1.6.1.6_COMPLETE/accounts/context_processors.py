@@ -1,18 +1,29 @@
 """
 上下文处理器 - 用于在所有模板中提供用户权限信息
 """
+from django.utils.functional import SimpleLazyObject
+
 from .permissions import get_user_permissions, get_role_display_name
 
+
 def user_permissions(request):
     """
     为所有模板提供用户权限信息
+    惰性求值：只有模板实际使用时才计算，同一请求内多次渲染共用一份结果
     """
-    if request.user.is_authenticated:
-        return {
-            'user_permissions': get_user_permissions(request.user),
-            'user_role_display': get_role_display_name(request.user.role),
+    context = getattr(request, '_permissions_context', None)
+    if context is None:
+        def permissions():
+            return get_user_permissions(request.user)
+
+        def role_display():
+            if request.user.is_authenticated:
+                return get_role_display_name(request.user.role)
+            return ''
+
+        context = {
+            'user_permissions': SimpleLazyObject(permissions),
+            'user_role_display': SimpleLazyObject(role_display),
         }
-    return {
-        'user_permissions': {},
-        'user_role_display': '',
-    }
+        request._permissions_context = context
+    return context
@@ -0,0 +1,59 @@
+"""
+Django管理命令：批量回填用户和任务区的拼音排序键
+"""
+from django.core.management.base import BaseCommand
+
+from accounts.models import TaskArea, User, pinyin_sort_key
+
+
+class Command(BaseCommand):
+    help = '批量回填用户姓氏和任务区名称的拼音排序键（name_pinyin_key）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='每批处理的记录数（默认500）',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        updated = self.backfill(
+            TaskArea.objects.only('id', 'name', 'name_pinyin_key'),
+            lambda area: pinyin_sort_key(area.name),
+            batch_size,
+        )
+        self.stdout.write(f'任务区：更新 {updated} 条')
+
+        updated = self.backfill(
+            User.objects.only('id', 'username', 'last_name', 'name_pinyin_key'),
+            lambda user: pinyin_sort_key(user.surname_for_sorting),
+            batch_size,
+        )
+        self.stdout.write(f'用户：更新 {updated} 条')
+
+        self.stdout.write(self.style.SUCCESS('拼音排序键回填完成'))
+
+    def backfill(self, queryset, compute_key, batch_size):
+        """按主键分批读取，只写回排序键有变化的记录"""
+        model = queryset.model
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            changed = []
+            for obj in batch:
+                key = compute_key(obj)
+                if obj.name_pinyin_key != key:
+                    obj.name_pinyin_key = key
+                    changed.append(obj)
+            if changed:
+                model.objects.bulk_update(changed, ['name_pinyin_key'])
+                updated += len(changed)
+        return updated
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_alter_user_department_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskarea',
+            name='name_pinyin_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=200, verbose_name='名称拼音排序键'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='name_pinyin_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=200, verbose_name='姓氏拼音排序键'),
+        ),
+    ]
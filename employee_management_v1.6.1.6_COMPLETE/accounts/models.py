@@ -3,9 +3,16 @@
 """
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 
 
+def pinyin_sort_key(text):
+    """生成用于排序的拼音键（汉字转拼音，其他字符原样保留，统一小写）"""
+    from pypinyin import lazy_pinyin
+    return ''.join(lazy_pinyin(text or '')).lower()
+
+
 class User(AbstractUser):
     """
     自定义用户模型
@@ -117,6 +124,16 @@ class User(AbstractUser):
         verbose_name='角色'
     )
     
+    # 姓氏拼音排序键（保存时自动生成，用于数据库排序）
+    name_pinyin_key = models.CharField(
+        max_length=200,
+        blank=True,
+        default='',
+        editable=False,
+        db_index=True,
+        verbose_name='姓氏拼音排序键'
+    )
+    
     # 位置信息
     latitude = models.FloatField(
         null=True,
@@ -164,6 +181,12 @@ class User(AbstractUser):
     
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
+
+    def __getstate__(self):
+        # 已解析的权限范围只在当前对象（请求）内有效，不随缓存或会话序列化
+        state = super().__getstate__()
+        state.pop('_scope_resolver', None)
+        return state
     
     @property
     def is_superuser_role(self):
@@ -216,14 +239,13 @@ class User(AbstractUser):
             return True
         elif self.role == self.Role.HEAD_MANAGER:
             # 总部负责人可以管理其管辖任务区内的用户
-            if target_user.task_area_fk:
-                return self.managed_task_areas.filter(id=target_user.task_area_fk.id).exists()
-            return False
+            from .scope import get_scope_resolver
+            return get_scope_resolver(self).manages_task_area(target_user.task_area_fk_id)
         elif self.role == self.Role.TASK_AREA_MANAGER:
             # 任务区负责人只能管理同任务区的普通员工
-            return (target_user.role == self.Role.EMPLOYEE and 
-                    self.task_area_fk and target_user.task_area_fk and 
-                    self.task_area_fk.id == target_user.task_area_fk.id)
+            return bool(target_user.role == self.Role.EMPLOYEE and 
+                        self.task_area_fk_id and 
+                        self.task_area_fk_id == target_user.task_area_fk_id)
         return False
     
     @property
@@ -231,14 +253,54 @@ class User(AbstractUser):
         """获取任务区对象（临时兼容属性）"""
         return self.task_area_fk
     
+    @property
+    def surname_for_sorting(self):
+        """排序用姓氏：优先使用姓氏，否则使用用户名首字符"""
+        if not self.username:
+            return 'z'
+        return self.last_name or self.username[0]
+    
     def save(self, *args, **kwargs):
         # 如果是超级管理员角色，自动设置为超级用户
         if self.role == self.Role.SUPERUSER:
             self.is_superuser = True
             self.is_staff = True
+        
+        # 更新姓氏拼音排序键
+        self.name_pinyin_key = pinyin_sort_key(self.surname_for_sorting)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'last_name', 'username'}.intersection(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'name_pinyin_key'}
         super().save(*args, **kwargs)
 
 
+def _user_count_subquery(**filters):
+    """按任务区统计用户数的相关子查询（避免多个 JOIN 计数相互放大）"""
+    counts = User.objects.filter(task_area_fk=models.OuterRef('pk'), **filters).order_by().values(
+        'task_area_fk'
+    ).annotate(total=models.Count('id')).values('total')
+    return Coalesce(models.Subquery(counts), 0)
+
+
+class TaskAreaQuerySet(models.QuerySet):
+    """任务区查询集"""
+
+    def with_stats(self):
+        """
+        附带人员统计，共两次查询（与任务区数量无关）：
+        任务区查询中以子查询注解员工数和总人数；负责人（完整的 User 对象）由第二次查询批量预取。
+        列表页使用，避免逐行查询
+        """
+        return self.annotate(
+            employees_total=_user_count_subquery(role=User.Role.EMPLOYEE),
+            users_total=_user_count_subquery(),
+        ).prefetch_related(models.Prefetch(
+            'users',
+            queryset=User.objects.filter(role=User.Role.TASK_AREA_MANAGER).order_by('id'),
+            to_attr='prefetched_task_area_managers',
+        ))
+
+
 class TaskArea(models.Model):
     """
     任务区域管理
@@ -254,11 +316,23 @@ class TaskArea(models.Model):
         verbose_name='描述'
     )
     
+    # 名称拼音排序键（保存时自动生成，用于数据库排序）
+    name_pinyin_key = models.CharField(
+        max_length=200,
+        blank=True,
+        default='',
+        editable=False,
+        db_index=True,
+        verbose_name='名称拼音排序键'
+    )
+    
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='创建时间'
     )
     
+    objects = TaskAreaQuerySet.as_manager()
+    
     class Meta:
         verbose_name = '任务区'
         verbose_name_plural = '任务区'
@@ -267,17 +341,32 @@ class TaskArea(models.Model):
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        # 更新名称拼音排序键
+        self.name_pinyin_key = pinyin_sort_key(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'name_pinyin_key'}
+        super().save(*args, **kwargs)
+    
     @property
     def task_area_manager(self):
-        """获取该任务区的负责人"""
-        return self.users.filter(role=User.Role.TASK_AREA_MANAGER).first()
+        """获取该任务区的负责人（优先使用 with_stats() 预取的结果）"""
+        if hasattr(self, 'prefetched_task_area_managers'):
+            managers = self.prefetched_task_area_managers
+            return managers[0] if managers else None
+        return self.users.filter(role=User.Role.TASK_AREA_MANAGER).order_by('id').first()
     
     @property  
     def employees_count(self):
-        """获取该任务区的员工数量"""
+        """获取该任务区的员工数量（优先使用 with_stats() 注解的结果）"""
+        if hasattr(self, 'employees_total'):
+            return self.employees_total
         return self.users.filter(role=User.Role.EMPLOYEE).count()
     
     @property
     def all_users_count(self):
-        """获取该任务区的总用户数量"""
+        """获取该任务区的总用户数量（优先使用 with_stats() 注解的结果）"""
+        if hasattr(self, 'users_total'):
+            return self.users_total
         return self.users.count()
@@ -0,0 +1,157 @@
+"""
+键集（seek）分页
+
+按复合排序键定位下一页，而不是使用 OFFSET，翻到第 N 页的代价与 N 无关。
+游标是签名后的不透明字符串，记录当前页边界行的排序键值和翻页方向。
+排序键必须唯一且非空（通常以主键作为最后一个排序键）。
+"""
+import datetime
+import json
+
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+
+CURSOR_SALT = 'accounts.pagination.cursor'
+
+NEXT = 'n'
+PREVIOUS = 'p'
+LAST = 'last'
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """保留完整微秒精度的日期时间编码（DjangoJSONEncoder 会截断到毫秒）"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorSerializer:
+    """游标序列化（支持日期时间等类型）"""
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'), cls=CursorEncoder).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+
+class KeysetPage:
+    """键集分页的一页数据"""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    键集分页器
+    ordering 与 QuerySet.order_by 的参数相同：字段名（'-' 前缀表示降序）、
+    查询表达式或 expression.desc()
+    """
+
+    def __init__(self, queryset, ordering, per_page=20):
+        self.per_page = per_page
+        self.keys = []
+        annotations = {}
+        for index, item in enumerate(ordering):
+            alias = f'_keyset_{index}'
+            if isinstance(item, str):
+                descending = item.startswith('-')
+                expression = F(item.lstrip('-'))
+            elif isinstance(item, OrderBy):
+                descending = item.descending
+                expression = item.expression
+            else:
+                descending = False
+                expression = item
+            annotations[alias] = expression
+            self.keys.append((alias, descending))
+        self.queryset = queryset.annotate(**annotations)
+
+    def _ordered(self, reverse=False):
+        return self.queryset.order_by(*[
+            f'-{alias}' if descending != reverse else alias
+            for alias, descending in self.keys
+        ])
+
+    def _seek(self, values, reverse=False):
+        """构造"排在 values 之后"的条件：(k0 > v0) OR (k0 = v0 AND k1 > v1) OR ..."""
+        condition = Q()
+        equal_so_far = Q()
+        for (alias, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal_so_far & Q(**{f'{alias}__{lookup}': value})
+            equal_so_far &= Q(**{alias: value})
+        return condition
+
+    def _cursor(self, obj, direction):
+        values = [getattr(obj, alias) for alias, _ in self.keys]
+        return signing.dumps(
+            {'d': direction, 'v': values},
+            salt=CURSOR_SALT,
+            serializer=CursorSerializer,
+            compress=True,
+        )
+
+    def decode_cursor(self, cursor):
+        """解析游标，无效游标视为第一页"""
+        if not cursor:
+            return NEXT, None
+        if cursor == LAST:
+            return PREVIOUS, None
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT, serializer=CursorSerializer)
+            direction, values = data['d'], data['v']
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            return NEXT, None
+        if direction not in (NEXT, PREVIOUS) or len(values) != len(self.keys):
+            return NEXT, None
+        return direction, values
+
+    def get_page(self, cursor=None):
+        """获取游标指向的一页，只执行一次查询"""
+        direction, values = self.decode_cursor(cursor)
+        reverse = direction == PREVIOUS
+
+        queryset = self._ordered(reverse)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, reverse))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if reverse:
+            rows.reverse()
+            has_next = values is not None
+            has_previous = has_more
+        else:
+            has_next = has_more
+            has_previous = values is not None
+
+        return KeysetPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self._cursor(rows[-1], NEXT) if has_next and rows else None,
+            previous_cursor=self._cursor(rows[0], PREVIOUS) if has_previous and rows else None,
+        )
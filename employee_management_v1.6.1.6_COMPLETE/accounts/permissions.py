@@ -72,56 +72,71 @@ class PermissionMixin:
         
         return super().dispatch(request, *args, **kwargs)
 
-def get_user_permissions(user):
-    """获取用户的权限信息"""
-    if not user.is_authenticated:
-        return {
-            'can_view_dashboard': False,
-            'can_apply_leave': False,
-            'can_approve_leave': False,
-            'can_view_reports': False,
-            'can_manage_employees': False,
-            'can_view_location': False,
-            'can_send_alerts': False,
-            'can_manage_system': False,
-        }
-    
+# 未登录用户的权限
+ANONYMOUS_PERMISSIONS = {
+    'can_view_dashboard': False,
+    'can_apply_leave': False,
+    'can_approve_leave': False,
+    'can_view_reports': False,
+    'can_manage_employees': False,
+    'can_view_location': False,
+    'can_send_alerts': False,
+    'can_manage_system': False,
+}
+
+
+def _build_role_permissions():
+    """按角色预先计算权限表（权限只与角色有关）"""
     # 基础权限（所有用户）
-    permissions = {
+    base = {
         'can_view_dashboard': True,
-        'can_apply_leave': user.needs_leave_approval,  # 使用模型中的方法
+        'can_apply_leave': False,
         'can_approve_leave': False,
         'can_view_reports': False,
         'can_manage_employees': False,
         'can_view_location': False,
-        'can_update_location': user.role in ['employee', 'task_area_manager'],  # 只有员工和任务区负责人需要更新位置
+        'can_update_location': False,
         'can_send_alerts': False,
         'can_manage_system': False,
     }
-    
     # 任务区负责人权限
-    if user.role in ['task_area_manager', 'head_manager', 'superuser']:
-        permissions.update({
-            'can_approve_leave': True,
-            'can_view_reports': True,
-            'can_view_location': True,
-        })
-    
+    manager = {
+        'can_approve_leave': True,
+        'can_view_reports': True,
+        'can_view_location': True,
+    }
     # 总部负责人权限
-    if user.role in ['head_manager', 'superuser']:
-        permissions.update({
-            'can_manage_employees': True,
-            'can_send_alerts': True,
-        })
-    
+    head = {
+        'can_manage_employees': True,
+        'can_send_alerts': True,
+    }
     # 超级管理员权限
-    if user.role == 'superuser':
-        permissions.update({
-            'can_manage_system': True,
-            'can_manage_all_data': True,
-        })
-    
-    return permissions
+    admin = {
+        'can_manage_system': True,
+        'can_manage_all_data': True,
+    }
+    # 只有员工和任务区负责人需要请假审批、更新位置
+    field_staff = {
+        'can_apply_leave': True,
+        'can_update_location': True,
+    }
+    return {
+        ROLES['EMPLOYEE']: {**base, **field_staff},
+        ROLES['TASK_AREA_MANAGER']: {**base, **field_staff, **manager},
+        ROLES['HEAD_MANAGER']: {**base, **manager, **head},
+        ROLES['SUPERUSER']: {**base, **manager, **head, **admin},
+        None: base,
+    }
+
+
+ROLE_PERMISSIONS = _build_role_permissions()
+
+
+def get_user_permissions(user):
+    """获取用户的权限信息（返回副本，可以安全修改）"""
+    if not user.is_authenticated:
+        return dict(ANONYMOUS_PERMISSIONS)
+    return dict(ROLE_PERMISSIONS.get(user.role, ROLE_PERMISSIONS[None]))
 
 def get_role_display_name(role):
     """获取角色显示名称"""
@@ -178,4 +193,19 @@ def filter_users_by_task_area_permission(queryset, current_user):
             return queryset.filter(task_area_fk=current_user.task_area_fk)
         return queryset.none()
     else:
-        return queryset.filter(id=current_user.id)
\ No newline at end of file
+        return queryset.filter(id=current_user.id)
+
+def split_by_permission(queryset, permission_q):
+    """
+    按权限条件拆分查询集（用于批量操作）
+    返回 (允许的查询集, 被拒绝的ID集合)，无论对象数量多少只执行一次查询
+    """
+    flags = queryset.annotate(
+        permitted=models.Case(
+            models.When(permission_q, then=models.Value(True)),
+            default=models.Value(False),
+            output_field=models.BooleanField(),
+        )
+    ).values_list('id', 'permitted')
+    denied_ids = {obj_id for obj_id, permitted in flags if not permitted}
+    return queryset.filter(permission_q), denied_ids
@@ -0,0 +1,99 @@
+"""
+请求级权限范围解析
+
+每个请求只查询一次用户可访问的任务区ID，之后的权限判断都是集合成员测试。
+解析结果缓存在用户对象上，生命周期与用户对象相同：request.user 每个请求重新加载
+（登录用户缓存中取出的也是反序列化的新对象，User 序列化时不包含解析器），
+因此解析结果最多在一个请求内有效，不需要跨进程失效。
+同一用户对象的管辖任务区（managed_task_areas）变化时由 accounts.signals 调用 reset_scope。
+"""
+from django.db.models import Q
+
+
+def reset_scope(user):
+    """丢弃用户对象上已解析的权限范围"""
+    user.__dict__.pop('_scope_resolver', None)
+
+
+class ScopeResolver:
+    """
+    用户权限范围
+    超级管理员为全局范围；总部负责人为其管辖任务区；
+    任务区负责人和普通员工为其所属任务区
+    """
+
+    def __init__(self, user, managed_task_area_ids=None):
+        self.user = user
+        # 可以传入已知的管辖任务区ID（如登录用户缓存中保存的），不再查询
+        self._task_area_ids = frozenset(managed_task_area_ids) if managed_task_area_ids is not None else None
+
+    @property
+    def is_global(self):
+        return self.user.role == self.user.Role.SUPERUSER
+
+    @property
+    def is_unassigned(self):
+        """未分配任务区的任务区负责人，范围为同样未分配任务区的用户（与统计口径一致）"""
+        return self.user.role == self.user.Role.TASK_AREA_MANAGER and not self.user.task_area_fk_id
+
+    @property
+    def task_area_ids(self):
+        """可访问的任务区ID集合（超级管理员返回空集合，应先判断 is_global）"""
+        user = self.user
+        if user.role == user.Role.HEAD_MANAGER:
+            # 只有管辖任务区需要查询数据库，结果在请求内缓存
+            if self._task_area_ids is None:
+                self._task_area_ids = frozenset(user.managed_task_areas.values_list('id', flat=True))
+            return self._task_area_ids
+        if user.role in (user.Role.TASK_AREA_MANAGER, user.Role.EMPLOYEE) and user.task_area_fk_id:
+            return frozenset([user.task_area_fk_id])
+        return frozenset()
+
+    @property
+    def managed_task_area_ids(self):
+        """总部负责人管辖的任务区ID集合"""
+        if self.user.role != self.user.Role.HEAD_MANAGER:
+            return frozenset()
+        return self.task_area_ids
+
+    def can_access_task_area(self, task_area_id):
+        """是否可以访问指定任务区"""
+        if self.is_global:
+            return True
+        if task_area_id is None:
+            return self.is_unassigned
+        return task_area_id in self.task_area_ids
+
+    def manages_task_area(self, task_area_id):
+        """总部负责人是否管辖指定任务区"""
+        return task_area_id is not None and task_area_id in self.managed_task_area_ids
+
+    def filter_q(self, task_area_field, owner_field=None):
+        """
+        构造按权限范围过滤的查询条件
+        task_area_field: 对象所属任务区ID的查找路径（如 'applicant__task_area_fk_id'）
+        owner_field: 对象所有者ID的查找路径，指定时本人的对象总是可见
+        普通员工没有任务区范围，只能看到自己的对象；
+        未分配任务区的任务区负责人可以看到任务区为空的对象
+        """
+        user = self.user
+        if self.is_global:
+            return Q(pk__isnull=False)
+        if self.is_unassigned:
+            condition = Q(**{f'{task_area_field}__isnull': True})
+        elif user.role in (user.Role.TASK_AREA_MANAGER, user.Role.HEAD_MANAGER) and self.task_area_ids:
+            condition = Q(**{f'{task_area_field}__in': self.task_area_ids})
+        else:
+            condition = Q(pk__in=[])
+        if owner_field:
+            condition |= Q(**{owner_field: user.pk})
+        return condition
+
+
+def get_scope_resolver(user):
+    """获取（并缓存在用户对象上的）权限范围解析器"""
+    resolver = getattr(user, '_scope_resolver', None)
+    if resolver is None:
+        resolver = ScopeResolver(user)
+        user._scope_resolver = resolver
+    return resolver
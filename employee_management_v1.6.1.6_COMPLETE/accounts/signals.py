@@ -0,0 +1,39 @@
+"""
+accounts 信号处理
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_cached_user
+from .models import TaskArea, User
+from .scope import reset_scope
+
+
+@receiver(m2m_changed, sender=User.managed_task_areas.through)
+def managed_task_areas_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """管辖任务区变化时使相关用户的权限范围缓存失效"""
+    if not action.startswith('post_'):
+        return
+    # 其他用户对象上的解析结果最多在当前请求内有效，之后的请求重新加载用户（缓存版本号已递增）
+    if not reverse:
+        reset_scope(instance)
+        invalidate_cached_user([instance.pk])
+    elif pk_set:
+        invalidate_cached_user(pk_set)
+    else:
+        # 从任务区一侧 clear() 时无法得知涉及哪些用户
+        invalidate_cached_user()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """用户保存或删除时使登录用户缓存失效"""
+    invalidate_cached_user([instance.pk])
+
+
+@receiver(post_save, sender=TaskArea)
+@receiver(post_delete, sender=TaskArea)
+def task_area_changed(sender, instance, **kwargs):
+    """任务区变化时缓存中用户关联的任务区可能过期，全部失效"""
+    invalidate_cached_user()
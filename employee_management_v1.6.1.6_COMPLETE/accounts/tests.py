@@ -0,0 +1,45 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import TaskArea, User
+from .pagination import LAST, KeysetPaginator
+
+
+class KeysetPaginatorTests(TestCase):
+
+    def setUp(self):
+        # 相同的创建时间，由 ID 决定顺序
+        created_at = timezone.now()
+        for index in range(7):
+            user = User.objects.create_user(username=f'user{index}')
+            User.objects.filter(pk=user.pk).update(created_at=created_at if index % 2 else timezone.now())
+        self.expected = list(User.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.paginator = KeysetPaginator(User.objects.all(), ['-created_at', '-id'], per_page=3)
+
+    def ids(self, page):
+        return [user.id for user in page]
+
+    def test_forward_then_back(self):
+        pages = [self.paginator.get_page()]
+        while pages[-1].has_next:
+            pages.append(self.paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([user_id for page in pages for user_id in self.ids(page)], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous)
+
+        page = pages[-1]
+        backward = [self.ids(page)]
+        while page.has_previous:
+            page = self.paginator.get_page(page.previous_cursor)
+            backward.append(self.ids(page))
+        self.assertEqual(backward, [self.ids(page) for page in reversed(pages)])
+
+    def test_last_page(self):
+        page = self.paginator.get_page(LAST)
+        self.assertEqual(self.ids(page), self.expected[-3:])
+        self.assertFalse(page.has_next)
+        self.assertEqual(self.ids(self.paginator.get_page(page.previous_cursor)), self.expected[1:4])
+
+    def test_invalid_cursor_is_first_page(self):
+        self.assertEqual(self.ids(self.paginator.get_page('tampered')), self.expected[:3])
+
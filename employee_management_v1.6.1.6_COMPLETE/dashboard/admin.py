@@ -1,3 +1,7 @@
 from django.contrib import admin
+from .models import DashboardSnapshot
 
-# dashboard 应用不需要特定的 admin 配置
+@admin.register(DashboardSnapshot)
+class DashboardSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('task_area', 'employee_count', 'active_users', 'leave_pending_task_area', 'leave_pending_head', 'updated_at')
+    list_select_related = ('task_area',)
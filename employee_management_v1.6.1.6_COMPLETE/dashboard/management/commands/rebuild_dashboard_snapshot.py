@@ -0,0 +1,38 @@
+"""
+Django管理命令：重建仪表盘统计快照并检查偏差
+"""
+from django.core.management.base import BaseCommand
+
+from dashboard import stats
+from dashboard.models import DashboardSnapshot
+
+
+class Command(BaseCommand):
+    help = '从用户和请假数据重建仪表盘统计快照，并报告快照与实际数据的偏差'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='只检查偏差，不重建快照',
+        )
+
+    def handle(self, *args, **options):
+        counts = DashboardSnapshot.compute_counts()
+        drift = DashboardSnapshot.find_drift(counts)
+
+        if drift:
+            self.stdout.write(self.style.WARNING(f'发现 {len(drift)} 处偏差：'))
+            for area_id, field, stored, expected in sorted(drift, key=lambda d: (d[0] or 0, d[1])):
+                area_label = area_id if area_id is not None else '未分配'
+                self.stdout.write(f'  任务区 {area_label} {field}: 快照 {stored}，实际 {expected}')
+        else:
+            self.stdout.write(self.style.SUCCESS('快照与实际数据一致'))
+
+        if options['verify']:
+            return
+
+        rows = DashboardSnapshot.rebuild(counts)
+        stats.invalidate_user_stats()
+        stats.invalidate_leave_stats(area_id for area_id in counts)
+        self.stdout.write(self.style.SUCCESS(f'已重建 {rows} 行统计快照'))
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_snapshots(apps, schema_editor):
+    """根据现有用户和请假数据生成初始快照"""
+    User = apps.get_model('accounts', 'User')
+    LeaveApplication = apps.get_model('leave_management', 'LeaveApplication')
+    DashboardSnapshot = apps.get_model('dashboard', 'DashboardSnapshot')
+
+    counts = {}
+    for user in User.objects.values('task_area_fk_id', 'role', 'is_active').iterator():
+        row = counts.setdefault(user['task_area_fk_id'], {})
+        role_field = f"{user['role']}_count"
+        row[role_field] = row.get(role_field, 0) + 1
+        if user['is_active']:
+            row['active_users'] = row.get('active_users', 0) + 1
+            if user['role'] == 'employee':
+                row['active_employees'] = row.get('active_employees', 0) + 1
+
+    leave_rows = LeaveApplication.objects.order_by().values(
+        'applicant__task_area_fk_id', 'status'
+    ).annotate(count=models.Count('id'))
+    for item in leave_rows:
+        row = counts.setdefault(item['applicant__task_area_fk_id'], {})
+        row[f"leave_{item['status']}"] = item['count']
+
+    field_names = {field.name for field in DashboardSnapshot._meta.get_fields()}
+    DashboardSnapshot.objects.bulk_create([
+        DashboardSnapshot(
+            task_area_id=area_id,
+            **{field: value for field, value in row.items() if field in field_names}
+        )
+        for area_id, row in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0007_alter_user_department_rank'),
+        ('leave_management', '0002_update_leave_management_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('superuser_count', models.IntegerField(default=0, verbose_name='超级管理员数')),
+                ('head_manager_count', models.IntegerField(default=0, verbose_name='总部负责人数')),
+                ('task_area_manager_count', models.IntegerField(default=0, verbose_name='任务区负责人数')),
+                ('employee_count', models.IntegerField(default=0, verbose_name='普通员工数')),
+                ('active_users', models.IntegerField(default=0, verbose_name='活跃用户数')),
+                ('active_employees', models.IntegerField(default=0, verbose_name='活跃员工数')),
+                ('leave_draft', models.IntegerField(default=0, verbose_name='草稿')),
+                ('leave_pending_task_area', models.IntegerField(default=0, verbose_name='待任务区负责人审批')),
+                ('leave_pending_head', models.IntegerField(default=0, verbose_name='待总部负责人审批')),
+                ('leave_approved', models.IntegerField(default=0, verbose_name='已批准')),
+                ('leave_rejected', models.IntegerField(default=0, verbose_name='已拒绝')),
+                ('leave_cancelled', models.IntegerField(default=0, verbose_name='已取消')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('task_area', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_snapshot', to='accounts.taskarea', verbose_name='任务区')),
+            ],
+            options={
+                'verbose_name': '仪表盘统计快照',
+                'verbose_name_plural': '仪表盘统计快照',
+                'db_table': 'dashboard_snapshots',
+            },
+        ),
+        migrations.RunPython(build_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:15
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+def merge_and_create_rows(apps, schema_editor):
+    """合并并发创建的重复行（同一任务区的计数相加），并为每个任务区及未分配任务区建立快照行"""
+    DashboardSnapshot = apps.get_model('dashboard', 'DashboardSnapshot')
+    TaskArea = apps.get_model('accounts', 'TaskArea')
+
+    counter_fields = [
+        field.name for field in DashboardSnapshot._meta.get_fields()
+        if isinstance(field, models.IntegerField) and not field.primary_key
+    ]
+    kept = {}
+    for snapshot in DashboardSnapshot.objects.order_by('id'):
+        first = kept.setdefault(snapshot.task_area_id, snapshot)
+        if first is snapshot:
+            continue
+        for field in counter_fields:
+            setattr(first, field, getattr(first, field) + getattr(snapshot, field))
+        first.save(update_fields=counter_fields)
+        snapshot.delete()
+
+    missing = (set(TaskArea.objects.values_list('id', flat=True)) | {None}) - set(kept)
+    DashboardSnapshot.objects.bulk_create([DashboardSnapshot(task_area_id=area_id) for area_id in missing])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_and_create_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dashboardsnapshot',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('task_area', 0), name='dashboard_snapshot_area_unique'),
+        ),
+    ]
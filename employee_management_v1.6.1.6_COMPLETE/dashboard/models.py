@@ -1,6 +1,162 @@
 """
 dashboard 应用模型
 """
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
-# 仪表盘主要显示数据，不需要特定模型
+from accounts.models import TaskArea, User
+from leave_management.models import LeaveApplication
+
+
+ROLE_FIELDS = {role: f'{role}_count' for role in User.Role.values}
+LEAVE_STATUS_FIELDS = {status: f'leave_{status}' for status in LeaveApplication.Status.values}
+
+
+def user_counter_fields(role, is_active):
+    """单个用户对计数器的贡献"""
+    fields = {'active_users': 1 if is_active else 0}
+    if role in ROLE_FIELDS:
+        fields[ROLE_FIELDS[role]] = 1
+    if role == User.Role.EMPLOYEE and is_active:
+        fields['active_employees'] = 1
+    return fields
+
+
+class DashboardSnapshot(models.Model):
+    """
+    仪表盘统计快照
+    按任务区汇总用户和请假计数，由 dashboard.signals 增量维护；
+    task_area 为空的一行汇总未分配任务区的用户（唯一约束保证只有一行）。
+    每个任务区的行在任务区创建时建立，增量更新只需 UPDATE
+    """
+    task_area = models.OneToOneField(
+        'accounts.TaskArea',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='dashboard_snapshot',
+        verbose_name='任务区'
+    )
+
+    # 用户统计
+    superuser_count = models.IntegerField(default=0, verbose_name='超级管理员数')
+    head_manager_count = models.IntegerField(default=0, verbose_name='总部负责人数')
+    task_area_manager_count = models.IntegerField(default=0, verbose_name='任务区负责人数')
+    employee_count = models.IntegerField(default=0, verbose_name='普通员工数')
+    active_users = models.IntegerField(default=0, verbose_name='活跃用户数')
+    active_employees = models.IntegerField(default=0, verbose_name='活跃员工数')
+
+    # 请假统计（按状态）
+    leave_draft = models.IntegerField(default=0, verbose_name='草稿')
+    leave_pending_task_area = models.IntegerField(default=0, verbose_name='待任务区负责人审批')
+    leave_pending_head = models.IntegerField(default=0, verbose_name='待总部负责人审批')
+    leave_approved = models.IntegerField(default=0, verbose_name='已批准')
+    leave_rejected = models.IntegerField(default=0, verbose_name='已拒绝')
+    leave_cancelled = models.IntegerField(default=0, verbose_name='已取消')
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '仪表盘统计快照'
+        verbose_name_plural = '仪表盘统计快照'
+        db_table = 'dashboard_snapshots'
+        constraints = [
+            # 任务区ID从1开始，0 代表未分配任务区的行（NULL 不受 OneToOne 唯一约束限制）
+            models.UniqueConstraint(Coalesce('task_area', 0), name='dashboard_snapshot_area_unique'),
+        ]
+
+    COUNTER_FIELDS = [
+        'superuser_count', 'head_manager_count', 'task_area_manager_count', 'employee_count',
+        'active_users', 'active_employees',
+        'leave_draft', 'leave_pending_task_area', 'leave_pending_head',
+        'leave_approved', 'leave_rejected', 'leave_cancelled',
+    ]
+
+    def __str__(self):
+        return f"{self.task_area.name if self.task_area else '未分配任务区'} 统计快照"
+
+    @property
+    def total_users(self):
+        return sum(getattr(self, field) for field in ROLE_FIELDS.values())
+
+    @classmethod
+    def apply_delta(cls, task_area_id, deltas):
+        """增量更新某任务区的计数器，deltas 为 {字段: 增量}"""
+        deltas = {field: value for field, value in deltas.items() if value}
+        if not deltas:
+            return
+        updates = {field: F(field) + value for field, value in deltas.items()}
+        updates['updated_at'] = timezone.now()
+        with transaction.atomic():
+            if cls.objects.filter(task_area_id=task_area_id).update(**updates):
+                return
+            # 行不存在时才创建（如重建前的旧数据），并发创建时唯一约束使后到者重新更新
+            try:
+                with transaction.atomic():
+                    cls.objects.create(task_area_id=task_area_id, **deltas)
+            except IntegrityError:
+                cls.objects.filter(task_area_id=task_area_id).update(**updates)
+
+    @classmethod
+    def compute_counts(cls):
+        """
+        从源数据重新计算全部计数
+        返回 {任务区ID: {字段: 计数}}，只执行两次分组聚合查询
+        """
+        counts = {}
+
+        def row(area_id):
+            return counts.setdefault(area_id, {field: 0 for field in cls.COUNTER_FIELDS})
+
+        user_aggregates = {
+            field: Count('id', filter=Q(role=role)) for role, field in ROLE_FIELDS.items()
+        }
+        user_aggregates['active_users'] = Count('id', filter=Q(is_active=True))
+        user_aggregates['active_employees'] = Count(
+            'id', filter=Q(role=User.Role.EMPLOYEE, is_active=True)
+        )
+        for item in User.objects.order_by().values('task_area_fk_id').annotate(**user_aggregates):
+            row(item.pop('task_area_fk_id')).update(item)
+
+        leave_rows = LeaveApplication.objects.order_by().values(
+            'applicant__task_area_fk_id', 'status'
+        ).annotate(count=Count('id'))
+        for item in leave_rows:
+            field = LEAVE_STATUS_FIELDS.get(item['status'])
+            if field:
+                row(item['applicant__task_area_fk_id'])[field] = item['count']
+
+        return counts
+
+    @classmethod
+    def find_drift(cls, counts=None):
+        """比较快照与源数据，返回 [(任务区ID, 字段, 快照值, 实际值)]"""
+        if counts is None:
+            counts = cls.compute_counts()
+        stored = {
+            item.pop('task_area_id'): item
+            for item in cls.objects.values('task_area_id', *cls.COUNTER_FIELDS)
+        }
+        drift = []
+        for area_id in set(counts) | set(stored):
+            expected = counts.get(area_id, {})
+            actual = stored.get(area_id, {})
+            for field in cls.COUNTER_FIELDS:
+                if expected.get(field, 0) != actual.get(field, 0):
+                    drift.append((area_id, field, actual.get(field, 0), expected.get(field, 0)))
+        return drift
+
+    @classmethod
+    def rebuild(cls, counts=None):
+        """从源数据完整重建快照表（每个任务区及未分配任务区各一行，没有数据的行计数为0）"""
+        if counts is None:
+            counts = cls.compute_counts()
+        area_ids = set(counts) | set(TaskArea.objects.values_list('id', flat=True)) | {None}
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([
+                cls(task_area_id=area_id, **counts.get(area_id, {})) for area_id in area_ids
+            ])
+        return len(area_ids)
@@ -0,0 +1,150 @@
+"""
+dashboard 信号处理 - 维护仪表盘统计快照和统计缓存
+"""
+from collections import Counter
+
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import TaskArea, User
+from leave_management.models import LeaveApplication
+
+from . import stats
+from .models import DashboardSnapshot, LEAVE_STATUS_FIELDS, user_counter_fields
+
+USER_TRACKED_FIELDS = {'task_area_fk', 'role', 'is_active'}
+
+
+def _negate(fields):
+    return {field: -value for field, value in fields.items()}
+
+
+def _applicant_task_area_id(application):
+    try:
+        return application.applicant.task_area_fk_id
+    except User.DoesNotExist:
+        return None
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_user_state(sender, instance, update_fields=None, **kwargs):
+    """记录保存前的任务区、角色和状态，用于计算快照增量"""
+    instance._previous_state = None
+    if not instance.pk:
+        return
+    if update_fields is not None and not USER_TRACKED_FIELDS.intersection(update_fields):
+        return
+    instance._previous_state = User.objects.filter(pk=instance.pk).values(
+        'task_area_fk_id', 'role', 'is_active'
+    ).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    previous = getattr(instance, '_previous_state', None)
+
+    if created:
+        DashboardSnapshot.apply_delta(
+            instance.task_area_fk_id, user_counter_fields(instance.role, instance.is_active)
+        )
+    elif previous is not None:
+        # 只有实际写入数据库的字段才计入增量
+        current = {
+            'task_area_fk_id': instance.task_area_fk_id,
+            'role': instance.role,
+            'is_active': instance.is_active,
+        }
+        if update_fields is not None:
+            for field in USER_TRACKED_FIELDS - set(update_fields):
+                key = 'task_area_fk_id' if field == 'task_area_fk' else field
+                current[key] = previous[key]
+
+        old_area_id = previous['task_area_fk_id']
+        new_area_id = current['task_area_fk_id']
+        new_fields = user_counter_fields(current['role'], current['is_active'])
+        old_fields = user_counter_fields(previous['role'], previous['is_active'])
+        if old_area_id == new_area_id:
+            delta = Counter(new_fields)
+            delta.subtract(old_fields)
+            DashboardSnapshot.apply_delta(new_area_id, delta)
+        else:
+            # 任务区变更：用户计数及其请假计数一并迁移
+            moved = {
+                LEAVE_STATUS_FIELDS[item['status']]: item['count']
+                for item in instance.leave_applications.order_by().values('status').annotate(
+                    count=Count('id')
+                )
+                if item['status'] in LEAVE_STATUS_FIELDS
+            }
+            DashboardSnapshot.apply_delta(old_area_id, _negate({**old_fields, **moved}))
+            DashboardSnapshot.apply_delta(new_area_id, {**new_fields, **moved})
+            stats.invalidate_leave_stats([old_area_id, new_area_id])
+
+    # 登录时只更新 last_login，不影响计数（最近登录列表等缓存过期后刷新）
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    stats.invalidate_user_stats()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    DashboardSnapshot.apply_delta(
+        instance.task_area_fk_id, _negate(user_counter_fields(instance.role, instance.is_active))
+    )
+    stats.invalidate_user_stats()
+    stats.invalidate_leave_stats([instance.task_area_fk_id])
+
+
+@receiver(pre_save, sender=LeaveApplication)
+def remember_previous_leave_status(sender, instance, **kwargs):
+    """记录保存前的审批状态，用于计算状态流转的增量"""
+    instance._previous_status = None
+    if instance.pk:
+        instance._previous_status = LeaveApplication.objects.filter(
+            pk=instance.pk
+        ).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=LeaveApplication)
+def leave_application_saved(sender, instance, created, **kwargs):
+    previous_status = getattr(instance, '_previous_status', None)
+    if previous_status == instance.status:
+        return
+
+    delta = Counter()
+    if previous_status in LEAVE_STATUS_FIELDS:
+        delta[LEAVE_STATUS_FIELDS[previous_status]] -= 1
+    if instance.status in LEAVE_STATUS_FIELDS:
+        delta[LEAVE_STATUS_FIELDS[instance.status]] += 1
+
+    area_id = _applicant_task_area_id(instance)
+    DashboardSnapshot.apply_delta(area_id, delta)
+    stats.invalidate_leave_stats([area_id])
+
+
+@receiver(post_delete, sender=LeaveApplication)
+def leave_application_deleted(sender, instance, **kwargs):
+    area_id = _applicant_task_area_id(instance)
+    if instance.status in LEAVE_STATUS_FIELDS:
+        DashboardSnapshot.apply_delta(area_id, {LEAVE_STATUS_FIELDS[instance.status]: -1})
+    stats.invalidate_leave_stats([area_id])
+
+
+@receiver(post_save, sender=TaskArea)
+def task_area_saved(sender, instance, created, **kwargs):
+    """新任务区预先建立快照行，之后的增量更新不会并发创建"""
+    if created:
+        DashboardSnapshot.objects.get_or_create(task_area=instance)
+
+
+@receiver(pre_delete, sender=TaskArea)
+def merge_deleted_task_area(sender, instance, **kwargs):
+    """删除任务区时用户会被置空任务区，先把该任务区的计数并入未分配行"""
+    snapshot = DashboardSnapshot.objects.filter(task_area=instance).values(
+        *DashboardSnapshot.COUNTER_FIELDS
+    ).first()
+    if snapshot:
+        DashboardSnapshot.apply_delta(None, snapshot)
+    stats.invalidate_user_stats()
+    stats.invalidate_leave_stats([instance.pk])
@@ -0,0 +1,161 @@
+"""
+仪表盘统计引擎
+
+计数来自按任务区汇总的 DashboardSnapshot 快照表，读取代价只与任务区数量相关；
+结果按统计范围（全局 / 单个任务区 / 总部负责人管辖的任务区集合）缓存。
+快照维护和缓存失效由 dashboard.signals 中的 post_save / post_delete 信号驱动。
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from accounts.cache_versions import bump_versions, get_versions
+from accounts.models import User
+from accounts.permissions import ROLES
+from accounts.scope import get_scope_resolver
+
+from .models import DashboardSnapshot
+
+# 缓存有效期（秒），作为多进程部署时信号无法跨进程失效的兜底
+STATS_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_STATS_CACHE_TIMEOUT', 300)
+
+USER_STATS_KEY = 'dashboard:stats:users'
+GLOBAL_VERSION_KEY = 'dashboard:stats:version:global'
+
+LEAVE_FIELDS = [
+    'leave_draft', 'leave_pending_task_area', 'leave_pending_head',
+    'leave_approved', 'leave_rejected', 'leave_cancelled',
+]
+
+
+def _area_version_key(area_id):
+    return f'dashboard:stats:version:area:{area_id}'
+
+
+def get_leave_scope(user):
+    """
+    获取用户的请假统计范围
+    返回 None 表示全局，否则返回排序后的任务区ID元组
+    未分配任务区的任务区负责人统计同样未分配任务区的申请人，范围为 (None,)
+    """
+    if user.role == ROLES['TASK_AREA_MANAGER']:
+        return (user.task_area_fk_id,)
+    elif user.role == ROLES['HEAD_MANAGER']:
+        return tuple(sorted(get_scope_resolver(user).managed_task_area_ids))
+    return None
+
+
+def _scope_versions(scope):
+    """读取统计范围内各任务区的缓存版本号（缺失时初始化）"""
+    if scope is None:
+        keys = [GLOBAL_VERSION_KEY]
+    else:
+        keys = [_area_version_key(area_id) for area_id in scope]
+
+    return get_versions(keys)
+
+
+def _leave_stats_key(scope):
+    if scope is None:
+        label = 'global'
+    else:
+        label = ','.join(str(area_id) for area_id in scope)
+    versions = ','.join(str(v) for v in _scope_versions(scope))
+    digest = hashlib.md5(f'{label}|{versions}'.encode()).hexdigest()
+    return f'dashboard:stats:leave:{digest}'
+
+
+def _sum_snapshots(queryset, fields):
+    """对快照行求和，一次聚合查询"""
+    return queryset.aggregate(**{field: Coalesce(Sum(field), 0) for field in fields})
+
+
+def get_user_stats():
+    """
+    获取用户统计（全局）
+    总数、活跃数及各角色人数由快照表汇总得到
+    """
+    stats = cache.get(USER_STATS_KEY)
+    if stats is not None:
+        return stats
+
+    counts = _sum_snapshots(DashboardSnapshot.objects.all(), [
+        'superuser_count', 'head_manager_count', 'task_area_manager_count',
+        'employee_count', 'active_users', 'active_employees',
+    ])
+    user_stats = {
+        'superuser': counts['superuser_count'],
+        'head_manager': counts['head_manager_count'],
+        'task_area_manager': counts['task_area_manager_count'],
+        'employee': counts['employee_count'],
+    }
+
+    stats = {
+        'total_users': sum(user_stats.values()),
+        'active_users': counts['active_users'],
+        'user_stats': user_stats,
+        'team_overview': {
+            'total_members': counts['employee_count'],
+            'active_members': counts['active_employees'],
+        },
+        'recent_logins': list(
+            User.objects.filter(last_login__isnull=False).order_by('-last_login')[:5]
+        ),
+        'task_area_stats': list(
+            DashboardSnapshot.objects.filter(task_area__isnull=False).annotate(
+                count=F('superuser_count') + F('head_manager_count')
+                + F('task_area_manager_count') + F('employee_count')
+            ).filter(count__gt=0).values(
+                'count', task_area_fk__name=F('task_area__name')
+            ).order_by('-count')[:5]
+        ),
+    }
+    cache.set(USER_STATS_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def get_leave_stats(scope):
+    """
+    获取请假统计
+    scope: None 表示全局，否则为任务区ID元组（其中的 None 表示未分配任务区）
+    """
+    key = _leave_stats_key(scope)
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    queryset = DashboardSnapshot.objects.all()
+    if scope is not None:
+        condition = Q(task_area_id__in=[area_id for area_id in scope if area_id is not None])
+        if None in scope:
+            condition |= Q(task_area__isnull=True)
+        queryset = queryset.filter(condition)
+    counts = _sum_snapshots(queryset, LEAVE_FIELDS)
+
+    stats = {
+        'total_applications': sum(counts.values()),
+        'pending_applications': counts['leave_pending_task_area'] + counts['leave_pending_head'],
+        'approved_applications': counts['leave_approved'],
+        'rejected_applications': counts['leave_rejected'],
+    }
+    cache.set(key, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_user_stats():
+    """用户数据变化时清除用户统计缓存"""
+    cache.delete(USER_STATS_KEY)
+
+
+def invalidate_leave_stats(area_ids):
+    """
+    请假数据变化时使相关统计范围失效
+    递增涉及任务区及全局的版本号，包含这些任务区的所有缓存键随之失效
+    area_ids 中的 None 对应未分配任务区的统计范围
+    """
+    keys = [GLOBAL_VERSION_KEY]
+    keys.extend(_area_version_key(area_id) for area_id in set(area_ids))
+    bump_versions(keys)
@@ -0,0 +1,80 @@
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from accounts.models import TaskArea, User
+from leave_management.models import LeaveApplication
+
+from .models import DashboardSnapshot
+
+
+class DashboardSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.area = TaskArea.objects.create(name='一区')
+        self.other_area = TaskArea.objects.create(name='二区')
+        self.employee = User.objects.create_user(
+            username='employee', role=User.Role.EMPLOYEE, task_area_fk=self.area
+        )
+
+    def create_application(self, applicant=None):
+        return LeaveApplication.objects.create(
+            applicant=applicant or self.employee,
+            leave_start_date=date(2025, 3, 1),
+            leave_end_date=date(2025, 3, 10),
+            leave_location='北京',
+            leave_reason='休假',
+        )
+
+    def assertNoDrift(self):
+        self.assertEqual(DashboardSnapshot.find_drift(), [])
+
+    def test_task_area_gets_snapshot_row_on_creation(self):
+        self.assertTrue(DashboardSnapshot.objects.filter(task_area=self.other_area).exists())
+
+    def test_leave_transitions_do_not_drift(self):
+        application = self.create_application()
+        for status in (
+            LeaveApplication.Status.PENDING_TASK_AREA,
+            LeaveApplication.Status.PENDING_HEAD,
+            LeaveApplication.Status.APPROVED,
+        ):
+            application.status = status
+            application.save()
+            self.assertNoDrift()
+
+        rejected = self.create_application()
+        rejected.status = LeaveApplication.Status.REJECTED
+        rejected.save()
+        self.create_application().delete()
+        self.assertNoDrift()
+        snapshot = DashboardSnapshot.objects.get(task_area=self.area)
+        self.assertEqual((snapshot.leave_approved, snapshot.leave_rejected, snapshot.leave_draft), (1, 1, 0))
+
+    def test_moving_applicant_moves_leave_counts(self):
+        self.create_application()
+        self.employee.task_area_fk = self.other_area
+        self.employee.save()
+        self.assertNoDrift()
+
+        self.employee.task_area_fk = None
+        self.employee.save()
+        self.assertNoDrift()
+        self.assertEqual(DashboardSnapshot.objects.get(task_area__isnull=True).leave_draft, 1)
+
+    def test_single_unassigned_row(self):
+        DashboardSnapshot.apply_delta(None, {'employee_count': 1})
+        DashboardSnapshot.apply_delta(None, {'employee_count': 1})
+        self.assertEqual(DashboardSnapshot.objects.filter(task_area__isnull=True).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DashboardSnapshot.objects.create(task_area=None)
+
+    def test_rebuild_creates_row_for_every_task_area(self):
+        DashboardSnapshot.objects.all().delete()
+        DashboardSnapshot.rebuild()
+        self.assertEqual(
+            set(DashboardSnapshot.objects.values_list('task_area_id', flat=True)),
+            {self.area.pk, self.other_area.pk, None},
+        )
+        self.assertNoDrift()
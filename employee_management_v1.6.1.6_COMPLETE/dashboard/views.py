@@ -4,17 +4,20 @@ dashboard 视图
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Q
+from django.db.models import Case, CharField, Count, F, IntegerField, Max, Q, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import datetime, timedelta
 from accounts.models import User
-from leave_management.models import LeaveApplication, ApprovalRecord
+from leave_management.models import ApprovalRecord
+from accounts.pagination import KeysetPaginator
 from accounts.permissions import (
     get_user_permissions, 
     role_required, 
     ROLES,
     get_role_display_name
 )
+from .stats import get_user_stats, get_leave_stats, get_leave_scope
 
 
 @login_required
@@ -70,119 +73,36 @@ def get_employee_dashboard_data(user):
 
 def get_manager_dashboard_data(user):
     """获取管理员仪表板数据"""
-    # 分公司负责人可以看到的数据
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    
-    # 请假统计
-    if user.role == ROLES['TASK_AREA_MANAGER']:
-        # 任务区负责人：只统计本任务区的请假
-        leave_base_query = LeaveApplication.objects.filter(applicant__task_area_fk=user.task_area_fk)
-    elif user.role == ROLES['HEAD_MANAGER']:
-        # 总部负责人：统计管辖任务区的请假
-        managed_areas = user.managed_task_areas.all()
-        leave_base_query = LeaveApplication.objects.filter(applicant__task_area_fk__in=managed_areas)
-    else:
-        # 超级管理员：统计所有请假
-        leave_base_query = LeaveApplication.objects.all()
-    
-    # 统计数据
-    total_applications = leave_base_query.count()
-    pending_applications = leave_base_query.filter(
-        status__in=[
-            LeaveApplication.Status.PENDING_TASK_AREA,
-            LeaveApplication.Status.PENDING_HEAD
-        ]
-    ).count()
-    approved_applications = leave_base_query.filter(
-        status=LeaveApplication.Status.APPROVED
-    ).count()
-    rejected_applications = leave_base_query.filter(
-        status=LeaveApplication.Status.REJECTED
-    ).count()
+    # 用户统计为全局数据，请假统计按角色限定范围（见 dashboard.stats）
+    user_data = get_user_stats()
+    leave_statistics = get_leave_stats(get_leave_scope(user))
     
     return {
-        'team_overview': {
-            'total_members': User.objects.filter(role=ROLES['EMPLOYEE']).count(),
-            'active_members': User.objects.filter(role=ROLES['EMPLOYEE'], is_active=True).count(),
-        },
-        'leave_statistics': {
-            'total_applications': total_applications,
-            'pending_applications': pending_applications,
-            'approved_applications': approved_applications,
-            'rejected_applications': rejected_applications,
-        },
-        'pending_approvals': pending_applications,   # 待审批请假
+        'team_overview': user_data['team_overview'],
+        'leave_statistics': leave_statistics,
+        'pending_approvals': leave_statistics['pending_applications'],   # 待审批请假
         'recent_reports': [],     # 最近报告
         'team_locations': [],     # 团队位置信息
         # 添加模板需要的基础统计数据
-        'total_users': total_users,
-        'active_users': active_users,
-        'user_stats': {
-            'superuser': User.objects.filter(role=ROLES['SUPERUSER']).count(),
-            'head_manager': User.objects.filter(role=ROLES['HEAD_MANAGER']).count(),
-            'task_area_manager': User.objects.filter(role=ROLES['TASK_AREA_MANAGER']).count(),
-            'employee': User.objects.filter(role=ROLES['EMPLOYEE']).count(),
-        },
-        'recent_logins': User.objects.filter(
-            last_login__isnull=False
-        ).order_by('-last_login')[:5],
-        'task_area_stats': User.objects.select_related('task_area_fk').values('task_area_fk__name').annotate(
-            count=Count('id')
-        ).exclude(task_area_fk__isnull=True).order_by('-count')[:5],
+        'total_users': user_data['total_users'],
+        'active_users': user_data['active_users'],
+        'user_stats': user_data['user_stats'],
+        'recent_logins': user_data['recent_logins'],
+        'task_area_stats': user_data['task_area_stats'],
     }
 
 def get_admin_dashboard_data(user):
     """获取高级管理员仪表板数据"""
-    # 基本统计数据
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    
-    # 按角色统计用户
-    user_stats = {
-        'superuser': User.objects.filter(role=ROLES['SUPERUSER']).count(),
-        'head_manager': User.objects.filter(role=ROLES['HEAD_MANAGER']).count(),
-        'task_area_manager': User.objects.filter(role=ROLES['TASK_AREA_MANAGER']).count(),
-        'employee': User.objects.filter(role=ROLES['EMPLOYEE']).count(),
-    }
-    
-    # 请假统计数据 - 管理员查看所有
-    total_applications = LeaveApplication.objects.count()
-    pending_applications = LeaveApplication.objects.filter(
-        status__in=[
-            LeaveApplication.Status.PENDING_TASK_AREA,
-            LeaveApplication.Status.PENDING_HEAD
-        ]
-    ).count()
-    approved_applications = LeaveApplication.objects.filter(
-        status=LeaveApplication.Status.APPROVED
-    ).count()
-    rejected_applications = LeaveApplication.objects.filter(
-        status=LeaveApplication.Status.REJECTED
-    ).count()
-    
-    # 最近登录的用户
-    recent_logins = User.objects.filter(
-        last_login__isnull=False
-    ).order_by('-last_login')[:5]
-    
-    # 任务区分布
-    task_area_stats = User.objects.select_related('task_area_fk').values('task_area_fk__name').annotate(
-        count=Count('id')
-    ).exclude(task_area_fk__isnull=True).order_by('-count')[:5]
+    user_data = get_user_stats()
     
     return {
-        'total_users': total_users,
-        'active_users': active_users,
-        'user_stats': user_stats,
-        'leave_statistics': {
-            'total_applications': total_applications,
-            'pending_applications': pending_applications,
-            'approved_applications': approved_applications,
-            'rejected_applications': rejected_applications,
-        },
-        'recent_logins': recent_logins,
-        'task_area_stats': task_area_stats,
+        'total_users': user_data['total_users'],
+        'active_users': user_data['active_users'],
+        'user_stats': user_data['user_stats'],
+        # 请假统计数据 - 管理员查看所有
+        'leave_statistics': get_leave_stats(None),
+        'recent_logins': user_data['recent_logins'],
+        'task_area_stats': user_data['task_area_stats'],
         'system_status': 'normal',  # 系统状态
     }
 
@@ -598,6 +518,39 @@ def delete_user(request, user_id):
 
 
 
+TEAM_PAGE_SIZE = 50
+
+
+def get_team_ordering(viewer_role):
+    """
+    员工列表排序（基于 name_pinyin_key 在数据库中完成）
+    超级管理员：总部负责人最前 → 任务区拼音 → 任务区负责人在前、普通员工在后 → 姓氏拼音
+    总部负责人：任务区拼音 → 任务区负责人在前、普通员工在后 → 姓氏拼音
+    任务区负责人：姓氏拼音
+    最后按ID排序，保证排序键唯一（键集分页要求）
+    """
+    # 未设置任务区的用户按"未设置"的拼音参与排序
+    task_area_key = Coalesce(F('task_area_fk__name_pinyin_key'), Value('weishezhi'))
+    role_rank = Case(
+        When(role=ROLES['TASK_AREA_MANAGER'], then=Value(0)),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+    
+    if viewer_role == ROLES['SUPERUSER']:
+        is_head_manager = Q(role=ROLES['HEAD_MANAGER'])
+        return [
+            Case(When(is_head_manager, then=Value(0)), default=Value(1), output_field=IntegerField()),
+            Case(When(is_head_manager, then=Value('')), default=task_area_key, output_field=CharField()),
+            Case(When(is_head_manager, then=Value(0)), default=role_rank, output_field=IntegerField()),
+            'name_pinyin_key',
+            'id',
+        ]
+    elif viewer_role == ROLES['HEAD_MANAGER']:
+        return [task_area_key, role_rank, 'name_pinyin_key', 'id']
+    return ['name_pinyin_key', 'id']
+
+
 @login_required
 @role_required([ROLES['TASK_AREA_MANAGER'], ROLES['HEAD_MANAGER'], ROLES['SUPERUSER']])
 def team_management(request):
@@ -605,7 +558,6 @@ def team_management(request):
     员工列表页面（任务区负责人及以上可访问）
     增强功能：搜索、筛选、自定义排序
     """
-    from pypinyin import lazy_pinyin
     from accounts.models import TaskArea
     
     user_permissions = get_user_permissions(request.user)
@@ -660,49 +612,14 @@ def team_management(request):
     if role_filter:
         team_members = team_members.filter(role=role_filter)
     
-    # 获取所有数据到列表中进行 Python 级别排序
-    team_members_list = list(team_members.select_related('task_area_fk'))
-    
-    # 根据用户角色进行自定义排序
-    def get_sort_key(user_obj):
-        """\u751f\u6210\u6392\u5e8f\u952e"""
-        # 获取任务区名称的拼音
-        task_area_name = user_obj.task_area_fk.name if user_obj.task_area_fk else "\u672a\u8bbe\u7f6e"
-        task_area_pinyin = ''.join(lazy_pinyin(task_area_name))
-        
-        # 获取用户姓氏的拼音
-        last_name = user_obj.last_name or user_obj.username[0] if user_obj.username else "z"
-        last_name_pinyin = ''.join(lazy_pinyin(last_name))
-        
-        if request.user.role == ROLES['SUPERUSER']:
-            # 超级管理员：
-            # 1. 总部负责人最前（role=3）
-            # 2. 任务区按拼音排序
-            # 3. 同一任务区：任务区负责人在前（role=2），普通员工在后（role=1）
-            # 4. 同角色内按姓氏拼音排序
-            if user_obj.role == ROLES['HEAD_MANAGER']:
-                return (0, '', 0, last_name_pinyin)  # 总部负责人最前
-            elif user_obj.role == ROLES['TASK_AREA_MANAGER']:
-                return (1, task_area_pinyin, 0, last_name_pinyin)  # 任务区负责人
-            else:  # EMPLOYEE
-                return (1, task_area_pinyin, 1, last_name_pinyin)  # 普通员工
-                
-        elif request.user.role == ROLES['HEAD_MANAGER']:
-            # 总部负责人：
-            # 1. 任务区按拼音排序
-            # 2. 同一任务区：任务区负责人在前，普通员工在后
-            # 3. 同角色内按姓氏拼音排序
-            if user_obj.role == ROLES['TASK_AREA_MANAGER']:
-                return (task_area_pinyin, 0, last_name_pinyin)
-            else:  # EMPLOYEE
-                return (task_area_pinyin, 1, last_name_pinyin)
-                
-        else:  # TASK_AREA_MANAGER
-            # 任务区负责人：
-            # 普通员工按姓氏拼音排序
-            return (last_name_pinyin,)
-    
-    team_members_list.sort(key=get_sort_key)
+    # 在数据库中按持久化的拼音排序键排序，键集分页（翻页代价与页码无关）
+    total_count = team_members.count()
+    paginator = KeysetPaginator(
+        team_members.select_related('task_area_fk').prefetch_related('managed_task_areas'),
+        get_team_ordering(request.user.role),
+        per_page=TEAM_PAGE_SIZE,
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     # 获取筛选选项
     if request.user.role == ROLES['SUPERUSER']:
@@ -728,8 +645,43 @@ def team_management(request):
             available_task_areas = TaskArea.objects.none()
         available_roles = [(ROLES['EMPLOYEE'], '普通员工')]
     
+    # 位置统计按全部筛选结果聚合（一次查询）；地图标记只包含当前页的成员，全部成员见详细地图
+    location_stats = team_members.aggregate(
+        located=Count('id', filter=Q(latitude__isnull=False, longitude__isnull=False)),
+        last_update=Max('location_updated_at'),
+    )
+    map_members = [
+        {
+            'username': member.username,
+            'first_name': member.first_name,
+            'name': f"{member.first_name} {member.last_name}",
+            'role': member.role,
+            'role_display': member.get_role_display(),
+            'latitude': member.latitude,
+            'longitude': member.longitude,
+            'address': member.location_address or '未设置地址',
+            'updated_at': (
+                timezone.localtime(member.location_updated_at).strftime('%Y-%m-%d %H:%M')
+                if member.location_updated_at else '未更新'
+            ),
+        }
+        for member in page_obj
+        if member.latitude is not None and member.longitude is not None
+    ]
+    
+    # 分页链接保留筛选参数
+    query_params = request.GET.copy()
+    query_params.pop('cursor', None)
+    
     context = {
-        'team_members': team_members_list,
+        'team_members': page_obj,
+        'page_obj': page_obj,
+        'total_count': total_count,
+        'located_count': location_stats['located'],
+        'not_located_count': total_count - location_stats['located'],
+        'last_location_update': location_stats['last_update'],
+        'map_members': map_members,
+        'query_string': query_params.urlencode(),
         'permissions': user_permissions,
         'user_role': get_role_display_name(request.user.role),
         'search': search,
@@ -4,8 +4,43 @@ from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
 
+from accounts.models import TaskArea
+from accounts.scope import get_scope_resolver
+
 User = get_user_model()
 
+
+class EmergencyAlertQuerySet(models.QuerySet):
+    """紧急报警查询集"""
+
+    def visible_to(self, user, include_own=True):
+        """
+        用户可查看的报警：超级管理员全部；任务区/总部负责人按发送人任务区范围；
+        include_own 为真时包含本人发送的报警
+        """
+        resolver = get_scope_resolver(user)
+        condition = resolver.filter_q(
+            'sender__task_area_fk_id', owner_field='sender_id' if include_own else None
+        )
+        if not resolver.is_global:
+            condition |= _legacy_sender_area_q(user, resolver)
+        return self.filter(condition).select_related('sender')
+
+
+def _legacy_sender_area_q(user, resolver):
+    """
+    只填写了旧任务区字段（字符串）的发送人：按任务区名称匹配，
+    任务区负责人也匹配自己的旧任务区字段
+    """
+    if user.role not in (User.Role.TASK_AREA_MANAGER, User.Role.HEAD_MANAGER):
+        return models.Q(pk__in=[])
+    names = TaskArea.objects.filter(id__in=resolver.task_area_ids).values('name')
+    condition = models.Q(sender__task_area__in=names)
+    if user.role == User.Role.TASK_AREA_MANAGER and user.task_area:
+        condition |= models.Q(sender__task_area=user.task_area)
+    return models.Q(sender__task_area_fk__isnull=True) & condition
+
+
 class EmergencyAlert(models.Model):
     """
     紧急报警模型
@@ -127,6 +162,8 @@ class EmergencyAlert(models.Model):
         verbose_name='更新时间'
     )
     
+    objects = EmergencyAlertQuerySet.as_manager()
+    
     class Meta:
         verbose_name = '紧急报警'
         verbose_name_plural = '紧急报警'
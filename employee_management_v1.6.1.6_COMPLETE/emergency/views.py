@@ -14,6 +14,7 @@ import logging
 from .models import EmergencyAlert, NotificationLog
 from accounts.models import User
 from accounts.permissions import role_required
+from accounts.scope import get_scope_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -81,22 +82,8 @@ def alert_list(request):
     报警列表
     """
     # 根据角色获取可查看的报警
-    if request.user.role == User.Role.SUPERUSER:
-        alerts = EmergencyAlert.objects.all()
-    elif request.user.role == User.Role.TASK_AREA_MANAGER:
-        # 任务区负责人只能看本任务区员工的报警
-        alerts = EmergencyAlert.objects.filter(
-            sender__task_area=request.user.task_area
-        )
-    elif request.user.role == User.Role.HEAD_MANAGER:
-        # 总部负责人可以看管辖任务区的报警
-        managed_areas = request.user.managed_task_areas.all()
-        alerts = EmergencyAlert.objects.filter(
-            sender__task_area__in=managed_areas
-        )
-    else:
-        # 普通员工只能看自己的报警
-        alerts = EmergencyAlert.objects.filter(sender=request.user)
+    # 任务区负责人看本任务区员工的报警，总部负责人看管辖任务区的报警，普通员工只看自己的报警
+    alerts = EmergencyAlert.objects.visible_to(request.user)
     
     # 搜索和筛选
     search = request.GET.get('search')
@@ -233,24 +220,9 @@ def get_new_alerts(request):
             last_check_time = timezone.now() - timezone.timedelta(minutes=5)
         
         # 根据权限获取报警
-        if request.user.role == User.Role.SUPERUSER:
-            alerts = EmergencyAlert.objects.filter(alert_time__gt=last_check_time)
-        elif request.user.role == User.Role.TASK_AREA_MANAGER:
-            alerts = EmergencyAlert.objects.filter(
-                sender__task_area=request.user.task_area,
-                alert_time__gt=last_check_time
-            )
-        elif request.user.role == User.Role.HEAD_MANAGER:
-            managed_areas = request.user.managed_task_areas.all()
-            alerts = EmergencyAlert.objects.filter(
-                sender__task_area__in=managed_areas,
-                alert_time__gt=last_check_time
-            )
-        else:
-            alerts = EmergencyAlert.objects.filter(
-                sender=request.user,
-                alert_time__gt=last_check_time
-            )
+        alerts = EmergencyAlert.objects.visible_to(request.user).filter(
+            alert_time__gt=last_check_time
+        )
         
         alerts_data = []
         for alert in alerts:
@@ -285,19 +257,7 @@ def emergency_dashboard(request):
     紧急报警仪表板
     """
     # 获取统计数据
-    if request.user.role == User.Role.SUPERUSER:
-        base_query = EmergencyAlert.objects.all()
-    elif request.user.role == User.Role.TASK_AREA_MANAGER:
-        base_query = EmergencyAlert.objects.filter(
-            sender__task_area=request.user.task_area
-        )
-    elif request.user.role == User.Role.HEAD_MANAGER:
-        managed_areas = request.user.managed_task_areas.all()
-        base_query = EmergencyAlert.objects.filter(
-            sender__task_area__in=managed_areas
-        )
-    else:
-        base_query = EmergencyAlert.objects.filter(sender=request.user)
+    base_query = EmergencyAlert.objects.visible_to(request.user)
     
     # 时间范围筛选
     time_range = request.GET.get('time_range', 'today')
@@ -347,25 +307,22 @@ def emergency_dashboard(request):
 
 def can_view_alert(user, alert):
     """检查用户是否可以查看报警"""
-    if user == alert.sender:
+    if user.id == alert.sender_id:
         return True
-    if user.role == User.Role.SUPERUSER:
-        return True
-    if user.role == User.Role.TASK_AREA_MANAGER:
-        return alert.sender.task_area == user.task_area
-    if user.role == User.Role.HEAD_MANAGER:
-        return alert.sender.task_area in user.managed_task_areas.all()
-    return False
+    return can_handle_alert(user, alert)
 
 
 def can_handle_alert(user, alert):
     """检查用户是否可以处理报警"""
     if user.role == User.Role.SUPERUSER:
         return True
-    if user.role == User.Role.TASK_AREA_MANAGER:
-        return alert.sender.task_area == user.task_area
-    if user.role == User.Role.HEAD_MANAGER:
-        return alert.sender.task_area in user.managed_task_areas.all()
+    if user.role in (User.Role.TASK_AREA_MANAGER, User.Role.HEAD_MANAGER):
+        sender = alert.sender
+        if get_scope_resolver(user).can_access_task_area(sender.task_area_fk_id):
+            return True
+        # 发送人只有旧任务区字段时按名称匹配（少见，需要一次查询）
+        if sender.task_area_fk_id is None and sender.task_area:
+            return EmergencyAlert.objects.filter(pk=alert.pk).visible_to(user, include_own=False).exists()
     return False
 
 
@@ -0,0 +1,170 @@
+"""
+后台任务工作进程的公共实现
+
+run_export_jobs、run_bulk_packages 等命令继承 JobWorkerCommand，只需指定任务模型、状态值、
+文件字段和执行函数。命令在本地进程池中执行排队的任务：条件更新认领任务（多个工作进程同时运行时
+不会重复执行），启动时及定期把中断的任务重新排队，并定期删除过期的任务及其文件。
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+# 超过该时长仍处于执行中的任务视为工作进程已退出，重新排队
+STALE_JOB_TIMEOUT = timedelta(hours=1)
+
+# 重新排队中断任务、清理过期任务的间隔
+CLEANUP_INTERVAL = timedelta(hours=1)
+
+
+def _init_worker():
+    """工作进程初始化（spawn 方式启动的进程需要重新加载 Django）"""
+    django.setup()
+
+
+def _run_job(run_job, job_id):
+    try:
+        return run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+class JobWorkerCommand(BaseCommand):
+    """
+    后台任务工作进程命令基类
+    子类需要设置 model、job_label、各状态值、file_field 和 run_job（模块级函数，接收任务ID，返回最终状态）
+    """
+    model = None
+    job_label = '任务'
+    pending_status = None
+    running_status = None
+    completed_status = None
+    failed_status = None
+    file_field = 'file'
+    # 重新排队时额外重置的字段
+    requeue_fields = {}
+    run_job = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=max(1, min(4, os.cpu_count() or 1)),
+            help='工作进程数（默认不超过4个）',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help=f'检查新{self.job_label}的间隔秒数（默认2秒）',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help=f'处理完当前排队的{self.job_label}后退出（适合由 cron 调用）',
+        )
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=7,
+            help=f'{self.job_label}保留天数，过期的{self.job_label}和文件会被删除（默认7天）',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        self.requeue_stale_jobs()
+        self.cleanup(options['keep_days'])
+        last_cleanup = timezone.now()
+        # 通过类取得函数，避免绑定为方法（提交到进程池时需要可以序列化）
+        run_job = type(self).run_job
+
+        running = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            self.stdout.write(f'{self.job_label}工作进程已启动（{workers} 个进程）')
+            while True:
+                for job_id, future in list(running.items()):
+                    if future.done():
+                        del running[job_id]
+                        self.report(job_id, future)
+
+                claimed = self.claim_jobs(workers - len(running))
+                if claimed:
+                    # 进程池在提交任务时才创建子进程，先关闭连接，避免子进程继承父进程的数据库连接
+                    connections.close_all()
+                for job_id in claimed:
+                    running[job_id] = pool.submit(_run_job, run_job, job_id)
+                    self.stdout.write(f'开始处理{self.job_label} {job_id}')
+
+                if options['once'] and not running:
+                    break
+
+                if timezone.now() - last_cleanup > CLEANUP_INTERVAL:
+                    # 其他工作进程退出时遗留的任务（本进程正在执行的除外）
+                    self.requeue_stale_jobs(exclude=running)
+                    self.cleanup(options['keep_days'])
+                    last_cleanup = timezone.now()
+
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'排队的{self.job_label}已全部处理'))
+
+    def claim_jobs(self, limit):
+        """认领排队中的任务（条件更新，多个工作进程同时运行时不会重复执行）"""
+        if limit <= 0:
+            return []
+        claimed = []
+        pending = self.model.objects.filter(
+            status=self.pending_status
+        ).order_by('created_at').values_list('id', flat=True)[:limit]
+        for job_id in pending:
+            updated = self.model.objects.filter(id=job_id, status=self.pending_status).update(
+                status=self.running_status, started_at=timezone.now()
+            )
+            if updated:
+                claimed.append(job_id)
+        return claimed
+
+    def report(self, job_id, future):
+        try:
+            status = future.result()
+        except Exception as e:
+            self.model.objects.filter(id=job_id).update(
+                status=self.failed_status, error=str(e), completed_at=timezone.now()
+            )
+            self.stderr.write(self.style.ERROR(f'{self.job_label} {job_id} 失败: {e}'))
+            return
+        if status == self.completed_status:
+            self.stdout.write(self.style.SUCCESS(f'{self.job_label} {job_id} 完成'))
+        else:
+            self.stderr.write(self.style.ERROR(f'{self.job_label} {job_id} 失败'))
+
+    def requeue_stale_jobs(self, exclude=()):
+        """把执行超时的任务重新排队，exclude 为本进程正在执行的任务ID"""
+        count = self.model.objects.filter(
+            status=self.running_status,
+            started_at__lt=timezone.now() - STALE_JOB_TIMEOUT,
+        ).exclude(id__in=list(exclude)).update(status=self.pending_status, started_at=None, **self.requeue_fields)
+        if count:
+            self.stdout.write(self.style.WARNING(f'{count} 个中断的{self.job_label}已重新排队'))
+
+    def cleanup(self, keep_days):
+        """删除过期的任务及其文件"""
+        cutoff = timezone.now() - timedelta(days=keep_days)
+        expired = self.model.objects.filter(
+            created_at__lt=cutoff,
+            status__in=[self.completed_status, self.failed_status],
+        )
+        count = 0
+        for job in expired.iterator():
+            file = getattr(job, self.file_field)
+            if file:
+                file.delete(save=False)
+            job.delete()
+            count += 1
+        if count:
+            self.stdout.write(f'已清理 {count} 个过期{self.job_label}')
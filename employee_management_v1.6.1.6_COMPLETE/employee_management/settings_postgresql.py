@@ -85,6 +85,16 @@ DATABASES = {
     }
 }
 
+# 缓存：配置 REDIS_URL 时使用 Redis，多个进程共享，登录用户缓存（accounts.backends）才会启用，
+# 统计缓存也能跨进程失效；未配置时为 Django 默认的进程内缓存（LocMemCache），不缓存登录用户
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -118,12 +128,45 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 文件下载交给前端服务器发送（权限检查仍由 Django 完成）：
+# None 由 Django 发送；'nginx' 使用 X-Accel-Redirect；'sendfile' 使用 X-Sendfile（Apache/lighttpd）
+FILE_DOWNLOAD_OFFLOAD = os.environ.get('FILE_DOWNLOAD_OFFLOAD') or None
+# X-Accel-Redirect 的内部路径前缀，nginx 中应配置为指向 MEDIA_ROOT 的 internal location
+FILE_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+
+# 导出任务由 run_export_jobs 工作进程执行（Procfile 中的 worker 进程）
+# 没有部署工作进程时设为 False，在请求内导出
+EXPORT_JOBS_ASYNC = os.environ.get('EXPORT_JOBS_ASYNC', 'True').lower() == 'true'
+# 批量下载包由 run_bulk_packages 工作进程生成（Procfile 中的 packages 进程），没有部署时设为 False
+BULK_PACKAGES_ASYNC = os.environ.get('BULK_PACKAGES_ASYNC', 'True').lower() == 'true'
+
+# 报告保留天数，更早上传的报告由 purge_old_reports 命令分批删除
+REPORT_RETENTION_DAYS = 180
+# 为 True 时"清理旧报告"页面只提交任务，由 cron 调用 purge_old_reports --queued 执行；
+# 否则在请求内执行，每次最多 REPORT_PURGE_REQUEST_TIME_LIMIT 秒（小于 gunicorn 的 --timeout），未完成的任务可以继续
+REPORT_PURGE_ASYNC = os.environ.get('REPORT_PURGE_ASYNC', 'False').lower() == 'true'
+REPORT_PURGE_REQUEST_TIME_LIMIT = 30
+
+# 报告下载日志延迟批量写入：每累积 DOWNLOAD_LOG_FLUSH_SIZE 条或每隔 DOWNLOAD_LOG_FLUSH_INTERVAL 秒写入一次
+DOWNLOAD_LOG_BUFFERED = True
+DOWNLOAD_LOG_FLUSH_SIZE = 100
+DOWNLOAD_LOG_FLUSH_INTERVAL = 5
+
+# 报告提交情况矩阵：周期结束后允许提交的天数（之后提交记为逾期），结果缓存秒数
+REPORT_SUBMISSION_GRACE_DAYS = 1
+REPORT_COMPLIANCE_CACHE_TIMEOUT = 300
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Custom user model
 AUTH_USER_MODEL = 'accounts.User'
 
+# 认证后端：登录用户缓存（与 ModelBackend 的认证规则相同；启用前登录的会话需要重新登录一次）
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.CachedModelBackend',
+]
+
 # Login/Logout URLs
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
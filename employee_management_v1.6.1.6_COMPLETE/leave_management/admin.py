@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import LeaveApplication
+from .models import LeaveApplication, ExportJob
 
 
 @admin.register(LeaveApplication)
@@ -8,3 +8,12 @@ class LeaveApplicationAdmin(admin.ModelAdmin):
     list_filter = ('status', 'application_date')
     search_fields = ('applicant__username', 'place')
     ordering = ('-application_date',)
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('title', 'export_type', 'requested_by', 'status', 'progress', 'total_rows', 'created_at', 'completed_at')
+    list_filter = ('export_type', 'status')
+    search_fields = ('title', 'requested_by__username', 'cache_key')
+    readonly_fields = ('cache_key', 'params', 'progress', 'total_rows', 'error', 'started_at', 'completed_at')
+    ordering = ('-created_at',)
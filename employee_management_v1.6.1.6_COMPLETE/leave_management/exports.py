@@ -0,0 +1,324 @@
+"""
+休假记录导出
+
+使用 openpyxl 只写模式逐行写出工作簿，数据按块从数据库迭代读取，
+内存占用与记录数无关。只写模式要求列宽在写入第一行之前确定，
+因此列宽由一次聚合查询（各列最大长度）得到，而不是写完后再遍历所有单元格。
+
+大范围导出通过 ExportJob 在后台执行（见 run_export_jobs 命令），
+导出范围、筛选条件和数据版本相同的请求复用已生成的文件。
+"""
+import hashlib
+import json
+import logging
+import tempfile
+
+from django.core.files import File
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.db.models.functions import Coalesce, Concat, Length
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
+
+from accounts.models import TaskArea, User
+from accounts.scope import get_scope_resolver
+
+from .models import ExportJob, LeaveApplication
+
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# 每次从数据库读取的记录数
+EXPORT_CHUNK_SIZE = 500
+
+LEAVE_EXPORT_HEADERS = [
+    '姓名', '任务区', '请假开始日期', '请假结束日期',
+    '休假天数', '休假地点', '申请日期', '审批状态',
+    '任务区负责人审批', '总部负责人审批', '备注',
+]
+
+# 列宽：最小10，最大50
+MIN_COLUMN_WIDTH = 10
+MAX_COLUMN_WIDTH = 50
+
+# 审批列 "用户名 (YYYY-MM-DD)" 中日期部分的长度
+APPROVAL_SUFFIX_LENGTH = len(' (0000-00-00)')
+
+
+def export_queryset(applications):
+    """导出所需的关联一次查出，避免逐行查询"""
+    return applications.select_related(
+        'applicant__task_area_fk',
+        'task_area_manager_approver',
+        'head_manager_approver',
+    ).order_by('-created_at')
+
+
+def _approval_text(approved, approver, approval_date):
+    if not approved:
+        return '未审批'
+    approver_name = approver.username if approver else '未知'
+    date_text = approval_date.strftime('%Y-%m-%d') if approval_date else ''
+    return f"{approver_name} ({date_text})"
+
+
+def _remark(app):
+    if app.status == LeaveApplication.Status.REJECTED:
+        return f"拒绝原因：{app.rejection_reason}"
+    if app.status == LeaveApplication.Status.CANCELLED:
+        return f"取消原因：{app.cancellation_reason}"
+    if app.is_on_leave:
+        return '正在休假'
+    if app.is_planned_leave:
+        return '计划休假'
+    return None
+
+
+def leave_export_row(app):
+    """一条申请对应的一行数据"""
+    applicant = app.applicant
+    return [
+        f"{applicant.last_name}{applicant.first_name}",
+        applicant.task_area_fk.name if applicant.task_area_fk else '未设置',
+        app.leave_start_date.strftime('%Y-%m-%d'),
+        app.leave_end_date.strftime('%Y-%m-%d'),
+        app.duration_days,
+        app.leave_location,
+        app.application_date.strftime('%Y-%m-%d %H:%M'),
+        app.get_status_display(),
+        _approval_text(
+            app.task_area_manager_approved,
+            app.task_area_manager_approver,
+            app.task_area_manager_approval_date,
+        ),
+        _approval_text(
+            app.head_manager_approved,
+            app.head_manager_approver,
+            app.head_manager_approval_date,
+        ),
+        _remark(app),
+    ]
+
+
+def leave_column_lengths(applications):
+    """各列内容的最大长度（一次聚合查询）"""
+    Status = LeaveApplication.Status
+
+    def longest(expression, **extra):
+        return Coalesce(Max(Length(expression), **extra), 0)
+
+    lengths = applications.order_by().aggregate(
+        name=longest(Concat('applicant__last_name', 'applicant__first_name')),
+        task_area=longest('applicant__task_area_fk__name'),
+        location=longest('leave_location'),
+        task_area_approver=longest(
+            'task_area_manager_approver__username', filter=Q(task_area_manager_approved=True)
+        ),
+        head_approver=longest(
+            'head_manager_approver__username', filter=Q(head_manager_approved=True)
+        ),
+        rejection=longest('rejection_reason', filter=Q(status=Status.REJECTED)),
+        cancellation=longest('cancellation_reason', filter=Q(status=Status.CANCELLED)),
+    )
+    status_length = max(len(str(label)) for label in Status.labels)
+    approval_length = len('未审批')
+    remark_prefix = len('拒绝原因：')
+    return [
+        max(lengths['name'], 1),
+        max(lengths['task_area'], len('未设置')),
+        len('0000-00-00'),
+        len('0000-00-00'),
+        len('0000'),
+        lengths['location'],
+        len('0000-00-00 00:00'),
+        status_length,
+        max(lengths['task_area_approver'] + APPROVAL_SUFFIX_LENGTH, approval_length),
+        max(lengths['head_approver'] + APPROVAL_SUFFIX_LENGTH, approval_length),
+        max(lengths['rejection'] + remark_prefix, lengths['cancellation'] + remark_prefix, len('正在休假')),
+    ]
+
+
+def write_leave_workbook(output, applications, title, progress=None):
+    """
+    将休假记录写入 Excel 工作簿
+    output: 文件路径或可写的二进制文件对象
+    progress: 可选回调 progress(已写入行数)，每写完一块调用一次
+    返回写入的数据行数
+    """
+    applications = export_queryset(applications)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('休假记录')
+
+    # 列宽必须在写入第一行之前设置
+    for col_idx, (header, length) in enumerate(
+        zip(LEAVE_EXPORT_HEADERS, leave_column_lengths(applications)), 1
+    ):
+        width = max(length, len(header)) + 2
+        ws.column_dimensions[get_column_letter(col_idx)].width = min(
+            max(width, MIN_COLUMN_WIDTH), MAX_COLUMN_WIDTH
+        )
+
+    # 标题
+    title_cell = WriteOnlyCell(ws, value=title)
+    title_cell.font = Font(size=16, bold=True)
+    title_cell.alignment = Alignment(horizontal='center', vertical='center')
+    ws.append([title_cell])
+    ws.merged_cells.add(CellRange(min_col=1, min_row=1, max_col=len(LEAVE_EXPORT_HEADERS), max_row=1))
+
+    # 表头
+    header_font = Font(bold=True, color='FFFFFF')
+    header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
+    header_alignment = Alignment(horizontal='center', vertical='center')
+    header_row = []
+    for header in LEAVE_EXPORT_HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        header_row.append(cell)
+    ws.append(header_row)
+
+    # 数据
+    count = 0
+    for app in applications.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        ws.append(leave_export_row(app))
+        count += 1
+        if progress and count % EXPORT_CHUNK_SIZE == 0:
+            progress(count)
+
+    wb.save(output)
+    if progress:
+        progress(count)
+    return count
+
+
+# 后台导出任务
+
+def leave_export_params(user):
+    """
+    用户的休假记录导出参数
+    scope 为任务区ID列表（None 表示全部，列表中的 None 表示未分配任务区），
+    与 LeaveApplication.objects.visible_to(user, include_own=False) 一致
+    """
+    resolver = get_scope_resolver(user)
+    if resolver.is_global:
+        scope = None
+        title = '所有任务区休假情况'
+    else:
+        scope = [None] if resolver.is_unassigned else sorted(resolver.task_area_ids)
+        if user.role == User.Role.TASK_AREA_MANAGER:
+            area_name = user.task_area_fk.name if user.task_area_fk else '未知任务区'
+            title = f'{area_name}休假情况'
+        else:
+            title = '所有管辖任务区休假情况'
+    return {'scope': scope, 'filters': {}, 'title': title}
+
+
+def leave_export_queryset(params):
+    """按导出参数构造查询集"""
+    applications = LeaveApplication.objects.all()
+    if params['scope'] is not None:
+        condition = Q(applicant__task_area_fk_id__in=[area_id for area_id in params['scope'] if area_id is not None])
+        if None in params['scope']:
+            condition |= Q(applicant__task_area_fk__isnull=True)
+        applications = applications.filter(condition)
+    return applications
+
+
+def leave_data_version(applications):
+    """
+    数据版本：记录数、申请及申请人和审批人的最后修改时间、任务区名称和当天日期
+    （备注列的"正在休假/计划休假"随日期变化），任一变化都会生成新的缓存键
+    """
+    version = applications.order_by().aggregate(
+        count=Count('id'),
+        updated=Max('updated_at'),
+        applicant_updated=Max('applicant__updated_at'),
+        task_area_approver_updated=Max('task_area_manager_approver__updated_at'),
+        head_approver_updated=Max('head_manager_approver__updated_at'),
+    )
+    timestamps = [
+        version[field].isoformat() if version[field] else None
+        for field in ('updated', 'applicant_updated', 'task_area_approver_updated', 'head_approver_updated')
+    ]
+    # 任务区没有修改时间，直接取名称（任务区数量很少）
+    task_areas = list(TaskArea.objects.order_by('id').values_list('id', 'name'))
+    return [version['count'], *timestamps, task_areas, timezone.localdate().isoformat()]
+
+
+def export_cache_key(export_type, params, data_version):
+    payload = json.dumps([export_type, params, data_version], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def request_leave_export(user):
+    """
+    请求导出休假记录
+    有相同缓存键的已完成（文件仍存在）或进行中的任务时直接复用，否则创建新任务
+    """
+    params = leave_export_params(user)
+    data_version = leave_data_version(leave_export_queryset(params))
+    cache_key = export_cache_key(ExportJob.ExportType.LEAVE_RECORDS, params, data_version)
+
+    candidates = ExportJob.objects.filter(
+        cache_key=cache_key,
+        status__in=[ExportJob.Status.PENDING, ExportJob.Status.RUNNING, ExportJob.Status.COMPLETED],
+    ).order_by('-created_at')
+    for job in candidates:
+        if job.status != ExportJob.Status.COMPLETED or job.artifact_available:
+            return job
+
+    return ExportJob.objects.create(
+        export_type=ExportJob.ExportType.LEAVE_RECORDS,
+        requested_by=user,
+        title=params['title'],
+        params=params,
+        cache_key=cache_key,
+    )
+
+
+def can_access_export_job(user, job):
+    """请求人、超级管理员以及导出参数相同（共用该任务）的用户可以访问"""
+    if job.requested_by_id == user.id or get_scope_resolver(user).is_global:
+        return True
+    if job.export_type == ExportJob.ExportType.LEAVE_RECORDS:
+        return leave_export_params(user) == job.params
+    return False
+
+
+def run_export_job(job_id):
+    """执行导出任务（在 run_export_jobs 的工作进程中调用，也可以直接调用）"""
+    job = ExportJob.objects.get(pk=job_id)
+    if job.started_at is None:
+        job.started_at = timezone.now()
+    job.status = ExportJob.Status.RUNNING
+    job.save(update_fields=['status', 'started_at'])
+
+    def progress(count):
+        ExportJob.objects.filter(pk=job.pk).update(progress=count)
+
+    try:
+        applications = leave_export_queryset(job.params)
+        job.total_rows = applications.count()
+        job.save(update_fields=['total_rows'])
+
+        with tempfile.TemporaryFile() as output:
+            job.progress = write_leave_workbook(output, applications, job.title, progress=progress)
+            output.seek(0)
+            job.file.save(f'{job.cache_key}.xlsx', File(output), save=False)
+
+        job.status = ExportJob.Status.COMPLETED
+        job.completed_at = timezone.now()
+        job.save(update_fields=['file', 'progress', 'status', 'completed_at'])
+    except Exception as e:
+        logger.exception(f"导出任务 {job.pk} 失败")
+        job.status = ExportJob.Status.FAILED
+        job.error = str(e)
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'completed_at'])
+    return job.status
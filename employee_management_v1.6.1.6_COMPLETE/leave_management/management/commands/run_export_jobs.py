@@ -0,0 +1,20 @@
+"""
+Django管理命令：在本地进程池中执行后台导出任务
+"""
+from employee_management.jobs import JobWorkerCommand
+from leave_management.exports import run_export_job
+from leave_management.models import ExportJob
+
+
+class Command(JobWorkerCommand):
+    help = '在本地进程池中执行排队的导出任务，生成的文件保存在 MEDIA_ROOT/exports/ 下'
+
+    model = ExportJob
+    job_label = '导出任务'
+    pending_status = ExportJob.Status.PENDING
+    running_status = ExportJob.Status.RUNNING
+    completed_status = ExportJob.Status.COMPLETED
+    failed_status = ExportJob.Status.FAILED
+    file_field = 'file'
+    requeue_fields = {'progress': 0}
+    run_job = run_export_job
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('leave_management', '0002_update_leave_management_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_type', models.CharField(choices=[('leave_records', '休假记录')], max_length=30, verbose_name='导出类型')),
+                ('title', models.CharField(max_length=200, verbose_name='标题')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='导出参数')),
+                ('cache_key', models.CharField(db_index=True, max_length=64, verbose_name='缓存键')),
+                ('status', models.CharField(choices=[('pending', '排队中'), ('running', '导出中'), ('completed', '已完成'), ('failed', '失败')], default='pending', max_length=20, verbose_name='状态')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='已导出行数')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='总行数')),
+                ('file', models.FileField(blank=True, upload_to='exports/', verbose_name='导出文件')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='请求人')),
+            ],
+            options={
+                'verbose_name': '导出任务',
+                'verbose_name_plural': '导出任务',
+                'db_table': 'export_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -6,9 +6,46 @@ from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
+from accounts.scope import get_scope_resolver
+
 User = get_user_model()
 
 
+class LeaveApplicationQuerySet(models.QuerySet):
+    """请假申请查询集"""
+
+    def visible_to(self, user, include_own=True):
+        """
+        用户可查看的申请：超级管理员全部；任务区/总部负责人按申请人任务区范围；
+        include_own 为真时包含本人的申请
+        """
+        condition = get_scope_resolver(user).filter_q(
+            'applicant__task_area_fk_id', owner_field='applicant_id' if include_own else None
+        )
+        return self.filter(condition).select_related('applicant', 'applicant__task_area_fk')
+
+    def approvable_by(self, user):
+        """用户当前可审批的申请（与 can_approve_application 规则一致）"""
+        return self.filter(approval_q(user)).select_related('applicant', 'applicant__task_area_fk')
+
+
+def approval_q(user):
+    """
+    审批权限的查询条件
+    任务区负责人审批本任务区待任务区审批的申请，总部负责人审批管辖任务区待总部审批的申请
+    """
+    resolver = get_scope_resolver(user)
+    if resolver.is_global:
+        return models.Q(pk__isnull=False)
+    if user.role == User.Role.TASK_AREA_MANAGER:
+        status = LeaveApplication.Status.PENDING_TASK_AREA
+    elif user.role == User.Role.HEAD_MANAGER:
+        status = LeaveApplication.Status.PENDING_HEAD
+    else:
+        return models.Q(pk__in=[])
+    return models.Q(status=status) & resolver.filter_q('applicant__task_area_fk_id')
+
+
 class LeaveApplication(models.Model):
     """
     请假申请模型
@@ -148,6 +185,8 @@ class LeaveApplication(models.Model):
         verbose_name='更新时间'
     )
     
+    objects = LeaveApplicationQuerySet.as_manager()
+    
     class Meta:
         verbose_name = '请假申请'
         verbose_name_plural = '请假申请'
@@ -411,3 +450,87 @@ class ApprovalRecord(models.Model):
     
     def __str__(self):
         return f"{self.approver.username if self.approver else '系统'} - {self.get_action_display()}"
+
+
+class ExportJob(models.Model):
+    """
+    后台导出任务
+    由 run_export_jobs 命令在进程池中执行，生成的文件保存在 MEDIA_ROOT/exports/ 下；
+    导出范围、筛选条件和数据版本都相同的请求共用同一个任务（cache_key 相同）
+    """
+    
+    class ExportType(models.TextChoices):
+        LEAVE_RECORDS = 'leave_records', _('休假记录')
+    
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('排队中')
+        RUNNING = 'running', _('导出中')
+        COMPLETED = 'completed', _('已完成')
+        FAILED = 'failed', _('失败')
+    
+    export_type = models.CharField(
+        max_length=30,
+        choices=ExportType.choices,
+        verbose_name='导出类型'
+    )
+    
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='export_jobs',
+        verbose_name='请求人'
+    )
+    
+    title = models.CharField(max_length=200, verbose_name='标题')
+    
+    # 导出范围和筛选条件，由 leave_management.exports 生成和解释
+    params = models.JSONField(default=dict, blank=True, verbose_name='导出参数')
+    
+    cache_key = models.CharField(max_length=64, db_index=True, verbose_name='缓存键')
+    
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='状态'
+    )
+    
+    # 进度
+    progress = models.PositiveIntegerField(default=0, verbose_name='已导出行数')
+    total_rows = models.PositiveIntegerField(default=0, verbose_name='总行数')
+    
+    file = models.FileField(upload_to='exports/', blank=True, verbose_name='导出文件')
+    error = models.TextField(blank=True, verbose_name='错误信息')
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+    
+    class Meta:
+        verbose_name = '导出任务'
+        verbose_name_plural = '导出任务'
+        db_table = 'export_jobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.title} - {self.get_status_display()}"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.COMPLETED, self.Status.FAILED)
+    
+    @property
+    def progress_percent(self):
+        if self.status == self.Status.COMPLETED:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(int(self.progress * 100 / self.total_rows), 99)
+    
+    @property
+    def artifact_available(self):
+        """导出文件是否可用（已完成且文件仍存在）"""
+        return (
+            self.status == self.Status.COMPLETED and bool(self.file)
+            and self.file.storage.exists(self.file.name)
+        )
@@ -0,0 +1,123 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from accounts.models import TaskArea, User
+from dashboard.stats import get_leave_scope, get_leave_stats
+
+from .exports import leave_export_params, leave_export_queryset, request_leave_export
+from .models import LeaveApplication
+from .views import can_approve_application, filter_approvable
+
+
+def create_application(applicant, status=LeaveApplication.Status.PENDING_TASK_AREA):
+    return LeaveApplication.objects.create(
+        applicant=applicant,
+        leave_start_date=date(2025, 3, 1),
+        leave_end_date=date(2025, 3, 10),
+        leave_location='北京',
+        leave_reason='休假',
+        status=status,
+    )
+
+
+class UnassignedManagerScopeTests(TestCase):
+    """未分配任务区的任务区负责人：列表、审批、导出与仪表盘统计口径一致"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        area = TaskArea.objects.create(name='一区')
+        self.manager = User.objects.create_user(username='manager', role=User.Role.TASK_AREA_MANAGER)
+        unassigned = User.objects.create_user(username='unassigned', role=User.Role.EMPLOYEE)
+        assigned = User.objects.create_user(username='assigned', role=User.Role.EMPLOYEE, task_area_fk=area)
+        self.own = create_application(unassigned)
+        create_application(assigned)
+
+    def test_lists_applicants_without_task_area(self):
+        visible = LeaveApplication.objects.visible_to(self.manager, include_own=False)
+        self.assertEqual(list(visible), [self.own])
+        self.assertEqual(list(LeaveApplication.objects.approvable_by(self.manager)), [self.own])
+        self.assertTrue(can_approve_application(self.manager, self.own))
+
+    def test_export_and_dashboard_match_list(self):
+        exported = leave_export_queryset(leave_export_params(self.manager))
+        self.assertEqual(list(exported), [self.own])
+
+        stats = get_leave_stats(get_leave_scope(self.manager))
+        self.assertEqual(stats['pending_applications'], 1)
+        self.assertEqual(stats['total_applications'], 1)
+
+
+class FilterApprovableTests(TestCase):
+    """批量审批权限与逐条检查（can_approve_application）一致，无权限的申请ID单独返回"""
+
+    def setUp(self):
+        self.area = TaskArea.objects.create(name='一区')
+        other_area = TaskArea.objects.create(name='二区')
+        self.manager = User.objects.create_user(
+            username='manager', role=User.Role.TASK_AREA_MANAGER, task_area_fk=self.area
+        )
+        self.head = User.objects.create_user(username='head', role=User.Role.HEAD_MANAGER)
+        self.head.managed_task_areas.add(self.area)
+        local = User.objects.create_user(username='local', role=User.Role.EMPLOYEE, task_area_fk=self.area)
+        remote = User.objects.create_user(username='remote', role=User.Role.EMPLOYEE, task_area_fk=other_area)
+        self.pending_local = create_application(local)
+        self.pending_head = create_application(local, status=LeaveApplication.Status.PENDING_HEAD)
+        self.pending_remote = create_application(remote)
+        self.draft_local = create_application(local, status=LeaveApplication.Status.DRAFT)
+
+    def assertSplit(self, user, allowed, denied):
+        approvable, denied_ids = filter_approvable(user, LeaveApplication.objects.all())
+        self.assertEqual(set(approvable), set(allowed))
+        self.assertEqual(denied_ids, {application.pk for application in denied})
+        for application in LeaveApplication.objects.all():
+            self.assertEqual(can_approve_application(user, application), application in allowed)
+
+    def test_task_area_manager(self):
+        self.assertSplit(
+            self.manager,
+            allowed=[self.pending_local],
+            denied=[self.pending_head, self.pending_remote, self.draft_local],
+        )
+
+    def test_head_manager(self):
+        self.assertSplit(
+            self.head,
+            allowed=[self.pending_head],
+            denied=[self.pending_local, self.pending_remote, self.draft_local],
+        )
+
+    def test_employee_is_denied_everything(self):
+        employee = self.pending_local.applicant
+        approvable, denied_ids = filter_approvable(employee, LeaveApplication.objects.all())
+        self.assertFalse(approvable.exists())
+        self.assertEqual(denied_ids, set(LeaveApplication.objects.values_list('pk', flat=True)))
+
+
+class LeaveExportCacheKeyTests(TestCase):
+    """导出任务按缓存键复用，任务区或申请人改名后不再复用旧的导出"""
+
+    def setUp(self):
+        self.area = TaskArea.objects.create(name='一区')
+        self.admin = User.objects.create_user(username='admin', role=User.Role.SUPERUSER)
+        self.applicant = User.objects.create_user(
+            username='applicant', first_name='三', last_name='张', task_area_fk=self.area
+        )
+        create_application(self.applicant)
+
+    def test_unchanged_data_reuses_job(self):
+        self.assertEqual(request_leave_export(self.admin), request_leave_export(self.admin))
+
+    def test_task_area_rename_creates_new_job(self):
+        job = request_leave_export(self.admin)
+        self.area.name = '新一区'
+        self.area.save()
+        self.assertNotEqual(request_leave_export(self.admin).cache_key, job.cache_key)
+
+    def test_applicant_rename_creates_new_job(self):
+        job = request_leave_export(self.admin)
+        self.applicant.first_name = '四'
+        self.applicant.save()
+        self.assertNotEqual(request_leave_export(self.admin).cache_key, job.cache_key)
@@ -20,4 +20,6 @@ urlpatterns = [
     # 仪表板和导出
     path('dashboard/', views.leave_management_dashboard, name='dashboard'),
     path('export/', views.export_leave_records, name='export'),
+    path('export/jobs/<int:job_id>/', views.export_job_detail, name='export_job'),
+    path('export/jobs/<int:job_id>/download/', views.export_job_download, name='export_job_download'),
 ]
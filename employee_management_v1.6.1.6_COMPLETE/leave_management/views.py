@@ -4,20 +4,26 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse, FileResponse
 from django.utils import timezone
 from django.db.models import Q
 from django.core.paginator import Paginator
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-from datetime import datetime
+from django.conf import settings
+from django.urls import reverse
 import json
 
-from .models import LeaveApplication, FlightSegment, ApprovalRecord
+from .models import LeaveApplication, FlightSegment, ApprovalRecord, ExportJob, approval_q
 from .forms import LeaveApplicationForm, ApprovalForm, CancellationForm
-from accounts.permissions import role_required
+from .exports import (
+    XLSX_CONTENT_TYPE, can_access_export_job, request_leave_export, run_export_job,
+)
+from accounts.permissions import role_required, split_by_permission
+from accounts.scope import get_scope_resolver
 from accounts.models import User
 
+# 是否由后台任务执行导出（False 时在请求内执行，仍复用已生成的文件）
+EXPORT_JOBS_ASYNC = getattr(settings, 'EXPORT_JOBS_ASYNC', True)
+
 
 @login_required
 def my_applications(request):
@@ -179,27 +185,13 @@ def application_detail(request, application_id):
 def pending_approvals(request):
     """待审批列表"""
     # 根据角色获取待审批列表
-    if request.user.role == User.Role.TASK_AREA_MANAGER:
-        # 任务区负责人：待任务区审批的申请
-        applications = LeaveApplication.objects.filter(
-            status=LeaveApplication.Status.PENDING_TASK_AREA,
-            applicant__task_area_fk=request.user.task_area_fk
-        )
-    elif request.user.role == User.Role.HEAD_MANAGER:
-        # 总部负责人：待总部审批的申请
-        managed_areas = request.user.managed_task_areas.all()
-        applications = LeaveApplication.objects.filter(
-            status=LeaveApplication.Status.PENDING_HEAD,
-            applicant__task_area_fk__in=managed_areas
-        )
-    else:
-        # 超级管理员：所有待审批
-        applications = LeaveApplication.objects.filter(
-            status__in=[
-                LeaveApplication.Status.PENDING_TASK_AREA,
-                LeaveApplication.Status.PENDING_HEAD
-            ]
-        )
+    # 任务区负责人：待任务区审批的申请；总部负责人：待总部审批的申请；超级管理员：所有待审批
+    applications = LeaveApplication.objects.approvable_by(request.user).filter(
+        status__in=[
+            LeaveApplication.Status.PENDING_TASK_AREA,
+            LeaveApplication.Status.PENDING_HEAD
+        ]
+    )
     
     applications = applications.order_by('-created_at')
     
@@ -346,17 +338,7 @@ def leave_management_dashboard(request):
     from accounts.models import TaskArea
     
     # 根据角色获取数据
-    if request.user.role == User.Role.TASK_AREA_MANAGER:
-        base_query = LeaveApplication.objects.filter(
-            applicant__task_area_fk=request.user.task_area_fk
-        )
-    elif request.user.role == User.Role.HEAD_MANAGER:
-        managed_areas = request.user.managed_task_areas.all()
-        base_query = LeaveApplication.objects.filter(
-            applicant__task_area_fk__in=managed_areas
-        )
-    else:
-        base_query = LeaveApplication.objects.all()
+    base_query = LeaveApplication.objects.visible_to(request.user, include_own=False)
     
     # 获取筛选参数（仅对超级管理员和总部负责人有效）
     task_area_filter = request.GET.get('task_area', '')
@@ -438,119 +420,67 @@ def leave_management_dashboard(request):
 @login_required
 @role_required([User.Role.TASK_AREA_MANAGER, User.Role.HEAD_MANAGER, User.Role.SUPERUSER])
 def export_leave_records(request):
-    """导出休假记录为Excel"""
-    # 根据角色获取数据
-    if request.user.role == User.Role.TASK_AREA_MANAGER:
-        applications = LeaveApplication.objects.filter(
-            applicant__task_area_fk=request.user.task_area_fk
-        )
-        task_area_name = request.user.task_area_fk.name if request.user.task_area_fk else '未知任务区'
-    elif request.user.role == User.Role.HEAD_MANAGER:
-        managed_areas = request.user.managed_task_areas.all()
-        applications = LeaveApplication.objects.filter(
-            applicant__task_area_fk__in=managed_areas
-        )
-        task_area_name = '所有管辖任务区'
-    else:
-        applications = LeaveApplication.objects.all()
-        task_area_name = '所有任务区'
-    
-    applications = applications.order_by('-created_at')
-    
-    # 创建 Excel 工作簿
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = '休假记录'
-    
-    # 设置标题
-    ws.merge_cells('A1:K1')
-    title_cell = ws['A1']
-    title_cell.value = f'{task_area_name}休假情况'
-    title_cell.font = Font(size=16, bold=True)
-    title_cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # 设置表头
-    headers = ['姓名', '任务区', '请假开始日期', '请假结束日期', 
-               '休假天数', '休假地点', '申请日期', '审批状态', 
-               '任务区负责人审批', '总部负责人审批', '备注']
-    
-    header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=2, column=col_num)
-        cell.value = header
-        cell.font = Font(bold=True, color='FFFFFF')
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # 填充数据
-    for row_num, app in enumerate(applications, 3):
-        ws.cell(row=row_num, column=1).value = f"{app.applicant.last_name}{app.applicant.first_name}"
-        ws.cell(row=row_num, column=2).value = app.applicant.task_area_fk.name if app.applicant.task_area_fk else '未设置'
-        ws.cell(row=row_num, column=3).value = app.leave_start_date.strftime('%Y-%m-%d')
-        ws.cell(row=row_num, column=4).value = app.leave_end_date.strftime('%Y-%m-%d')
-        ws.cell(row=row_num, column=5).value = app.duration_days
-        ws.cell(row=row_num, column=6).value = app.leave_location
-        ws.cell(row=row_num, column=7).value = app.application_date.strftime('%Y-%m-%d %H:%M')
-        ws.cell(row=row_num, column=8).value = app.get_status_display()
-        
-        # 审批信息
-        if app.task_area_manager_approved:
-            approver_name = app.task_area_manager_approver.username if app.task_area_manager_approver else '未知'
-            approval_date = app.task_area_manager_approval_date.strftime('%Y-%m-%d') if app.task_area_manager_approval_date else ''
-            ws.cell(row=row_num, column=9).value = f"{approver_name} ({approval_date})"
-        else:
-            ws.cell(row=row_num, column=9).value = '未审批'
-        
-        if app.head_manager_approved:
-            approver_name = app.head_manager_approver.username if app.head_manager_approver else '未知'
-            approval_date = app.head_manager_approval_date.strftime('%Y-%m-%d') if app.head_manager_approval_date else ''
-            ws.cell(row=row_num, column=10).value = f"{approver_name} ({approval_date})"
-        else:
-            ws.cell(row=row_num, column=10).value = '未审批'
-        
-        # 备注
-        if app.status == LeaveApplication.Status.REJECTED:
-            ws.cell(row=row_num, column=11).value = f"拒绝原因：{app.rejection_reason}"
-        elif app.status == LeaveApplication.Status.CANCELLED:
-            ws.cell(row=row_num, column=11).value = f"取消原因：{app.cancellation_reason}"
-        elif app.is_on_leave:
-            ws.cell(row=row_num, column=11).value = '正在休假'
-        elif app.is_planned_leave:
-            ws.cell(row=row_num, column=11).value = '计划休假'
-    
-    # 调整列宽
-    from openpyxl.cell import MergedCell
-    for col_idx, col in enumerate(ws.columns, 1):
-        max_length = 0
-        # 获取列字母（A, B, C等）
-        from openpyxl.utils import get_column_letter
-        column_letter = get_column_letter(col_idx)
-        
-        for cell in col:
-            # 跳过合并单元格
-            if isinstance(cell, MergedCell):
-                continue
-            try:
-                if cell.value:
-                    cell_length = len(str(cell.value))
-                    if cell_length > max_length:
-                        max_length = cell_length
-            except:
-                pass
-        
-        # 设置列宽，最小10，最大50
-        adjusted_width = min(max(max_length + 2, 10), 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # 生成响应
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    filename = f"{task_area_name}休假情况_{datetime.now().strftime('%Y%m%d')}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    """
+    导出休假记录为Excel
+    导出在后台任务中执行（run_export_jobs 命令），相同范围且数据未变化时直接返回已生成的文件
+    """
+    job = request_leave_export(request.user)
+    if job.status == ExportJob.Status.PENDING and not EXPORT_JOBS_ASYNC:
+        # 未启用后台任务时在请求内执行
+        run_export_job(job.pk)
+        job.refresh_from_db()
+    
+    if job.artifact_available:
+        return export_file_response(job)
+    return redirect('leave_management:export_job', job_id=job.pk)
+
+
+@login_required
+@role_required([User.Role.TASK_AREA_MANAGER, User.Role.HEAD_MANAGER, User.Role.SUPERUSER])
+def export_job_detail(request, job_id):
+    """导出任务进度（页面或 JSON）"""
+    job = get_object_or_404(ExportJob, id=job_id)
+    if not can_access_export_job(request.user, job):
+        messages.error(request, '您没有权限查看此导出任务')
+        return redirect('leave_management:dashboard')
+    
+    download_url = reverse('leave_management:export_job_download', args=[job.pk]) if job.artifact_available else None
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'progress': job.progress,
+            'total_rows': job.total_rows,
+            'percent': job.progress_percent,
+            'download_url': download_url,
+            'error': job.error if job.status == ExportJob.Status.FAILED else '',
+        })
     
-    wb.save(response)
-    return response
+    context = {
+        'job': job,
+        'download_url': download_url,
+    }
+    return render(request, 'leave_management/export_job.html', context)
+
+
+@login_required
+@role_required([User.Role.TASK_AREA_MANAGER, User.Role.HEAD_MANAGER, User.Role.SUPERUSER])
+def export_job_download(request, job_id):
+    """下载导出任务生成的文件"""
+    job = get_object_or_404(ExportJob, id=job_id)
+    if not can_access_export_job(request.user, job):
+        messages.error(request, '您没有权限下载此文件')
+        return redirect('leave_management:dashboard')
+    if not job.artifact_available:
+        messages.error(request, '导出文件不存在，请重新导出')
+        return redirect('leave_management:dashboard')
+    return export_file_response(job)
+
+
+def export_file_response(job):
+    """以附件形式分块返回导出文件"""
+    filename = f"{job.title}_{timezone.localtime(job.completed_at).strftime('%Y%m%d')}.xlsx"
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
 
 
 # 辅助函数
@@ -577,21 +507,16 @@ def get_head_manager(user):
 def can_view_application(user, application):
     """检查用户是否可以查看申请"""
     # 申请人自己
-    if user == application.applicant:
+    if user.id == application.applicant_id:
         return True
     
     # 超级管理员
     if user.role == User.Role.SUPERUSER:
         return True
     
-    # 任务区负责人
-    if user.role == User.Role.TASK_AREA_MANAGER:
-        return application.applicant.task_area_fk == user.task_area_fk
-    
-    # 总部负责人
-    if user.role == User.Role.HEAD_MANAGER:
-        managed_areas = user.managed_task_areas.all()
-        return application.applicant.task_area_fk in managed_areas
+    # 任务区负责人、总部负责人
+    if user.role in (User.Role.TASK_AREA_MANAGER, User.Role.HEAD_MANAGER):
+        return get_scope_resolver(user).can_access_task_area(application.applicant.task_area_fk_id)
     
     return False
 
@@ -606,20 +531,27 @@ def can_approve_application(user, application):
     if user.role == User.Role.TASK_AREA_MANAGER:
         return (
             application.status == LeaveApplication.Status.PENDING_TASK_AREA and
-            application.applicant.task_area_fk == user.task_area_fk
+            get_scope_resolver(user).can_access_task_area(application.applicant.task_area_fk_id)
         )
     
     # 总部负责人
     if user.role == User.Role.HEAD_MANAGER:
-        managed_areas = user.managed_task_areas.all()
         return (
             application.status == LeaveApplication.Status.PENDING_HEAD and
-            application.applicant.task_area_fk in managed_areas
+            get_scope_resolver(user).manages_task_area(application.applicant.task_area_fk_id)
         )
     
     return False
 
 
+def filter_approvable(user, queryset):
+    """
+    批量检查审批权限（与 can_approve_application 及 LeaveApplication.objects.approvable_by 规则一致）
+    返回 (可审批的查询集, 无权限的申请ID集合)，供批量审批使用
+    """
+    return split_by_permission(queryset, approval_q(user))
+
+
 def can_cancel_application(user, application):
     """检查用户是否可以取消申请"""
     # 只有申请人自己可以取消
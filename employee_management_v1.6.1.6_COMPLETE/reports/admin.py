@@ -1,8 +1,16 @@
 from django.contrib import admin
-from .models import Report
+from .models import Report, RetentionPurge
 
 @admin.register(Report)
 class ReportAdmin(admin.ModelAdmin):
     list_display = ('uploader', 'report_type', 'upload_date')
     list_filter = ('report_type', 'upload_date')
     search_fields = ('uploader__username',)
+
+
+@admin.register(RetentionPurge)
+class RetentionPurgeAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'dry_run', 'cutoff', 'status', 'deleted_reports', 'reclaimed_bytes')
+    list_filter = ('status', 'dry_run')
+    readonly_fields = ('last_report_id', 'deleted_reports', 'deleted_files', 'failed_files',
+                       'reclaimed_bytes', 'task_area_stats', 'error', 'started_at', 'completed_at')
@@ -4,3 +4,6 @@ class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reports'
     verbose_name = '工作报告'
+
+    def ready(self):
+        from . import signals  # noqa: F401
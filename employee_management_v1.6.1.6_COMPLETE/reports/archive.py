@@ -0,0 +1,211 @@
+"""
+报告 ZIP 打包
+
+边读文件边生成 ZIP 数据块，不在内存中缓存整个压缩包：
+直接下载时作为 StreamingHttpResponse 的内容，生成下载包时逐块写入文件。
+pdf/docx/xlsx/pptx 本身已经是压缩格式，使用 STORE 方式存储，不再重复压缩。
+
+源文件由线程池预读（最多预读 READ_AHEAD_WORKERS * 2 个文件，单个文件不超过
+READ_AHEAD_MAX_SIZE），压缩当前文件的同时读取后面的文件；较大的文件仍然边读边压缩。
+
+响应头发出后无法再返回错误页面，打包前由调用方用 missing_reports 检查文件；
+打包过程中才丢失的文件跳过并记录日志，不中断压缩包。
+"""
+import logging
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 本身已压缩的格式
+STORED_EXTENSIONS = {'.pdf', '.docx', '.xlsx', '.pptx'}
+
+# 读取源文件的块大小
+CHUNK_SIZE = 64 * 1024
+
+# 预读线程数（0 表示不预读，按顺序读取）
+READ_AHEAD_WORKERS = 4
+
+# 超过该大小的文件不预读到内存
+READ_AHEAD_MAX_SIZE = 8 * 1024 * 1024
+
+
+def compression_for(filename):
+    """根据扩展名选择压缩方式"""
+    if os.path.splitext(filename)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _StreamBuffer:
+    """zipfile 的输出目标：只追加、不可定位，写入的数据由 drain() 取走"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        if data:
+            self._chunks.append(bytes(data))
+            self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def report_entries(reports):
+    """报告对应的压缩包条目：(压缩包内文件名, FieldFile, 修改时间)，跳过没有文件的报告"""
+    for report in reports:
+        if report.file:
+            yield report.archive_name(), report.file, report.updated_at or report.upload_date
+
+
+def missing_reports(reports):
+    """文件已不存在的报告"""
+    return [report for report in reports if report.file and not report.file.storage.exists(report.file.name)]
+
+
+def _source_size(source):
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    return source.size
+
+
+def _open_source(source):
+    if isinstance(source, str):
+        return open(source, 'rb')
+    return source.open('rb')
+
+
+def _read_small(source, max_size):
+    """读取不超过 max_size 的文件，返回 (大小, 内容)；较大的文件内容为 None"""
+    size = _source_size(source)
+    if size > max_size:
+        return size, None
+    with _open_source(source) as source_file:
+        content = source_file.read()
+    return len(content), content
+
+
+def _read_ahead(entries, workers, max_size):
+    """
+    按原顺序返回 (压缩包内文件名, 源文件, 修改时间, 大小, 内容)
+    线程池提前读取后面的文件，同时排队的读取不超过 workers * 2 个
+    """
+    window = workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for arcname, source, modified in entries:
+            pending.append((arcname, source, modified, pool.submit(_read_small, source, max_size)))
+            if len(pending) >= window:
+                yield from _completed(*pending.popleft())
+        while pending:
+            yield from _completed(*pending.popleft())
+
+
+def _completed(arcname, source, modified, future):
+    """预读结果，文件不存在时跳过"""
+    try:
+        size, content = future.result()
+    except FileNotFoundError as e:
+        _skip_missing(arcname, e)
+        return
+    yield arcname, source, modified, size, content
+
+
+def _read_serial(entries):
+    for arcname, source, modified in entries:
+        try:
+            size = _source_size(source)
+        except FileNotFoundError as e:
+            _skip_missing(arcname, e)
+            continue
+        yield arcname, source, modified, size, None
+
+
+def _skip_missing(arcname, error):
+    logger.error(f"打包时文件不存在，已跳过 {arcname}: {error}")
+
+
+def iter_zip(entries, chunk_size=CHUNK_SIZE, read_ahead=READ_AHEAD_WORKERS, read_ahead_max_size=READ_AHEAD_MAX_SIZE):
+    """
+    逐块生成 ZIP 数据
+    entries: (压缩包内文件名, FieldFile 或文件路径, 修改时间) 的可迭代对象
+    read_ahead: 预读线程数，0 表示按顺序读取
+    """
+    if read_ahead > 0:
+        sources = _read_ahead(entries, read_ahead, read_ahead_max_size)
+    else:
+        sources = _read_serial(entries)
+
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', allowZip64=True) as archive:
+        for arcname, source, modified, size, content in sources:
+            source_file = None
+            if content is None:
+                # 写入文件头之前打开，文件不存在时跳过，不留下不完整的条目
+                try:
+                    source_file = _open_source(source)
+                except FileNotFoundError as e:
+                    _skip_missing(arcname, e)
+                    continue
+            info = zipfile.ZipInfo(arcname, date_time=_zip_date_time(modified))
+            info.compress_type = compression_for(arcname)
+            # 预先给出文件大小，超过 4GB 时 zipfile 会使用 ZIP64
+            info.file_size = size
+            with archive.open(info, 'w') as target:
+                if content is not None:
+                    view = memoryview(content)
+                    for offset in range(0, len(view), chunk_size):
+                        target.write(view[offset:offset + chunk_size])
+                        pending = buffer.drain()
+                        if pending:
+                            yield pending
+                else:
+                    with source_file:
+                        while True:
+                            data = source_file.read(chunk_size)
+                            if not data:
+                                break
+                            target.write(data)
+                            pending = buffer.drain()
+                            if pending:
+                                yield pending
+            pending = buffer.drain()
+            if pending:
+                yield pending
+    # 中央目录在关闭压缩包时写出
+    pending = buffer.drain()
+    if pending:
+        yield pending
+
+
+def write_zip(fileobj, entries, chunk_size=CHUNK_SIZE, read_ahead=READ_AHEAD_WORKERS):
+    """将 ZIP 逐块写入文件对象，返回写入的字节数"""
+    size = 0
+    for data in iter_zip(entries, chunk_size, read_ahead):
+        fileobj.write(data)
+        size += len(data)
+    return size
+
+
+def _zip_date_time(value):
+    if value is None:
+        value = timezone.now()
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    # ZIP 格式不支持 1980 年以前的时间
+    return max(value.timetuple()[:6], (1980, 1, 1, 0, 0, 0))
@@ -0,0 +1,130 @@
+"""
+按内容存储报告文件
+
+报告文件以 SHA-256 命名保存在 reports/blobs/ 下（按哈希前缀分两级子目录），
+内容相同的文件只保存一份，由 ReportBlob 记录引用数。Report 保存新文件时引用
+（store_blob），报告删除或更换文件时释放（release_blob），引用数降为0时才删除文件。
+"""
+import hashlib
+import os
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import BLOB_DIRECTORY, Report, ReportBlob
+from .storage import shard_path
+
+HASH_BUFFER_SIZE = 64 * 1024
+
+
+def hash_file(content):
+    """流式计算文件的 SHA-256，返回 (十六进制摘要, 大小)"""
+    digest = hashlib.sha256()
+    size = 0
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    while True:
+        data = content.read(HASH_BUFFER_SIZE)
+        if not data:
+            break
+        digest.update(data)
+        size += len(data)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest(), size
+
+
+def blob_name(sha256, filename):
+    """内容文件的存储路径：reports/blobs/<sha256前2位>/<3-4位>/<sha256>.<扩展名>"""
+    extension = os.path.splitext(filename)[1].lower()
+    return shard_path(f'{BLOB_DIRECTORY}{sha256}{extension}', key=sha256)
+
+
+def _storage():
+    return ReportBlob._meta.get_field('file').storage
+
+
+def _write_blob_file(content, sha256, size, filename):
+    """写入内容文件（已存在相同大小的文件时直接使用），返回存储路径"""
+    storage = _storage()
+    name = blob_name(sha256, filename)
+    if storage.exists(name):
+        if storage.size(name) == size:
+            return name
+        storage.delete(name)
+    return storage.save(name, content)
+
+
+def _stored_info(name):
+    """内容文件在磁盘上的大小和压缩方式"""
+    storage = _storage()
+    return {
+        'stored_size': storage.stored_size(name),
+        'compression': storage.compression(name) or '',
+    }
+
+
+def store_blob(content, filename):
+    """
+    保存文件内容并增加引用数，返回 ReportBlob
+    相同内容已存在时不再写入文件
+    """
+    sha256, size = hash_file(content)
+    while True:
+        blob = ReportBlob.objects.filter(sha256=sha256).first()
+        if blob is None:
+            name = _write_blob_file(content, sha256, size, filename)
+            blob, created = ReportBlob.objects.get_or_create(
+                sha256=sha256, defaults={'file': name, 'size': size, **_stored_info(name)}
+            )
+            if not created and blob.file.name != name:
+                # 并发上传相同内容时，另一个请求已经创建了记录
+                _storage().delete(name)
+        elif not blob.file.storage.exists(blob.file.name):
+            # 文件丢失时用本次上传的内容恢复
+            blob.file.name = _write_blob_file(content, sha256, size, filename)
+            for field, value in _stored_info(blob.file.name).items():
+                setattr(blob, field, value)
+            blob.save(update_fields=['file', 'stored_size', 'compression'])
+
+        # 条件更新：记录在此期间被 release_blob 删除时重试
+        if ReportBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1):
+            blob.ref_count += 1
+            return blob
+
+
+def release_blob(blob_id):
+    """减少引用数，降为0时删除记录，并在事务提交后删除文件"""
+    with transaction.atomic():
+        blob = ReportBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1 or blob.reports.exists():
+            ReportBlob.objects.filter(pk=blob.pk, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+            return
+        name = blob.file.name
+        blob.delete()
+        transaction.on_commit(lambda: _storage().delete(name))
+
+
+def release_blobs(counts):
+    """
+    批量减少引用数（counts 为 {blob_id: 减少的引用数}，须在事务中调用，且调用前已解除报告的引用）
+    返回引用数降为0、已删除记录的内容 [(ID, 文件路径, 存储大小)]，文件由调用方在事务提交后删除
+    """
+    if not counts:
+        return []
+    blobs = list(ReportBlob.objects.select_for_update().filter(pk__in=counts).order_by('pk'))
+    still_referenced = set(
+        Report.objects.filter(blob_id__in=counts).values_list('blob_id', flat=True).distinct()
+    )
+    freed = []
+    for blob in blobs:
+        count = counts[blob.pk]
+        if blob.ref_count > count or blob.pk in still_referenced:
+            ReportBlob.objects.filter(pk=blob.pk).update(ref_count=Greatest(F('ref_count') - count, 0))
+        else:
+            freed.append((blob.pk, blob.file.name, blob.stored_size))
+    ReportBlob.objects.filter(pk__in=[blob_id for blob_id, _, _ in freed]).delete()
+    return freed
@@ -0,0 +1,161 @@
+"""
+报告提交情况矩阵
+
+行为权限范围内需要提交报告的用户（任务区负责人和普通员工），列为最近若干个周报或月报周期，
+单元格为已提交、逾期提交、未提交或未到期。提交记录由一次按 (上传人, 周期开始日期) 分组的
+查询得到（使用 period_start 索引）；结果按统计范围缓存，报告或用户变化时由 reports.signals
+递增相关任务区的版本号使缓存失效（见 accounts.cache_versions）。
+"""
+from datetime import timedelta
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min
+from django.utils import timezone
+
+from accounts.cache_versions import bump_versions, get_versions
+from accounts.models import User
+from accounts.scope import get_scope_resolver
+
+from .models import Report
+from .periods import recent_periods
+
+# 周期结束后允许提交的天数，之后提交的记为逾期
+GRACE_DAYS = getattr(settings, 'REPORT_SUBMISSION_GRACE_DAYS', 1)
+
+CACHE_TIMEOUT = getattr(settings, 'REPORT_COMPLIANCE_CACHE_TIMEOUT', 300)
+
+# 支持的报告类型（有固定周期）
+PERIODIC_TYPES = [Report.ReportType.WEEKLY, Report.ReportType.MONTHLY]
+
+SUBMITTED = 'submitted'
+LATE = 'late'
+MISSING = 'missing'
+PENDING = 'pending'
+
+STATUS_LABELS = {
+    SUBMITTED: '已提交',
+    LATE: '逾期提交',
+    MISSING: '未提交',
+    PENDING: '未到期',
+}
+
+GLOBAL_VERSION_KEY = 'reports:compliance:version:global'
+USERS_VERSION_KEY = 'reports:compliance:version:users'
+
+
+def _area_version_key(area_id):
+    return f'reports:compliance:version:area:{area_id}'
+
+
+def _scope_versions(scope):
+    """读取统计范围的缓存版本号（缺失时初始化）"""
+    keys = [USERS_VERSION_KEY]
+    if scope is None:
+        keys.append(GLOBAL_VERSION_KEY)
+    else:
+        keys.extend(_area_version_key(area_id) for area_id in scope)
+
+    return get_versions(keys)
+
+
+def _cache_key(scope, report_type, periods, today):
+    label = 'global' if scope is None else ','.join(str(area_id) for area_id in scope)
+    versions = ','.join(str(v) for v in _scope_versions(scope))
+    raw = f'{label}|{report_type}|{periods[0][0]}|{len(periods)}|{today}|{GRACE_DAYS}|{versions}'
+    return f'reports:compliance:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def get_compliance_scope(user, task_area_id=None):
+    """
+    统计范围：None 表示全局，否则为排序后的任务区ID元组
+    指定 task_area_id 时只统计该任务区（无权访问时为空范围）
+    """
+    resolver = get_scope_resolver(user)
+    if task_area_id:
+        return (task_area_id,) if resolver.can_access_task_area(task_area_id) else ()
+    if resolver.is_global:
+        return None
+    return tuple(sorted(resolver.task_area_ids))
+
+
+def cell_status(first_upload, end, today):
+    """单元格状态：first_upload 为该周期最早的上传时间（没有提交时为 None）"""
+    deadline = end + timedelta(days=GRACE_DAYS)
+    if first_upload is None:
+        return PENDING if today <= deadline else MISSING
+    return SUBMITTED if timezone.localdate(first_upload) <= deadline else LATE
+
+
+def compliance_matrix(scope, report_type, count, until=None):
+    """
+    计算提交情况矩阵
+    返回 {'periods': [{'period', 'start', 'end'}], 'rows': [{'user_id', 'name', 'task_area', 'cells', 'missing', 'late'}],
+    'totals': [{状态: 人数}]}，cells 与 periods 一一对应
+    """
+    today = timezone.localdate()
+    periods = recent_periods(report_type, count, until)
+    key = _cache_key(scope, report_type, periods, today)
+    matrix = cache.get(key)
+    if matrix is not None:
+        return matrix
+
+    users = User.objects.filter(
+        is_active=True,
+        role__in=[User.Role.TASK_AREA_MANAGER, User.Role.EMPLOYEE],
+        task_area_fk__isnull=False,
+    )
+    reports = Report.objects.filter(
+        report_type=report_type,
+        period_start__gte=periods[0][1],
+        period_start__lte=periods[-1][1],
+    )
+    if scope is not None:
+        users = users.filter(task_area_fk_id__in=scope)
+        reports = reports.filter(task_area_id__in=scope)
+
+    first_uploads = {
+        (row['uploader_id'], row['period_start']): row['first_upload']
+        for row in reports.values('uploader_id', 'period_start').annotate(first_upload=Min('upload_date'))
+    }
+
+    rows = []
+    totals = [{status: 0 for status in STATUS_LABELS} for _ in periods]
+    users = users.order_by('task_area_fk__name', 'last_name', 'first_name', 'username').values_list(
+        'id', 'username', 'last_name', 'first_name', 'task_area_fk__name'
+    )
+    for user_id, username, last_name, first_name, task_area_name in users:
+        cells = []
+        for index, (_, start, end) in enumerate(periods):
+            status = cell_status(first_uploads.get((user_id, start)), end, today)
+            cells.append(status)
+            totals[index][status] += 1
+        rows.append({
+            'user_id': user_id,
+            'name': f'{last_name}{first_name}' or username,
+            'task_area': task_area_name,
+            'cells': cells,
+            'missing': cells.count(MISSING),
+            'late': cells.count(LATE),
+        })
+
+    matrix = {
+        'periods': [{'period': period, 'start': start, 'end': end} for period, start, end in periods],
+        'rows': rows,
+        'totals': totals,
+    }
+    cache.set(key, matrix, CACHE_TIMEOUT)
+    return matrix
+
+
+def invalidate_compliance(area_ids=None, users=False):
+    """
+    报告或用户变化时使相关统计范围失效
+    递增涉及任务区及全局的版本号；users 为真时递增用户版本号（所有范围失效）
+    """
+    keys = [GLOBAL_VERSION_KEY]
+    keys.extend(_area_version_key(area_id) for area_id in set(area_ids or []) if area_id)
+    if users:
+        keys.append(USERS_VERSION_KEY)
+    bump_versions(keys)
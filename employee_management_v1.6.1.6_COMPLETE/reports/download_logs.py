@@ -0,0 +1,140 @@
+"""
+报告下载日志（延迟批量写入）
+
+查看和下载报告时只把日志放入进程内的缓冲区，由后台线程每累积 DOWNLOAD_LOG_FLUSH_SIZE 条
+或每隔 DOWNLOAD_LOG_FLUSH_INTERVAL 秒用 bulk_create 写入一次，进程退出时写入剩余的日志，
+下载请求不再等待日志表的写入。日志在页面上最多延迟一个写入间隔显示。
+DOWNLOAD_LOG_BUFFERED 为 False 时逐条同步写入。
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections
+from django.utils import timezone
+
+from accounts.models import User
+
+from .models import Report, ReportDownloadLog
+
+logger = logging.getLogger(__name__)
+
+BUFFERED = getattr(settings, 'DOWNLOAD_LOG_BUFFERED', True)
+FLUSH_SIZE = getattr(settings, 'DOWNLOAD_LOG_FLUSH_SIZE', 100)
+FLUSH_INTERVAL = getattr(settings, 'DOWNLOAD_LOG_FLUSH_INTERVAL', 5.0)
+
+# 数据库不可用时缓冲区的上限，超出的日志丢弃并记录错误
+MAX_PENDING = 10000
+
+
+class DownloadLogBuffer:
+    """进程内的下载日志缓冲区"""
+
+    def __init__(self, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._pid = None
+        self._stopped = False
+
+    def add(self, entry):
+        with self._condition:
+            self._ensure_worker()
+            self._pending.append(entry)
+            if len(self._pending) >= self.flush_size:
+                self._condition.notify()
+
+    def flush(self):
+        """立即写入缓冲区中的日志，写入失败（日志放回缓冲区）时返回 False"""
+        with self._condition:
+            entries, self._pending = self._pending, []
+        if not entries:
+            return True
+        with self._flush_lock:
+            try:
+                self._write(entries)
+                return True
+            except Exception as e:
+                logger.error(f"写入下载日志失败: {e}")
+                with self._condition:
+                    self._pending[:0] = entries
+                    dropped = len(self._pending) - MAX_PENDING
+                    if dropped > 0:
+                        del self._pending[:dropped]
+                        logger.error(f"下载日志缓冲区已满，丢弃 {dropped} 条日志")
+                return False
+
+    def shutdown(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self.flush()
+
+    def _write(self, entries):
+        try:
+            ReportDownloadLog.objects.bulk_create(entries, batch_size=self.flush_size)
+        except IntegrityError:
+            # 期间被删除的报告或用户（日志随之删除），其余日志照常写入
+            reports = set(
+                Report.objects.filter(id__in={entry.report_id for entry in entries}).values_list('id', flat=True)
+            )
+            users = set(
+                User.objects.filter(id__in={entry.downloader_id for entry in entries}).values_list('id', flat=True)
+            )
+            ReportDownloadLog.objects.bulk_create(
+                [entry for entry in entries if entry.report_id in reports and entry.downloader_id in users],
+                batch_size=self.flush_size,
+            )
+
+    def _ensure_worker(self):
+        # 工作线程不会随 fork 复制，子进程（如 gunicorn worker）首次使用时重新启动
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pending = []
+        self._stopped = False
+        threading.Thread(target=self._run, name='download-log-writer', daemon=True).start()
+
+    def _run(self):
+        try:
+            while True:
+                with self._condition:
+                    if len(self._pending) < self.flush_size and not self._stopped:
+                        self._condition.wait(self.flush_interval)
+                    stopped = self._stopped
+                # 线程长期持有连接，与请求结束时一样关闭已失效或超过 CONN_MAX_AGE 的连接
+                close_old_connections()
+                if not self.flush():
+                    # 连接可能已断开（数据库重启、空闲超时），关闭后下次写入重新连接
+                    connections.close_all()
+                if stopped:
+                    break
+        finally:
+            connections.close_all()
+
+
+_buffer = DownloadLogBuffer()
+atexit.register(_buffer.shutdown)
+
+
+def record_download(report, user, ip_address):
+    """记录一次查看或下载"""
+    entry = ReportDownloadLog(
+        report_id=report.id,
+        downloader_id=user.id,
+        ip_address=ip_address,
+        download_time=timezone.now(),
+    )
+    if BUFFERED:
+        _buffer.add(entry)
+    else:
+        entry.save()
+
+
+def flush_download_logs():
+    """立即写入缓冲区中的日志"""
+    _buffer.flush()
@@ -0,0 +1,165 @@
+"""
+文件下载响应
+
+支持断点续传：Range（单个范围）和 If-Range，ETag 由文件名、大小和修改时间生成，
+If-None-Match / If-Modified-Since 命中时返回 304。
+配置 FILE_DOWNLOAD_OFFLOAD 后，权限检查通过后只返回 X-Accel-Redirect / X-Sendfile 头，
+文件由前端服务器发送（Range 请求也由前端服务器处理），不占用 Django 工作进程；
+压缩存储的文件（见 reports.storage）仍由 Django 边解压边发送。
+"""
+import hashlib
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_validators(fieldfile):
+    """返回 (ETag, 最后修改时间戳)，存储不支持修改时间时时间戳为 None"""
+    try:
+        modified = fieldfile.storage.get_modified_time(fieldfile.name).timestamp()
+    except (NotImplementedError, OSError):
+        modified = None
+    digest = hashlib.sha1(f'{fieldfile.name}:{fieldfile.size}:{modified}'.encode()).hexdigest()
+    return f'"{digest}"', int(modified) if modified is not None else None
+
+
+def parse_range(header, size):
+    """
+    解析 Range 头，返回 (起始位置, 结束位置)（包含结束位置）
+    无法解析或包含多个范围时返回 None（返回完整文件），范围超出文件大小时抛出 ValueError
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            raise ValueError(header)
+        end = int(last) if last else size - 1
+        return start, min(end, size - 1)
+    # bytes=-N：最后 N 个字节
+    suffix = int(last)
+    if suffix == 0 or size == 0:
+        raise ValueError(header)
+    return max(size - suffix, 0), size - 1
+
+
+def is_resumed(request):
+    """是否为从文件中间开始的续传请求（用于避免重复记录下载日志）"""
+    match = RANGE_RE.match(request.META.get('HTTP_RANGE', '').strip())
+    return bool(match and match.group(1) and int(match.group(1)) > 0)
+
+
+def is_new_download(request, response):
+    """
+    file_response 的响应是否发送了文件开头（用于记录下载日志）
+    304 / 412 / 416 没有发送文件，断点续传的后续请求不重复记录
+    """
+    if response.status_code == 206:
+        return response['Content-Range'].startswith('bytes 0-')
+    if response.status_code != 200:
+        return False
+    if response.has_header('X-Accel-Redirect') or response.has_header('X-Sendfile'):
+        # Range 请求由前端服务器处理
+        return not is_resumed(request)
+    return True
+
+
+def _if_range_matches(request, etag, last_modified):
+    value = request.META.get('HTTP_IF_RANGE')
+    if value is None:
+        return True
+    if value.startswith(('"', 'W/')):
+        # If-Range 只接受强校验
+        return value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and last_modified is not None and last_modified <= date
+
+
+def _iter_range(fieldfile, start, end, chunk_size=CHUNK_SIZE):
+    f = fieldfile.storage.open(fieldfile.name, 'rb')
+    try:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def _offload_response(fieldfile, mode):
+    response = HttpResponse()
+    if mode == 'nginx':
+        prefix = getattr(settings, 'FILE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(fieldfile.name)
+    elif mode == 'sendfile':
+        response['X-Sendfile'] = fieldfile.path
+    else:
+        raise ValueError(f'不支持的 FILE_DOWNLOAD_OFFLOAD: {mode}')
+    return response
+
+
+def file_response(request, fieldfile, filename, content_type=None):
+    """以附件形式返回文件（支持条件请求、断点续传和前端服务器发送）"""
+    etag, last_modified = file_validators(fieldfile)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        # 304 / 412
+        return response
+
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    # 压缩存储的文件需要由 Django 解压后发送
+    compression = getattr(fieldfile.storage, 'compression', None)
+    compressed = bool(compression and compression(fieldfile.name))
+    offload = getattr(settings, 'FILE_DOWNLOAD_OFFLOAD', None)
+    if offload and not compressed:
+        response = _offload_response(fieldfile, offload)
+        response['Content-Type'] = content_type
+    else:
+        size = fieldfile.size
+        byte_range = None
+        if 'HTTP_RANGE' in request.META and _if_range_matches(request, etag, last_modified):
+            try:
+                byte_range = parse_range(request.META['HTTP_RANGE'], size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range is None and not compressed:
+            response = FileResponse(fieldfile.open('rb'), content_type=content_type)
+        elif byte_range is None:
+            response = StreamingHttpResponse(
+                _iter_range(fieldfile, 0, size - 1), content_type=content_type
+            )
+            response['Content-Length'] = str(size)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _iter_range(fieldfile, start, end), status=206, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
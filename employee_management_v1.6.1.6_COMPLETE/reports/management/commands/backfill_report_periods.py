@@ -0,0 +1,54 @@
+"""
+Django管理命令：根据报告周期回填周期开始和结束日期
+"""
+from django.core.management.base import BaseCommand
+
+from reports.models import Report
+from reports.periods import parse_period
+
+
+class Command(BaseCommand):
+    help = (
+        '解析 report_period，分批回填报告的 period_start 和 period_end（只更新有变化的记录），'
+        '可以中断后重新运行'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批处理的报告数（默认1000）',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = unparsed = 0
+        while True:
+            batch = list(
+                Report.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', 'report_period', 'period_start', 'period_end')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            changed = []
+            for report in batch:
+                period = parse_period(report.report_period)
+                if period is None:
+                    unparsed += 1
+                    period = (None, None)
+                if (report.period_start, report.period_end) != period:
+                    report.period_start, report.period_end = period
+                    changed.append(report)
+            if changed:
+                # bulk_update 不触发信号，提交情况矩阵的缓存在有效期后更新
+                Report.objects.bulk_update(changed, ['period_start', 'period_end'])
+                updated += len(changed)
+
+        if unparsed:
+            self.stderr.write(self.style.WARNING(f'{unparsed} 份报告的周期无法识别，周期日期为空'))
+        self.stdout.write(self.style.SUCCESS(f'已回填 {updated} 份报告的周期日期'))
@@ -0,0 +1,94 @@
+"""
+Django管理命令：批量下载打包性能测试
+"""
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reports.archive import READ_AHEAD_WORKERS, iter_zip, report_entries
+from reports.models import Report
+
+
+class _CountingSink:
+    """只统计字节数的输出目标"""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+class Command(BaseCommand):
+    help = '比较顺序读取与线程池预读生成 ZIP 的耗时（使用临时文件，不修改数据库和 MEDIA_ROOT）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--counts',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000],
+            help='每个下载包的文件数（默认 10 100 1000）',
+        )
+        parser.add_argument(
+            '--file-size',
+            type=int,
+            default=256,
+            help='单个文件大小（KB，默认256）',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=READ_AHEAD_WORKERS,
+            help=f'预读线程数（默认{READ_AHEAD_WORKERS}）',
+        )
+
+    def handle(self, *args, **options):
+        file_size = options['file_size'] * 1024
+        workers = max(1, options['workers'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = self.create_files(directory, max(options['counts']), file_size)
+            self.stdout.write(f'文件大小 {options["file_size"]} KB，pdf 与 txt 各半，预读线程 {workers} 个')
+            self.stdout.write(f'{"文件数":>8} {"顺序读取(秒)":>14} {"预读(秒)":>10} {"ZIP大小(MB)":>12}')
+            for count in options['counts']:
+                entries = [(os.path.basename(path), path, None) for path in paths[:count]]
+                serial, size = self.measure(entries, 0)
+                parallel, _ = self.measure(entries, workers)
+                self.stdout.write(f'{count:>8} {serial:>14.3f} {parallel:>10.3f} {size / 1024 / 1024:>12.1f}')
+
+        self.measure_queries(max(options['counts']))
+
+    def create_files(self, directory, count, file_size):
+        """生成测试文件：pdf 为随机内容（不可压缩），txt 为文本（可压缩）"""
+        paths = []
+        text = ('报告内容 report content 0123456789\n' * (file_size // 40 + 1)).encode()[:file_size]
+        for index in range(count):
+            if index % 2:
+                path = os.path.join(directory, f'report_{index}.txt')
+                content = text
+            else:
+                path = os.path.join(directory, f'report_{index}.pdf')
+                content = os.urandom(file_size)
+            with open(path, 'wb') as f:
+                f.write(content)
+            paths.append(path)
+        return paths
+
+    def measure(self, entries, read_ahead):
+        sink = _CountingSink()
+        started = time.perf_counter()
+        for data in iter_zip(entries, read_ahead=read_ahead):
+            sink.write(data)
+        return time.perf_counter() - started, sink.size
+
+    def measure_queries(self, count):
+        """生成下载包条目（文件名需要上传人和任务区）所需的查询次数"""
+        reports = Report.objects.select_related('uploader', 'task_area').order_by('-upload_date')[:count]
+        with CaptureQueriesContext(connection) as context:
+            total = sum(1 for _ in report_entries(reports))
+        self.stdout.write(f'读取 {total} 份报告的打包信息共 {len(context.captured_queries)} 次查询')
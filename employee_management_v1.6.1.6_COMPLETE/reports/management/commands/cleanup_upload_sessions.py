@@ -0,0 +1,34 @@
+"""
+Django管理命令：清理未完成的分块上传
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reports.models import UploadSession
+from reports.uploads import discard
+
+
+class Command(BaseCommand):
+    help = '删除长时间没有活动的未完成分块上传及其分块文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=48,
+            help='超过该时长没有上传新块的会话视为放弃（默认48小时）',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        expired = UploadSession.objects.filter(updated_at__lt=cutoff).exclude(
+            status=UploadSession.Status.COMPLETED
+        )
+        count = 0
+        for session in expired.iterator():
+            discard(session)
+            session.delete()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'已清理 {count} 个未完成的上传'))
@@ -0,0 +1,66 @@
+"""
+Django管理命令：将已有报告文件迁移到按内容存储
+"""
+from django.core.management.base import BaseCommand
+
+from reports.blobs import release_blob, store_blob
+from reports.models import Report
+
+
+class Command(BaseCommand):
+    help = '将单独保存的旧报告文件迁移到按内容存储（reports/blobs/），内容相同的文件只保留一份'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='每批处理的报告数（默认200）',
+        )
+        parser.add_argument(
+            '--keep-originals',
+            action='store_true',
+            help='迁移后保留原文件（默认删除）',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        migrated = missing = 0
+        saved_bytes = 0
+        while True:
+            batch = list(
+                Report.objects.filter(id__gt=last_id, blob__isnull=True)
+                .exclude(file='')
+                .order_by('id')
+                .only('id', 'file', 'file_size')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for report in batch:
+                storage = report.file.storage
+                original = report.file.name
+                if not storage.exists(original):
+                    missing += 1
+                    self.stderr.write(self.style.WARNING(f'报告 {report.id} 的文件不存在: {original}'))
+                    continue
+
+                with storage.open(original, 'rb') as content:
+                    blob = store_blob(content, original)
+                updated = Report.objects.filter(pk=report.pk, blob__isnull=True).update(
+                    blob=blob, file=blob.file.name, file_size=blob.size
+                )
+                if not updated:
+                    # 期间已被其他进程迁移
+                    release_blob(blob.pk)
+                    continue
+                migrated += 1
+                if blob.ref_count > 1:
+                    saved_bytes += blob.size
+                if not options['keep_originals'] and original != blob.file.name:
+                    storage.delete(original)
+
+        self.stdout.write(f'迁移 {migrated} 份报告，文件缺失 {missing} 份，去重节省 {saved_bytes / 1024 / 1024:.1f} MB')
+        self.stdout.write(self.style.SUCCESS('报告文件迁移完成'))
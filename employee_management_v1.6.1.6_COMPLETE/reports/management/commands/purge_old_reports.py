@@ -0,0 +1,112 @@
+"""
+Django管理命令：分批删除超过保留期的报告
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reports.models import RetentionPurge
+from reports.retention import (
+    BATCH_SIZE, FILE_WORKERS, RETENTION_DAYS, claim_purge, request_purge, run_purge,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        '分批删除超过保留期的报告及其文件，每批一个短事务并记录进度，中断后重新运行会从上次的进度继续；'
+        '--queued 执行在“清理旧报告”页面提交的任务（适合由 cron 调用）'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help=f'保留天数，更早上传的报告将被删除（默认{RETENTION_DAYS}天；有未完成的任务时沿用其截止时间）',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计各任务区将删除的报告数和可回收的空间，不删除',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'每批删除的报告数（默认{BATCH_SIZE}）',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=FILE_WORKERS,
+            help=f'删除文件的线程数（默认{FILE_WORKERS}）',
+        )
+        parser.add_argument(
+            '--queued',
+            action='store_true',
+            help='只执行排队中的清理任务',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size 必须大于0')
+
+        if options['queued']:
+            purges = list(RetentionPurge.objects.filter(
+                status=RetentionPurge.Status.PENDING
+            ).order_by('created_at'))
+            if not purges:
+                self.stdout.write('没有排队中的清理任务')
+        else:
+            days = options['days'] if options['days'] is not None else RETENTION_DAYS
+            cutoff = timezone.now() - timedelta(days=days)
+            purge = request_purge(None, cutoff, dry_run=options['dry_run'])
+            if purge.cutoff != cutoff and options['days'] is not None:
+                self.stderr.write(self.style.WARNING(
+                    f'已有未完成的任务 {purge.pk}，忽略 --days，继续使用该任务的截止时间 {purge.cutoff:%Y-%m-%d}'
+                ))
+            if purge.last_report_id:
+                self.stdout.write(self.style.WARNING(
+                    f'继续未完成的任务 {purge.pk}（截止 {purge.cutoff:%Y-%m-%d}，已处理到报告 {purge.last_report_id}）'
+                ))
+            purges = [purge]
+
+        for purge in purges:
+            self.execute_purge(purge, options)
+
+    def execute_purge(self, purge, options):
+        if not claim_purge(purge):
+            self.stderr.write(self.style.WARNING(f'清理任务 {purge.pk} 正在由其他进程执行，已跳过'))
+            return
+
+        kind = '试运行' if purge.dry_run else '清理'
+        self.stdout.write(f'{kind}任务 {purge.pk}：{purge.cutoff:%Y-%m-%d %H:%M} 之前上传的报告')
+
+        def progress(purge):
+            self.stdout.write(
+                f'  已处理 {purge.deleted_reports} 份报告，'
+                f'{purge.reclaimed_bytes / 1024 / 1024:.1f} MB'
+            )
+
+        try:
+            run_purge(purge, options['batch_size'], options['workers'], progress)
+        except Exception as e:
+            self.stderr.write(self.style.ERROR(f'清理任务 {purge.pk} 失败: {e}（重新运行将从已完成的批次之后继续）'))
+            return
+
+        for area, stats in sorted(purge.task_area_stats.items()):
+            self.stdout.write(
+                f'  {area or "（无任务区）"}: {stats["reports"]} 份报告，{stats["bytes"] / 1024 / 1024:.1f} MB'
+            )
+        if purge.dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f'试运行完成：将删除 {purge.deleted_reports} 份报告、{purge.deleted_files} 个文件，'
+                f'可回收 {purge.reclaimed_bytes / 1024 / 1024:.1f} MB'
+            ))
+        else:
+            if purge.failed_files:
+                self.stderr.write(self.style.WARNING(f'{purge.failed_files} 个文件删除失败，详见日志'))
+            self.stdout.write(self.style.SUCCESS(
+                f'清理完成：删除 {purge.deleted_reports} 份报告、{purge.deleted_files} 个文件，'
+                f'回收 {purge.reclaimed_bytes / 1024 / 1024:.1f} MB'
+            ))
@@ -0,0 +1,19 @@
+"""
+Django管理命令：在本地进程池中生成批量下载包
+"""
+from employee_management.jobs import JobWorkerCommand
+from reports.models import BulkDownloadPackage
+from reports.packages import run_package_job
+
+
+class Command(JobWorkerCommand):
+    help = '在本地进程池中生成排队的批量下载包，ZIP 文件保存在 MEDIA_ROOT/download_packages/ 下'
+
+    model = BulkDownloadPackage
+    job_label = '下载包'
+    pending_status = BulkDownloadPackage.PackageStatus.PENDING
+    running_status = BulkDownloadPackage.PackageStatus.PROCESSING
+    completed_status = BulkDownloadPackage.PackageStatus.COMPLETED
+    failed_status = BulkDownloadPackage.PackageStatus.FAILED
+    file_field = 'zip_file'
+    run_job = run_package_job
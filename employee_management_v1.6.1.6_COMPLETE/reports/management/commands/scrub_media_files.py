@@ -0,0 +1,209 @@
+"""
+Django管理命令：检查媒体文件完整性（缺失、孤立和损坏的文件）
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from leave_management.models import ExportJob
+from reports.models import BulkDownloadPackage, Report, ReportBlob
+from reports.storage import report_storage
+
+# 检查的目录（相对 MEDIA_ROOT）
+SCRUB_DIRECTORIES = ['reports', 'download_packages', 'exports']
+
+# 增量检查的状态文件（记录上次检查的开始时间）
+STATE_FILENAME = '.scrub_state.json'
+
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def _scan_dir(root, relative):
+    """列出一个目录，返回 (文件列表 [(相对路径, 大小, 修改时间)], 子目录列表)"""
+    files, subdirs = [], []
+    with os.scandir(os.path.join(root, relative)) as entries:
+        for entry in entries:
+            name = f'{relative}/{entry.name}'
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(name)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                files.append((name, stat.st_size, stat.st_mtime))
+    return files, subdirs
+
+
+def _checksum(name):
+    """流式计算文件内容（压缩存储的文件为解压后的内容）的 SHA-256，返回 (摘要, 大小)"""
+    storage = report_storage if name.startswith('reports/') else default_storage
+    digest = hashlib.sha256()
+    size = 0
+    with storage.open(name, 'rb') as f:
+        while True:
+            data = f.read(HASH_BUFFER_SIZE)
+            if not data:
+                break
+            digest.update(data)
+            size += len(data)
+    return digest.hexdigest(), size
+
+
+class Command(BaseCommand):
+    help = (
+        '并行遍历 MEDIA_ROOT 下的报告、下载包和导出文件，与数据库记录比对，'
+        '以 JSONL 格式输出缺失、孤立和损坏的文件'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='JSONL 结果文件路径（默认输出到标准输出）',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=min(16, (os.cpu_count() or 1) * 2),
+            help='遍历目录和计算校验和的线程数',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='每批读取的数据库记录数（默认2000）',
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='只计算上次检查之后修改过的文件的校验和（缺失和孤立文件仍全部检查）',
+        )
+
+    def handle(self, *args, **options):
+        self.root = str(settings.MEDIA_ROOT)
+        self.batch_size = options['batch_size']
+        workers = max(1, options['workers'])
+        started = time.time()
+        since = self.load_state() if options['incremental'] else None
+
+        output = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        counts = {'missing': 0, 'orphan': 0, 'corrupt': 0}
+
+        def emit(record):
+            counts[record['status']] += 1
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                on_disk = self.walk(pool)
+                expected = self.load_references()
+
+                for name, refs in expected.items():
+                    if name not in on_disk:
+                        for model, obj_id, _, _ in refs:
+                            emit({'status': 'missing', 'path': name, 'model': model, 'id': obj_id})
+
+                checks = {}
+                for name, (size, mtime) in on_disk.items():
+                    refs = expected.get(name)
+                    if refs is None:
+                        emit({'status': 'orphan', 'path': name, 'size': size, 'mtime': mtime})
+                    elif since is None or mtime >= since:
+                        checks[pool.submit(_checksum, name)] = (name, refs)
+
+                for future in as_completed(checks):
+                    name, refs = checks[future]
+                    try:
+                        sha256, size = future.result()
+                    except Exception as e:
+                        for model, obj_id, _, _ in refs:
+                            emit({'status': 'corrupt', 'path': name, 'model': model, 'id': obj_id,
+                                  'reason': f'无法读取: {e}'})
+                        continue
+                    for model, obj_id, expected_sha256, expected_size in refs:
+                        if expected_sha256 and sha256 != expected_sha256:
+                            emit({'status': 'corrupt', 'path': name, 'model': model, 'id': obj_id,
+                                  'reason': '校验和不一致', 'expected_sha256': expected_sha256, 'sha256': sha256})
+                        elif expected_size is not None and size != expected_size:
+                            emit({'status': 'corrupt', 'path': name, 'model': model, 'id': obj_id,
+                                  'reason': '大小不一致', 'expected_size': expected_size, 'size': size})
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        self.save_state(started)
+        summary = (
+            f'共 {len(on_disk)} 个文件，校验 {len(checks)} 个：缺失 {counts["missing"]}，'
+            f'孤立 {counts["orphan"]}，损坏 {counts["corrupt"]}，耗时 {time.time() - started:.1f} 秒'
+        )
+        style = self.style.SUCCESS if not any(counts.values()) else self.style.WARNING
+        self.stderr.write(style(summary))
+
+    def walk(self, pool):
+        """用线程池并行列出目录，返回 {相对路径: (大小, 修改时间)}"""
+        files = {}
+        pending = {
+            pool.submit(_scan_dir, self.root, directory)
+            for directory in SCRUB_DIRECTORIES
+            if os.path.isdir(os.path.join(self.root, directory))
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                found, subdirs = future.result()
+                for name, size, mtime in found:
+                    files[name] = (size, mtime)
+                pending.update(pool.submit(_scan_dir, self.root, subdir) for subdir in subdirs)
+        return files
+
+    def load_references(self):
+        """
+        分批读取数据库中引用的文件
+        返回 {路径: [(模型名, ID, 期望的 SHA-256, 期望的大小)]}，没有记录的校验项为 None
+        """
+        expected = {}
+
+        def add(name, ref):
+            if name:
+                expected.setdefault(name, []).append(ref)
+
+        for blob_id, name, sha256, size in self.iter_batches(ReportBlob.objects.values_list('id', 'file', 'sha256', 'size')):
+            add(name, ('ReportBlob', blob_id, sha256, size))
+        # 按内容存储的报告由 ReportBlob 校验，这里只检查旧数据中单独保存的文件
+        legacy_reports = Report.objects.filter(blob__isnull=True).values_list('id', 'file', 'file_size')
+        for report_id, name, size in self.iter_batches(legacy_reports):
+            add(name, ('Report', report_id, None, size or None))
+        packages = BulkDownloadPackage.objects.values_list('id', 'zip_file')
+        for package_id, name in self.iter_batches(packages):
+            add(name, ('BulkDownloadPackage', package_id, None, None))
+        for job_id, name in self.iter_batches(ExportJob.objects.values_list('id', 'file')):
+            add(name, ('ExportJob', job_id, None, None))
+        return expected
+
+    def iter_batches(self, queryset):
+        """按主键分批读取"""
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).order_by('id')[:self.batch_size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            yield from batch
+
+    def state_path(self):
+        return os.path.join(self.root, STATE_FILENAME)
+
+    def load_state(self):
+        try:
+            with open(self.state_path(), encoding='utf-8') as f:
+                return json.load(f)['last_run']
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def save_state(self, started):
+        with open(self.state_path(), 'w', encoding='utf-8') as f:
+            json.dump({'last_run': started}, f)
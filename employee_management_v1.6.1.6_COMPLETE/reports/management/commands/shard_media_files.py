@@ -0,0 +1,124 @@
+"""
+Django管理命令：将报告文件和下载包迁移到分目录存储
+"""
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Value, When
+
+from reports.blobs import blob_name
+from reports.models import BulkDownloadPackage, Report, ReportBlob
+from reports.storage import is_sharded, shard_path
+
+
+class Command(BaseCommand):
+    help = (
+        '将平铺在 reports/、reports/blobs/ 和 download_packages/ 下的文件移动到两级子目录，'
+        '并批量更新数据库中的路径；可以中断后重新运行，已迁移的文件会被跳过'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='每批处理的记录数（默认500）',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计需要迁移的文件，不移动',
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+
+        moved = self.relocate(
+            ReportBlob.objects.only('id', 'sha256', 'file'),
+            'file',
+            lambda blob: blob_name(blob.sha256, blob.file.name),
+            self.update_blob_reports,
+        )
+        self.stdout.write(f'报告文件内容：{moved} 个')
+
+        moved = self.relocate(
+            Report.objects.filter(blob__isnull=True).exclude(file='').only('id', 'file'),
+            'file',
+            lambda report: shard_path(report.file.name),
+        )
+        self.stdout.write(f'旧报告文件：{moved} 个')
+
+        moved = self.relocate(
+            BulkDownloadPackage.objects.exclude(zip_file='').exclude(zip_file=None).only('id', 'zip_file'),
+            'zip_file',
+            lambda package: shard_path(package.zip_file.name),
+        )
+        self.stdout.write(f'下载包：{moved} 个')
+
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING('试运行，未移动任何文件'))
+        else:
+            self.stdout.write(self.style.SUCCESS('文件迁移完成'))
+
+    def relocate(self, queryset, field_name, target_for, after_update=None):
+        """按主键分批迁移：先建立新路径的硬链接（或复制），更新数据库后再删除旧文件"""
+        model = queryset.model
+        last_id = 0
+        moved = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).order_by('id')[:self.batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            changed = []
+            old_paths = []
+            for obj in batch:
+                fieldfile = getattr(obj, field_name)
+                if is_sharded(fieldfile.name):
+                    continue
+                target = target_for(obj)
+                if self.dry_run:
+                    changed.append(obj)
+                    continue
+                old_path = fieldfile.path
+                if not self.link(fieldfile.storage, old_path, target):
+                    self.stderr.write(self.style.WARNING(f'{model.__name__} {obj.id} 的文件不存在: {fieldfile.name}'))
+                    continue
+                if os.path.exists(old_path):
+                    old_paths.append(old_path)
+                fieldfile.name = target
+                changed.append(obj)
+
+            if changed and not self.dry_run:
+                with transaction.atomic():
+                    model.objects.bulk_update(changed, [field_name])
+                    if after_update:
+                        after_update(changed)
+                for path in old_paths:
+                    os.remove(path)
+            moved += len(changed)
+        return moved
+
+    def link(self, storage, old_path, target):
+        """在新路径建立文件；上次运行中断、新文件已存在时直接使用"""
+        new_path = storage.path(target)
+        if os.path.exists(new_path):
+            return True
+        if not os.path.exists(old_path):
+            return False
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        try:
+            os.link(old_path, new_path)
+        except OSError:
+            shutil.copy2(old_path, new_path)
+        return True
+
+    def update_blob_reports(self, blobs):
+        """引用这些内容的报告同步更新文件路径"""
+        Report.objects.filter(blob__in=blobs).update(
+            file=Case(*[When(blob_id=blob.id, then=Value(blob.file.name)) for blob in blobs])
+        )
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_fix_reportdownloadlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkdownloadpackage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='内容哈希'),
+        ),
+        migrations.AddField(
+            model_name='bulkdownloadpackage',
+            name='error',
+            field=models.TextField(blank=True, verbose_name='错误信息'),
+        ),
+        migrations.AddField(
+            model_name='bulkdownloadpackage',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='开始时间'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_name_pinyin_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reports', '0004_bulk_package_worker'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='上传ID')),
+                ('report_type', models.CharField(choices=[('weekly', '周报'), ('monthly', '月报'), ('summary', '汇总报告')], max_length=20, verbose_name='报告类型')),
+                ('report_period', models.CharField(max_length=20, verbose_name='报告周期')),
+                ('filename', models.CharField(max_length=255, verbose_name='文件名')),
+                ('file_size', models.BigIntegerField(verbose_name='文件大小(字节)')),
+                ('chunk_size', models.PositiveIntegerField(verbose_name='分块大小(字节)')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256')),
+                ('status', models.CharField(choices=[('uploading', '上传中'), ('assembling', '合并中'), ('completed', '已完成')], default='uploading', max_length=20, verbose_name='状态')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('report', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_sessions', to='reports.report', verbose_name='生成的报告')),
+                ('task_area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='accounts.taskarea', verbose_name='所属任务区')),
+                ('uploader', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL, verbose_name='上传人')),
+            ],
+            options={
+                'verbose_name': '分块上传',
+                'verbose_name_plural': '分块上传',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
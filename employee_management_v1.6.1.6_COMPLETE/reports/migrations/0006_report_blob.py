@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0005_upload_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('file', models.FileField(max_length=255, upload_to='reports/blobs/', verbose_name='文件')),
+                ('size', models.BigIntegerField(default=0, verbose_name='文件大小(字节)')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='引用数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '报告文件内容',
+                'verbose_name_plural': '报告文件内容',
+            },
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='reports', to='reports.reportblob', verbose_name='文件内容'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:44
+
+import django.core.validators
+from django.db import migrations, models
+import reports.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0006_report_blob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bulkdownloadpackage',
+            name='zip_file',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=reports.storage.ShardedFileSystemStorage(), upload_to='download_packages/', verbose_name='ZIP文件'),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='file',
+            field=models.FileField(max_length=255, storage=reports.storage.ShardedFileSystemStorage(), upload_to='reports/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx'])], verbose_name='报告文件'),
+        ),
+        migrations.AlterField(
+            model_name='reportblob',
+            name='file',
+            field=models.FileField(max_length=255, storage=reports.storage.ShardedFileSystemStorage(), upload_to='reports/blobs/', verbose_name='文件'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:46
+
+import django.core.validators
+from django.db import migrations, models
+import reports.storage
+
+
+def set_stored_size(apps, schema_editor):
+    """已有的内容文件都未压缩，存储大小即文件大小"""
+    ReportBlob = apps.get_model('reports', 'ReportBlob')
+    ReportBlob.objects.update(stored_size=models.F('size'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0007_sharded_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportblob',
+            name='compression',
+            field=models.CharField(blank=True, max_length=10, verbose_name='压缩方式'),
+        ),
+        migrations.AddField(
+            model_name='reportblob',
+            name='stored_size',
+            field=models.BigIntegerField(default=0, verbose_name='存储大小(字节)'),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='file',
+            field=models.FileField(max_length=255, storage=reports.storage.ReportFileStorage(), upload_to='reports/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx'])], verbose_name='报告文件'),
+        ),
+        migrations.AlterField(
+            model_name='reportblob',
+            name='file',
+            field=models.FileField(max_length=255, storage=reports.storage.ReportFileStorage(), upload_to='reports/blobs/', verbose_name='文件'),
+        ),
+        migrations.RunPython(set_stored_size, migrations.RunPython.noop),
+    ]
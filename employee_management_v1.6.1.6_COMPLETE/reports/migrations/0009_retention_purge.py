@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reports', '0008_blob_compression'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionPurge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateTimeField(verbose_name='截止时间')),
+                ('dry_run', models.BooleanField(default=False, verbose_name='试运行')),
+                ('status', models.CharField(choices=[('pending', '排队中'), ('running', '执行中'), ('completed', '已完成'), ('failed', '失败')], default='pending', max_length=20, verbose_name='状态')),
+                ('last_report_id', models.BigIntegerField(default=0, verbose_name='已处理到的报告ID')),
+                ('deleted_reports', models.PositiveIntegerField(default=0, verbose_name='报告数')),
+                ('deleted_files', models.PositiveIntegerField(default=0, verbose_name='文件数')),
+                ('failed_files', models.PositiveIntegerField(default=0, verbose_name='删除失败的文件数')),
+                ('reclaimed_bytes', models.BigIntegerField(default=0, verbose_name='回收空间(字节)')),
+                ('task_area_stats', models.JSONField(blank=True, default=dict, verbose_name='各任务区统计')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='retention_purges', to=settings.AUTH_USER_MODEL, verbose_name='请求人')),
+            ],
+            options={
+                'verbose_name': '报告清理任务',
+                'verbose_name_plural': '报告清理任务',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:52
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0009_retention_purge'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportdownloadlog',
+            name='download_time',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='下载时间'),
+        ),
+    ]
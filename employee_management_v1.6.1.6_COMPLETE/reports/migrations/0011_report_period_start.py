@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:53
+
+import calendar
+from datetime import date, timedelta
+import re
+
+from django.db import migrations, models
+
+# 周期解析逻辑的副本（与编写迁移时的 reports.periods.parse_period 相同），迁移不依赖之后可能修改的应用代码
+PERIOD_RE = re.compile(r'^\s*(\d{4})(?:\s*-?\s*([WMQH])\s*(\d{1,2}))?\s*$', re.IGNORECASE)
+
+
+def _month_end(year, month):
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+def parse_period(value):
+    """解析报告周期，返回 (开始日期, 结束日期)，无法识别时返回 None"""
+    match = PERIOD_RE.match(value or '')
+    if not match:
+        return None
+    year = int(match.group(1))
+    unit = (match.group(2) or '').upper()
+    number = int(match.group(3) or 0)
+    try:
+        if unit == 'W':
+            start = date.fromisocalendar(year, number, 1)
+            return start, start + timedelta(days=6)
+        if unit == 'M':
+            return date(year, number, 1), _month_end(year, number)
+        if unit == 'Q' and 1 <= number <= 4:
+            return date(year, number * 3 - 2, 1), _month_end(year, number * 3)
+        if unit == 'H' and 1 <= number <= 2:
+            return date(year, number * 6 - 5, 1), _month_end(year, number * 6)
+        if not unit:
+            return date(year, 1, 1), date(year, 12, 31)
+    except ValueError:
+        pass
+    return None
+
+
+def set_period_start(apps, schema_editor):
+    """解析已有报告的周期（按主键分批）"""
+    Report = apps.get_model('reports', 'Report')
+    last_id = 0
+    while True:
+        batch = list(Report.objects.filter(id__gt=last_id).order_by('id').only('id', 'report_period')[:1000])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for report in batch:
+            period = parse_period(report.report_period)
+            report.period_start = period[0] if period else None
+        Report.objects.bulk_update(batch, ['period_start'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0010_download_log_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='period_start',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True, verbose_name='周期开始日期'),
+        ),
+        migrations.RunPython(set_period_start, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,58 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator
 from django.utils import timezone
 import os
-import zipfile
-from io import BytesIO
+import tempfile
+import uuid
+
+from accounts.scope import get_scope_resolver
+
+from .storage import report_storage, sharded_storage
 
 User = get_user_model()
 
+# 按内容存储的报告文件目录
+BLOB_DIRECTORY = 'reports/blobs/'
+
+
+class ReportQuerySet(models.QuerySet):
+    """报告查询集"""
+
+    def visible_to(self, user, include_own=True):
+        """
+        用户可查看的报告：超级管理员全部；任务区/总部负责人按任务区范围；
+        include_own 为真时包含本人上传的报告
+        """
+        condition = get_scope_resolver(user).filter_q(
+            'task_area_id', owner_field='uploader_id' if include_own else None
+        )
+        return self.filter(condition).select_related('uploader', 'task_area')
+
+
+class ReportBlob(models.Model):
+    """
+    报告文件内容（按 SHA-256 存储，相同内容只保存一份）
+    ref_count 为引用该内容的报告数，降为0时删除文件，见 reports.blobs
+    """
+    
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name='SHA-256')
+    file = models.FileField(upload_to=BLOB_DIRECTORY, storage=report_storage, max_length=255, verbose_name='文件')
+    size = models.BigIntegerField(default=0, verbose_name='文件大小(字节)')
+    # 旧版 Office 格式保存时压缩，见 reports.storage
+    stored_size = models.BigIntegerField(default=0, verbose_name='存储大小(字节)')
+    compression = models.CharField(max_length=10, blank=True, verbose_name='压缩方式')
+    ref_count = models.PositiveIntegerField(default=0, verbose_name='引用数')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    
+    class Meta:
+        verbose_name = '报告文件内容'
+        verbose_name_plural = '报告文件内容'
+    
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count})"
+
+
 class Report(models.Model):
     """报告模型"""
     
@@ -42,14 +87,28 @@ class Report(models.Model):
         help_text='如：2025-W10 或 2025-M03',
         verbose_name='报告周期'
     )
+    # 由 report_period 解析得到（见 reports.periods），无法识别的周期为空
+    period_start = models.DateField(null=True, blank=True, editable=False, db_index=True, verbose_name='周期开始日期')
+    period_end = models.DateField(null=True, blank=True, editable=False, verbose_name='周期结束日期')
     
     # 文件信息
     file = models.FileField(
         upload_to='reports/',
+        storage=report_storage,
+        max_length=255,
         validators=[FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx'])],
         verbose_name='报告文件'
     )
     file_size = models.BigIntegerField(default=0, verbose_name='文件大小(字节)')
+    # 文件内容，file 指向其中的文件（为空表示旧数据，文件单独保存在 reports/ 下）
+    blob = models.ForeignKey(
+        ReportBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='reports',
+        verbose_name='文件内容'
+    )
     
     # 所属任务区
     task_area = models.ForeignKey(
@@ -93,20 +152,60 @@ class Report(models.Model):
     upload_date = models.DateTimeField(auto_now_add=True, verbose_name='上传时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     
+    objects = ReportQuerySet.as_manager()
+    
     class Meta:
         verbose_name = '报告'
         verbose_name_plural = '报告'
         ordering = ['-upload_date']
         unique_together = ['uploader', 'report_type', 'report_period', 'task_area']
+        indexes = [
+            # 按任务区和类型的周期范围查询（提交情况矩阵、周期筛选）
+            models.Index(fields=['task_area', 'report_type', 'period_start'], name='report_area_type_period_idx'),
+        ]
     
     def __str__(self):
         return f"{self.uploader.get_full_name()} - {self.get_report_type_display()} - {self.report_period}"
     
     def save(self, *args, **kwargs):
-        """保存时自动计算文件大小"""
+        """保存时解析报告周期并自动计算文件大小；新上传的文件按内容存储，相同内容的文件只保存一份"""
+        from .blobs import release_blob, store_blob
+        from .periods import parse_period
+        
+        self.period_start, self.period_end = parse_period(self.report_period) or (None, None)
+        
+        stored_blob_id = replaced_blob_id = None
+        if self.file and not self.file._committed:
+            blob = store_blob(self.file.file, self.file.name)
+        elif self.file and self.blob_id and not self.file.name.startswith(BLOB_DIRECTORY):
+            # 通过 file.save() 直接写入存储的新文件，转为按内容存储
+            stray = self.file.name
+            with self.file.storage.open(stray, 'rb') as content:
+                blob = store_blob(content, stray)
+            self.file.storage.delete(stray)
+        else:
+            blob = None
+        if blob is not None:
+            stored_blob_id, replaced_blob_id = blob.pk, self.blob_id
+            self.blob = blob
+            self.file.name = blob.file.name
+            self.file._committed = True
+            self.file_size = blob.size
         if self.file and not self.file_size:
             self.file_size = self.file.size
-        super().save(*args, **kwargs)
+        if stored_blob_id is None:
+            super().save(*args, **kwargs)
+        else:
+            # 在保存点中保存，失败（如违反唯一约束）时外层事务仍可用，能够释放刚增加的引用
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+            except Exception:
+                release_blob(stored_blob_id)
+                raise
+        if replaced_blob_id:
+            # 换成相同内容时 store_blob 也增加了引用数，同样释放一次
+            release_blob(replaced_blob_id)
     
     @property
     def file_extension(self):
@@ -121,11 +220,13 @@ class Report(models.Model):
         if self.file_size == 0:
             return '0 B'
         
+        # 使用局部变量，避免修改 file_size 后被 save() 写回数据库
+        size = self.file_size
         for unit in ['B', 'KB', 'MB', 'GB']:
-            if self.file_size < 1024.0:
-                return f"{self.file_size:.1f} {unit}"
-            self.file_size /= 1024.0
-        return f"{self.file_size:.1f} TB"
+            if size < 1024.0:
+                return f"{size:.1f} {unit}"
+            size /= 1024.0
+        return f"{size:.1f} TB"
     
     def mark_as_viewed(self, viewer):
         """标记为已查看"""
@@ -141,6 +242,11 @@ class Report(models.Model):
         self.approved_at = timezone.now()
         self.save()
     
+    def archive_name(self):
+        """下载文件名：姓名_任务区_时间段_报告类型.扩展名"""
+        task_area_name = self.task_area.name if self.task_area else "未知任务区"
+        return f"{self.uploader.get_full_name()}_{task_area_name}_{self.report_period}_{self.get_report_type_display()}{self.file_extension}"
+    
     def get_display_name(self):
         """获取显示名称"""
         if self.uploader:
@@ -165,7 +271,8 @@ class ReportDownloadLog(models.Model):
         verbose_name='下载人'
     )
     
-    download_time = models.DateTimeField(auto_now_add=True, verbose_name='下载时间')
+    # 日志延迟批量写入（见 reports.download_logs），时间在记录时确定
+    download_time = models.DateTimeField(default=timezone.now, verbose_name='下载时间')
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name='IP地址')
     
     class Meta:
@@ -196,6 +303,8 @@ class BulkDownloadPackage(models.Model):
     package_name = models.CharField(max_length=200, verbose_name='包名称')
     zip_file = models.FileField(
         upload_to='download_packages/',
+        storage=sharded_storage,
+        max_length=255,
         null=True,
         blank=True,
         verbose_name='ZIP文件'
@@ -220,7 +329,12 @@ class BulkDownloadPackage(models.Model):
     total_reports = models.PositiveIntegerField(default=0, verbose_name='报告总数')
     total_size = models.BigIntegerField(default=0, verbose_name='总大小(字节)')
     
+    # 所含报告（ID 及修改时间）的哈希，相同内容的下载包直接复用
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='内容哈希')
+    error = models.TextField(blank=True, verbose_name='错误信息')
+    
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
     
     class Meta:
@@ -231,40 +345,42 @@ class BulkDownloadPackage(models.Model):
     def __str__(self):
         return f"{self.package_name} - {self.get_status_display()}"
     
+    @property
+    def is_finished(self):
+        return self.status in (self.PackageStatus.COMPLETED, self.PackageStatus.FAILED)
+    
+    @property
+    def zip_available(self):
+        """已完成且 ZIP 文件仍然存在"""
+        return (
+            self.status == self.PackageStatus.COMPLETED
+            and bool(self.zip_file)
+            and self.zip_file.storage.exists(self.zip_file.name)
+        )
+    
     def generate_zip(self):
-        """生成ZIP文件"""
+        """生成ZIP文件（逐块写入临时文件，不在内存中缓存整个压缩包）"""
         if self.status != self.PackageStatus.PENDING:
             return False
         
         self.status = self.PackageStatus.PROCESSING
+        self.started_at = timezone.now()
         self.save()
-        
+        return self.build_zip()
+    
+    def build_zip(self):
+        """打包所含报告（状态已置为处理中，由 generate_zip 或 run_bulk_packages 工作进程调用）"""
         try:
-            # 创建ZIP文件
-            from django.core.files.base import ContentFile
-            zip_buffer = BytesIO()
+            from django.core.files import File
+            from .archive import report_entries, write_zip
             
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                total_size = 0
-                
-                for package_report in self.package_reports.all():
-                    report = package_report.report
-                    
-                    if report.file:
-                        # 文件名格式: "姓名+任务区+时间段+报告类型"
-                        task_area_name = report.task_area.name if report.task_area else "未知任务区"
-                        filename = f"{report.uploader.get_full_name()}_{task_area_name}_{report.report_period}_{report.get_report_type_display()}{report.file_extension}"
-                        # 添加报告文件到ZIP
-                        zip_file.write(
-                            report.file.path,
-                            arcname=filename
-                        )
-                        total_size += report.file.size
+            reports = list(self.reports.select_related('uploader', 'task_area'))
+            with tempfile.TemporaryFile() as output:
+                write_zip(output, report_entries(reports))
+                output.seek(0)
+                self.zip_file.save(f"{self.package_name}.zip", File(output), save=False)
             
-            # 保存ZIP文件
-            zip_content = ContentFile(zip_buffer.getvalue())
-            self.zip_file.save(f"{self.package_name}.zip", zip_content, save=False)
-            self.total_size = total_size
+            self.total_size = sum(report.file_size for report in reports if report.file)
             self.status = self.PackageStatus.COMPLETED
             self.completed_at = timezone.now()
             self.save()
@@ -273,6 +389,8 @@ class BulkDownloadPackage(models.Model):
             
         except Exception as e:
             self.status = self.PackageStatus.FAILED
+            self.error = str(e)
+            self.completed_at = timezone.now()
             self.save()
             print(f"生成ZIP文件失败: {e}")
             return False
@@ -292,3 +410,131 @@ class PackageReport(models.Model):
     
     def __str__(self):
         return f"{self.package.package_name} - {self.report.get_display_name()}"
+
+
+class UploadSession(models.Model):
+    """分块上传会话（断点续传），分块文件保存在磁盘上，见 reports.uploads"""
+    
+    class Status(models.TextChoices):
+        UPLOADING = 'uploading', '上传中'
+        ASSEMBLING = 'assembling', '合并中'
+        COMPLETED = 'completed', '已完成'
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, verbose_name='上传ID')
+    uploader = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions',
+        verbose_name='上传人'
+    )
+    
+    # 报告信息，合并完成后用于创建报告
+    report_type = models.CharField(max_length=20, choices=Report.ReportType.choices, verbose_name='报告类型')
+    report_period = models.CharField(max_length=20, verbose_name='报告周期')
+    task_area = models.ForeignKey(
+        'accounts.TaskArea',
+        on_delete=models.CASCADE,
+        related_name='upload_sessions',
+        verbose_name='所属任务区'
+    )
+    
+    # 文件信息
+    filename = models.CharField(max_length=255, verbose_name='文件名')
+    file_size = models.BigIntegerField(verbose_name='文件大小(字节)')
+    chunk_size = models.PositiveIntegerField(verbose_name='分块大小(字节)')
+    sha256 = models.CharField(max_length=64, blank=True, verbose_name='SHA-256')
+    
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.UPLOADING,
+        verbose_name='状态'
+    )
+    report = models.ForeignKey(
+        Report,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload_sessions',
+        verbose_name='生成的报告'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        verbose_name = '分块上传'
+        verbose_name_plural = '分块上传'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.filename} - {self.get_status_display()}"
+    
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.file_size // self.chunk_size))
+    
+    def chunk_length(self, index):
+        """第 index 块（从0开始）的字节数，最后一块可能不足 chunk_size"""
+        return min(self.chunk_size, self.file_size - index * self.chunk_size)
+
+
+class RetentionPurge(models.Model):
+    """
+    报告保留期清理任务
+    由 purge_old_reports 命令分批执行，每批在一个短事务中删除并记录进度（last_report_id），
+    中断后可以继续；试运行只统计各任务区可回收的空间，不删除任何内容。见 reports.retention
+    """
+    
+    class Status(models.TextChoices):
+        PENDING = 'pending', '排队中'
+        RUNNING = 'running', '执行中'
+        COMPLETED = 'completed', '已完成'
+        FAILED = 'failed', '失败'
+    
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='retention_purges',
+        verbose_name='请求人'
+    )
+    
+    cutoff = models.DateTimeField(verbose_name='截止时间')
+    dry_run = models.BooleanField(default=False, verbose_name='试运行')
+    
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='状态'
+    )
+    
+    # 进度（已处理到的报告ID）和统计
+    last_report_id = models.BigIntegerField(default=0, verbose_name='已处理到的报告ID')
+    deleted_reports = models.PositiveIntegerField(default=0, verbose_name='报告数')
+    deleted_files = models.PositiveIntegerField(default=0, verbose_name='文件数')
+    failed_files = models.PositiveIntegerField(default=0, verbose_name='删除失败的文件数')
+    reclaimed_bytes = models.BigIntegerField(default=0, verbose_name='回收空间(字节)')
+    # {任务区名称: {'reports': 报告数, 'bytes': 回收空间}}
+    task_area_stats = models.JSONField(default=dict, blank=True, verbose_name='各任务区统计')
+    error = models.TextField(blank=True, verbose_name='错误信息')
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+    
+    class Meta:
+        verbose_name = '报告清理任务'
+        verbose_name_plural = '报告清理任务'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        kind = '试运行' if self.dry_run else '清理'
+        return f"{kind} {self.cutoff:%Y-%m-%d} 之前的报告 - {self.get_status_display()}"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.COMPLETED, self.Status.FAILED)
@@ -0,0 +1,78 @@
+"""
+批量下载包
+
+下载包在后台生成（见 run_bulk_packages 命令）。每个下载包记录所含报告
+（ID、修改时间及压缩包内文件名用到的上传人和任务区）的哈希，
+再次请求相同的报告且报告未被修改时，直接复用已生成的 ZIP 文件，不再重新打包。
+"""
+import hashlib
+
+from .models import BulkDownloadPackage, PackageReport, Report
+
+
+def package_content_hash(reports):
+    """
+    报告集合的内容哈希：(报告ID, 修改时间, 上传人修改时间, 任务区名称) 排序后计算 sha256
+    压缩包内的文件名含上传人姓名和任务区名称，改名后生成新的下载包
+    """
+    entries = reports.order_by('id').values_list('id', 'updated_at', 'uploader__updated_at', 'task_area__name')
+    digest = hashlib.sha256()
+    for report_id, updated_at, uploader_updated_at, task_area_name in entries:
+        digest.update(f"{report_id}:{_isoformat(updated_at)}:{_isoformat(uploader_updated_at)}:{task_area_name}\n".encode())
+    return digest.hexdigest()
+
+
+def _isoformat(value):
+    return value.isoformat() if value else ''
+
+
+def request_bulk_package(user, reports, package_name):
+    """
+    请求生成下载包（reports 应已经过权限过滤）
+    有相同内容哈希的已完成（文件仍存在）或进行中的下载包时直接复用，否则创建新的下载包排队
+    """
+    content_hash = package_content_hash(reports)
+
+    candidates = BulkDownloadPackage.objects.filter(
+        content_hash=content_hash,
+        status__in=[
+            BulkDownloadPackage.PackageStatus.PENDING,
+            BulkDownloadPackage.PackageStatus.PROCESSING,
+            BulkDownloadPackage.PackageStatus.COMPLETED,
+        ],
+    ).order_by('-created_at')
+    for package in candidates:
+        if package.status != BulkDownloadPackage.PackageStatus.COMPLETED or package.zip_available:
+            return package
+
+    report_ids = list(reports.values_list('id', flat=True))
+    package = BulkDownloadPackage.objects.create(
+        creator=user,
+        package_name=package_name,
+        total_reports=len(report_ids),
+        content_hash=content_hash,
+    )
+    PackageReport.objects.bulk_create([
+        PackageReport(package=package, report_id=report_id)
+        for report_id in report_ids
+    ])
+    return package
+
+
+def can_access_package(user, package):
+    """创建人、超级管理员以及有权下载包内全部报告的用户（复用同一下载包）可以访问"""
+    if package.creator_id == user.id or user.role == user.Role.SUPERUSER:
+        return True
+    # 与 bulk_download 的下载权限一致：可访问的任务区或本人上传的报告
+    downloadable = Report.objects.visible_to(user).filter(bulk_download_packages=package).count()
+    return package.total_reports > 0 and downloadable == package.total_reports
+
+
+def run_package_job(package_id):
+    """生成下载包（在 run_bulk_packages 的工作进程中调用，也可以直接调用）"""
+    package = BulkDownloadPackage.objects.get(pk=package_id)
+    if package.status == BulkDownloadPackage.PackageStatus.PENDING:
+        package.generate_zip()
+    else:
+        package.build_zip()
+    return package.status
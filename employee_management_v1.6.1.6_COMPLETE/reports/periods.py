@@ -0,0 +1,82 @@
+"""
+报告周期解析
+
+report_period 为自由填写的字符串，支持的格式：
+2025-W10（ISO 周）、2025-M03（月）、2025-Q1（季度）、2025-H1（半年）、2025（全年），
+大小写和连字符不限。解析得到的起止日期保存在报告上，按周期查询和统计时不再匹配字符串。
+"""
+import calendar
+import re
+from datetime import date, timedelta
+
+from django.utils import timezone
+
+PERIOD_RE = re.compile(r'^\s*(\d{4})(?:\s*-?\s*([WMQH])\s*(\d{1,2}))?\s*$', re.IGNORECASE)
+
+
+def _month_end(year, month):
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+def parse_period(value):
+    """解析报告周期，返回 (开始日期, 结束日期)，无法识别时返回 None"""
+    match = PERIOD_RE.match(value or '')
+    if not match:
+        return None
+    year = int(match.group(1))
+    unit = (match.group(2) or '').upper()
+    number = int(match.group(3) or 0)
+    try:
+        if unit == 'W':
+            start = date.fromisocalendar(year, number, 1)
+            return start, start + timedelta(days=6)
+        if unit == 'M':
+            return date(year, number, 1), _month_end(year, number)
+        if unit == 'Q' and 1 <= number <= 4:
+            return date(year, number * 3 - 2, 1), _month_end(year, number * 3)
+        if unit == 'H' and 1 <= number <= 2:
+            return date(year, number * 6 - 5, 1), _month_end(year, number * 6)
+        if not unit:
+            return date(year, 1, 1), date(year, 12, 31)
+    except ValueError:
+        pass
+    return None
+
+
+def parse_period_bound(value):
+    """
+    解析筛选条件中的周期或日期（2025-W10、2025-M03 或 2025-03-05），返回 (开始日期, 结束日期)
+    无法识别时返回 None
+    """
+    period = parse_period(value)
+    if period:
+        return period
+    try:
+        day = date.fromisoformat((value or '').strip())
+    except ValueError:
+        return None
+    return day, day
+
+
+def period_key(report_type, day):
+    """包含指定日期的周报（2025-W10）或月报（2025-M03）周期"""
+    if report_type == 'weekly':
+        year, week, _ = day.isocalendar()
+        return f'{year}-W{week:02d}'
+    return f'{day.year}-M{day.month:02d}'
+
+
+def recent_periods(report_type, count, until=None):
+    """
+    截至 until（默认今天）所在周期的最近 count 个周报或月报周期
+    返回 [(周期, 开始日期, 结束日期)]，按时间先后排列
+    """
+    day = until or timezone.localdate()
+    periods = []
+    for _ in range(count):
+        key = period_key(report_type, day)
+        start, end = parse_period(key)
+        periods.append((key, start, end))
+        day = start - timedelta(days=1)
+    periods.reverse()
+    return periods
@@ -0,0 +1,227 @@
+"""
+报告保留期清理
+
+删除截止时间之前上传的报告：按报告ID分批，每批在一个短事务中删除下载日志、下载包关联和报告记录，
+释放按内容存储的文件引用（引用数降为0的内容才删除文件），并在同一事务中记录进度；
+事务提交后由线程池并行删除文件。清理任务（RetentionPurge）中断或失败后从记录的进度继续。
+在请求内执行时（见 reports.views.cleanup_old_reports）每次最多执行 REQUEST_TIME_LIMIT 秒，
+之后任务重新排队，再次提交时继续。
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import TaskArea
+
+from .blobs import release_blobs
+from .models import PackageReport, Report, ReportBlob, ReportDownloadLog, RetentionPurge
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = getattr(settings, 'REPORT_RETENTION_DAYS', 180)
+
+BATCH_SIZE = 500
+FILE_WORKERS = 8
+
+# 在请求内执行时每次的时长上限（秒），需要小于 gunicorn 的 --timeout
+REQUEST_TIME_LIMIT = getattr(settings, 'REPORT_PURGE_REQUEST_TIME_LIMIT', 30)
+
+# 超过该时长没有更新进度的"执行中"任务视为执行进程已退出，可以接手继续
+STALE_PURGE_TIMEOUT = timedelta(minutes=10)
+
+
+def default_cutoff():
+    return timezone.now() - timedelta(days=RETENTION_DAYS)
+
+
+def request_purge(user, cutoff, dry_run=False):
+    """
+    创建清理任务排队；有同类未完成的任务时直接返回该任务（沿用其截止时间）
+    失败的任务重新排队，从记录的进度继续
+    """
+    unfinished = RetentionPurge.objects.filter(
+        dry_run=dry_run,
+        status__in=[RetentionPurge.Status.PENDING, RetentionPurge.Status.RUNNING, RetentionPurge.Status.FAILED],
+    ).order_by('created_at').first()
+    if unfinished:
+        if unfinished.status == RetentionPurge.Status.FAILED:
+            RetentionPurge.objects.filter(pk=unfinished.pk, status=RetentionPurge.Status.FAILED).update(
+                status=RetentionPurge.Status.PENDING, error='', completed_at=None
+            )
+            unfinished.refresh_from_db()
+        return unfinished
+    return RetentionPurge.objects.create(requested_by=user, cutoff=cutoff, dry_run=dry_run)
+
+
+def claim_purge(purge):
+    """认领排队中或已中断的任务（条件更新，避免多个进程同时执行）"""
+    claimable = Q(status=RetentionPurge.Status.PENDING) | Q(
+        status=RetentionPurge.Status.RUNNING,
+        updated_at__lt=timezone.now() - STALE_PURGE_TIMEOUT,
+    )
+    now = timezone.now()
+    claimed = RetentionPurge.objects.filter(claimable, pk=purge.pk).update(
+        status=RetentionPurge.Status.RUNNING,
+        started_at=purge.started_at or now,
+        updated_at=now,
+    )
+    if claimed:
+        purge.refresh_from_db()
+    return bool(claimed)
+
+
+def _add_stats(stats, area, reports=0, size=0):
+    entry = stats.setdefault(area, {'reports': 0, 'bytes': 0})
+    entry['reports'] += reports
+    entry['bytes'] += size
+
+
+def _area_names(rows):
+    ids = {task_area_id for _, task_area_id, _, _, _ in rows}
+    return dict(TaskArea.objects.filter(id__in=ids).values_list('id', 'name'))
+
+
+def _next_batch(purge, batch_size, lock=False):
+    """下一批到期报告 [(ID, 任务区ID, 内容ID, 文件路径, 文件大小)]"""
+    queryset = Report.objects.filter(upload_date__lt=purge.cutoff, id__gt=purge.last_report_id)
+    if lock:
+        queryset = queryset.select_for_update()
+    return list(
+        queryset.order_by('id').values_list('id', 'task_area_id', 'blob_id', 'file', 'file_size')[:batch_size]
+    )
+
+
+def _estimate_batch(purge, rows, seen_blobs):
+    """试运行：统计本批报告删除后可回收的空间（仍被未到期报告引用的内容不计）"""
+    names = _area_names(rows)
+    blob_areas = {}
+    for report_id, task_area_id, blob_id, name, file_size in rows:
+        area = names.get(task_area_id, '')
+        if blob_id:
+            _add_stats(purge.task_area_stats, area, reports=1)
+            if blob_id not in seen_blobs:
+                blob_areas.setdefault(blob_id, area)
+        else:
+            _add_stats(purge.task_area_stats, area, reports=1, size=file_size if name else 0)
+            purge.reclaimed_bytes += file_size if name else 0
+            purge.deleted_files += 1 if name else 0
+    seen_blobs.update(blob_areas)
+
+    kept = set(
+        Report.objects.filter(blob_id__in=blob_areas, upload_date__gte=purge.cutoff)
+        .values_list('blob_id', flat=True).distinct()
+    )
+    freed = ReportBlob.objects.filter(id__in=set(blob_areas) - kept).values_list('id', 'stored_size')
+    for blob_id, stored_size in freed:
+        _add_stats(purge.task_area_stats, blob_areas[blob_id], size=stored_size)
+        purge.reclaimed_bytes += stored_size
+        purge.deleted_files += 1
+    purge.deleted_reports += len(rows)
+    purge.last_report_id = rows[-1][0]
+    purge.save()
+
+
+def _delete_batch(purge, batch_size):
+    """删除一批报告并记录进度（一个事务），返回需要删除的文件路径；没有到期报告时返回 None"""
+    with transaction.atomic():
+        rows = _next_batch(purge, batch_size, lock=True)
+        if not rows:
+            return None
+        names = _area_names(rows)
+        ids = [row[0] for row in rows]
+        blob_counts = Counter(blob_id for _, _, blob_id, _, _ in rows if blob_id)
+        blob_areas = {}
+        files = []
+        for report_id, task_area_id, blob_id, name, file_size in rows:
+            area = names.get(task_area_id, '')
+            if blob_id:
+                _add_stats(purge.task_area_stats, area, reports=1)
+                blob_areas.setdefault(blob_id, area)
+            else:
+                _add_stats(purge.task_area_stats, area, reports=1, size=file_size if name else 0)
+                if name:
+                    files.append(name)
+                    purge.reclaimed_bytes += file_size
+
+        # 先删除关联记录，避免级联删除时逐条收集；解除内容引用后由 release_blobs 批量释放
+        # （报告的 post_delete 信号因此不再重复释放）
+        ReportDownloadLog.objects.filter(report_id__in=ids).delete()
+        PackageReport.objects.filter(report_id__in=ids).delete()
+        Report.objects.filter(id__in=ids).update(blob=None)
+        Report.objects.filter(id__in=ids).delete()
+        for blob_id, name, stored_size in release_blobs(blob_counts):
+            files.append(name)
+            _add_stats(purge.task_area_stats, blob_areas[blob_id], size=stored_size)
+            purge.reclaimed_bytes += stored_size
+
+        purge.deleted_reports += len(rows)
+        purge.last_report_id = rows[-1][0]
+        purge.save()
+    return files
+
+
+def _delete_file(storage, name):
+    try:
+        storage.delete(name)
+        return True
+    except OSError as e:
+        logger.warning(f"删除文件失败 {name}: {e}")
+        return False
+
+
+def run_purge(purge, batch_size=BATCH_SIZE, workers=FILE_WORKERS, progress=None, time_limit=None):
+    """
+    执行已认领的清理任务（见 claim_purge），progress(purge) 在每批完成后调用
+    删除文件失败只计数，不影响数据库记录的删除；失败的文件由 scrub_media_files 报告为孤立文件
+    指定 time_limit（秒）时，超时后在当前批次完成后停止，任务重新排队（状态为排队中），可以继续执行
+    """
+    storage = Report._meta.get_field('file').storage
+    seen_blobs = set()
+    deadline = time.monotonic() + time_limit if time_limit else None
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            while True:
+                if purge.dry_run:
+                    rows = _next_batch(purge, batch_size)
+                    if not rows:
+                        break
+                    _estimate_batch(purge, rows, seen_blobs)
+                else:
+                    files = _delete_batch(purge, batch_size)
+                    if files is None:
+                        break
+                    results = list(pool.map(lambda name: _delete_file(storage, name), files))
+                    deleted = sum(results)
+                    if results:
+                        RetentionPurge.objects.filter(pk=purge.pk).update(
+                            deleted_files=purge.deleted_files + deleted,
+                            failed_files=purge.failed_files + len(results) - deleted,
+                        )
+                        purge.deleted_files += deleted
+                        purge.failed_files += len(results) - deleted
+                if progress:
+                    progress(purge)
+                if deadline and time.monotonic() > deadline:
+                    purge.status = RetentionPurge.Status.PENDING
+                    purge.save()
+                    return purge
+    except Exception as e:
+        # 失败批次的事务已回滚，内存中的统计和进度可能已经累加，以数据库中记录的进度为准
+        RetentionPurge.objects.filter(pk=purge.pk).update(
+            status=RetentionPurge.Status.FAILED, error=str(e), completed_at=timezone.now()
+        )
+        purge.refresh_from_db()
+        logger.error(f"报告清理任务 {purge.pk} 失败: {e}")
+        raise
+
+    purge.status = RetentionPurge.Status.COMPLETED
+    purge.completed_at = timezone.now()
+    purge.save()
+    return purge
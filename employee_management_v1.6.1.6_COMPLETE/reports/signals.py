@@ -0,0 +1,55 @@
+"""
+reports 信号处理
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from accounts.models import User
+
+from .blobs import release_blob
+from .compliance import invalidate_compliance
+from .models import Report
+
+# 影响提交情况矩阵的字段
+REPORT_COMPLIANCE_FIELDS = {'report_type', 'report_period', 'period_start', 'task_area', 'uploader', 'upload_date'}
+USER_COMPLIANCE_FIELDS = {'username', 'first_name', 'last_name', 'role', 'is_active', 'task_area_fk'}
+
+
+@receiver(post_delete, sender=Report)
+def report_deleted(sender, instance, **kwargs):
+    """报告删除后释放其文件内容（没有其他报告引用时删除文件）"""
+    if instance.blob_id:
+        blob_id = instance.blob_id
+        transaction.on_commit(lambda: release_blob(blob_id))
+    invalidate_compliance([instance.task_area_id])
+
+
+@receiver(pre_save, sender=Report)
+def remember_previous_task_area(sender, instance, update_fields=None, **kwargs):
+    """记录保存前的任务区，报告改到其他任务区时原任务区的矩阵也需要失效"""
+    instance._previous_task_area_id = None
+    if not instance.pk:
+        return
+    if update_fields is not None and 'task_area' not in update_fields:
+        return
+    instance._previous_task_area_id = Report.objects.filter(pk=instance.pk).values_list(
+        'task_area_id', flat=True
+    ).first()
+
+
+@receiver(post_save, sender=Report)
+def report_saved(sender, instance, update_fields=None, **kwargs):
+    """报告提交或修改周期后使提交情况矩阵失效"""
+    if update_fields is not None and not REPORT_COMPLIANCE_FIELDS.intersection(update_fields):
+        return
+    invalidate_compliance([instance.task_area_id, getattr(instance, '_previous_task_area_id', None)])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """用户的任务区、角色或状态变化后使提交情况矩阵失效（登录等只更新其他字段的保存除外）"""
+    if update_fields is not None and not USER_COMPLIANCE_FIELDS.intersection(update_fields):
+        return
+    invalidate_compliance(users=True)
@@ -0,0 +1,174 @@
+"""
+报告文件存储
+
+分目录：文件按名称哈希分到两级子目录（如 reports/ab/cd/报告.pdf），避免单个目录下文件过多，
+目录遍历、备份和 os.path.exists 都不会随文件数增加而变慢。已有文件由 shard_media_files 命令迁移。
+
+压缩：.doc/.xls/.ppt 等旧版 Office 格式保存时压缩（安装了 zstandard 时使用 zstd，否则使用 gzip），
+文件名不变；打开时按文件头识别并以流的方式解压，size() 返回解压后的大小，
+因此下载、打包等读取文件的代码不需要区分是否压缩。
+一旦保存过 zstd 压缩的文件，读取这些文件就必须安装 zstandard（未安装时 open/size 抛出 RuntimeError），
+部署环境不能再移除该依赖。
+"""
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SHARDED_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[^/]+$')
+
+# 保存时压缩的格式（新版 Office 格式和 PDF 本身已经压缩）
+COMPRESSIBLE_EXTENSIONS = {'.doc', '.xls', '.ppt'}
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+def shard_path(name, key=None):
+    """
+    在文件名前插入两级子目录：dir/name -> dir/ab/cd/name
+    key 为分目录依据（默认为文件名的 sha1），已经分目录的路径原样返回
+    """
+    if is_sharded(name):
+        return name
+    directory, filename = posixpath.split(name)
+    key = key or hashlib.sha1(filename.encode()).hexdigest()
+    return posixpath.join(directory, key[:2], key[2:4], filename)
+
+
+def is_sharded(name):
+    return bool(SHARDED_RE.search(name))
+
+
+@deconstructible
+class ShardedFileSystemStorage(FileSystemStorage):
+    """保存新文件时自动分目录的文件系统存储"""
+
+    def generate_filename(self, filename):
+        return shard_path(super().generate_filename(filename))
+
+
+def is_compressible(name):
+    return os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def _require_zstandard(name):
+    if zstandard is None:
+        raise RuntimeError(f'读取 {name} 需要安装 zstandard')
+
+
+def _compress(content, codec):
+    """将内容压缩到临时文件"""
+    output = tempfile.TemporaryFile()
+    if codec == ZSTD:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        writer = compressor.stream_writer(output, size=content.size, closefd=False)
+    else:
+        writer = gzip.GzipFile(fileobj=output, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)
+    with writer:
+        for chunk in content.chunks(COPY_BUFFER_SIZE):
+            writer.write(chunk)
+    output.seek(0)
+    return File(output)
+
+
+class DecompressedFile(File):
+    """压缩文件解压后的内容，关闭后可以重新打开"""
+
+    def __init__(self, storage, name, codec):
+        self._storage = storage
+        self._codec = codec
+        super().__init__(storage.decompressor(name, codec), name)
+        self.size = storage.size(name)
+
+    def open(self, mode=None):
+        # 解压流不一定支持回退，重新打开以回到开头
+        if not self.closed:
+            self.file.close()
+        self.file = self._storage.decompressor(self.name, self._codec)
+        return self
+
+
+@deconstructible
+class ReportFileStorage(ShardedFileSystemStorage):
+    """分目录并透明压缩旧版 Office 格式的文件系统存储"""
+
+    def compression(self, name):
+        """文件的压缩方式（未压缩返回 None）"""
+        if not is_compressible(name):
+            return None
+        try:
+            with open(self.path(name), 'rb') as f:
+                magic = f.read(4)
+        except FileNotFoundError:
+            return None
+        if magic.startswith(GZIP_MAGIC):
+            return GZIP
+        if magic == ZSTD_MAGIC:
+            return ZSTD
+        return None
+
+    def stored_size(self, name):
+        """磁盘上（压缩后）的大小"""
+        return super().size(name)
+
+    def size(self, name):
+        """解压后的大小"""
+        codec = self.compression(name)
+        if codec == GZIP:
+            # gzip 尾部记录原始大小（对 2^32 取模）
+            with open(self.path(name), 'rb') as f:
+                f.seek(-4, os.SEEK_END)
+                return int.from_bytes(f.read(4), 'little')
+        if codec == ZSTD:
+            _require_zstandard(name)
+            with open(self.path(name), 'rb') as f:
+                header = f.read(18)
+            return zstandard.frame_content_size(header)
+        return super().size(name)
+
+    def decompressor(self, name, codec):
+        """以流的方式解压的文件对象"""
+        path = self.path(name)
+        if codec == ZSTD:
+            _require_zstandard(name)
+            return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        return gzip.open(path, 'rb')
+
+    def _open(self, name, mode='rb'):
+        codec = self.compression(name)
+        if codec is None:
+            return super()._open(name, mode)
+        return DecompressedFile(self, name, codec)
+
+    def _save(self, name, content):
+        if is_compressible(name):
+            content = _compress(content, ZSTD if zstandard is not None else GZIP)
+        try:
+            return super()._save(name, content)
+        finally:
+            if is_compressible(name):
+                content.close()
+
+
+sharded_storage = ShardedFileSystemStorage()
+report_storage = ReportFileStorage()
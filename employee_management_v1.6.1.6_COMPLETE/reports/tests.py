@@ -0,0 +1,450 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import TaskArea, User
+
+from .archive import iter_zip
+from .blobs import release_blobs
+from .download_logs import DownloadLogBuffer
+from .models import Report, ReportBlob, ReportDownloadLog, RetentionPurge, UploadSession
+from .packages import package_content_hash
+from .retention import claim_purge, request_purge, run_purge
+from .views import filter_approvable, filter_downloadable
+
+
+def stored_blob_files():
+    """磁盘上的内容文件名"""
+    blob_dir = ReportBlob._meta.get_field('file').storage.path('reports/blobs')
+    return sorted(name for _, _, names in os.walk(blob_dir) for name in names)
+
+
+class MediaTestCase(TestCase):
+    """使用临时 MEDIA_ROOT 的测试基类"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.task_area = TaskArea.objects.create(name='一区')
+        self.employee = User.objects.create_user(
+            username='employee', password='x', role=User.Role.EMPLOYEE, task_area_fk=self.task_area
+        )
+
+    def create_report(self, content=b'report', period='2025-W10', uploader=None, name='report.pdf'):
+        return Report.objects.create(
+            uploader=uploader or self.employee,
+            report_type=Report.ReportType.WEEKLY,
+            report_period=period,
+            task_area=self.task_area,
+            file=ContentFile(content, name=name),
+        )
+
+
+class ChunkedUploadTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.employee)
+
+    def create_session(self, content):
+        response = self.client.post(reverse('reports:upload_session_create'), {
+            'report_type': Report.ReportType.WEEKLY,
+            'report_period': '2025-W10',
+            'filename': 'weekly.pdf',
+            'file_size': len(content),
+            'sha256': hashlib.sha256(content).hexdigest(),
+        })
+        self.assertEqual(response.status_code, 201)
+        return UploadSession.objects.get(pk=response.json()['upload_id'])
+
+    def put_chunk(self, session, index, data):
+        return self.client.put(
+            reverse('reports:upload_chunk', args=[session.pk, index]),
+            data,
+            content_type='application/octet-stream',
+            HTTP_X_CHUNK_SHA256=hashlib.sha256(data).hexdigest(),
+        )
+
+    def complete(self, session):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('reports:upload_session_complete', args=[session.pk]))
+
+    def test_chunks_are_assembled_in_order(self):
+        content = b'0123456789' * 5
+        session = self.create_session(content)
+        UploadSession.objects.filter(pk=session.pk).update(chunk_size=16)
+        session.refresh_from_db()
+        chunks = [content[i:i + 16] for i in range(0, len(content), 16)]
+
+        # 倒序上传，并重传一块
+        for index in reversed(range(len(chunks))):
+            self.assertEqual(self.put_chunk(session, index, chunks[index]).status_code, 200)
+        self.assertEqual(self.put_chunk(session, 1, chunks[1]).status_code, 200)
+        detail = self.client.get(reverse('reports:upload_session', args=[session.pk])).json()
+        self.assertEqual(detail['received'], list(range(len(chunks))))
+
+        response = self.complete(session)
+        self.assertEqual(response.status_code, 200)
+        report = Report.objects.get(pk=response.json()['report_id'])
+        with report.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(report.file_size, len(content))
+
+    def test_wrong_chunk_size_and_checksum_are_rejected(self):
+        session = self.create_session(b'abcdef')
+        self.assertEqual(self.put_chunk(session, 0, b'abc').status_code, 400)
+        response = self.client.put(
+            reverse('reports:upload_chunk', args=[session.pk, 0]),
+            b'abcdef',
+            content_type='application/octet-stream',
+            HTTP_X_CHUNK_SHA256='0' * 64,
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.complete(session)
+        self.assertEqual(response.status_code, 400)
+        session.refresh_from_db()
+        self.assertEqual(session.status, UploadSession.Status.UPLOADING)
+
+    def test_duplicate_upload_reports_existing_and_releases_blob(self):
+        first = self.create_session(b'first')
+        second = self.create_session(b'second')
+        self.put_chunk(first, 0, b'first')
+        self.put_chunk(second, 0, b'second')
+        self.assertEqual(self.complete(first).status_code, 200)
+
+        response = self.complete(second)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], '该报告已存在')
+        second.refresh_from_db()
+        self.assertEqual(second.status, UploadSession.Status.UPLOADING)
+
+        # 第二次上传保存的内容已释放，文件也已删除
+        blob = ReportBlob.objects.get()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertEqual(blob.sha256, hashlib.sha256(b'first').hexdigest())
+        self.assertEqual(stored_blob_files(), [os.path.basename(blob.file.name)])
+
+
+class BlobRefCountTests(MediaTestCase):
+
+    def blob(self, content):
+        return ReportBlob.objects.get(sha256=hashlib.sha256(content).hexdigest())
+
+    def test_create_references_shared_content(self):
+        first = self.create_report(b'same', period='2025-W10')
+        second = self.create_report(b'same', period='2025-W11')
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(self.blob(b'same').ref_count, 2)
+        self.assertEqual(len(stored_blob_files()), 1)
+
+    def test_replace_releases_previous_content(self):
+        report = self.create_report(b'old')
+        report.file = ContentFile(b'new', name='report.pdf')
+        report.save()
+        self.assertFalse(ReportBlob.objects.filter(sha256=hashlib.sha256(b'old').hexdigest()).exists())
+        self.assertEqual(self.blob(b'new').ref_count, 1)
+
+    def test_replace_with_same_content_keeps_one_reference(self):
+        report = self.create_report(b'same')
+        report.file = ContentFile(b'same', name='report.pdf')
+        report.save()
+        self.assertEqual(self.blob(b'same').ref_count, 1)
+
+    def test_delete_releases_content_and_file(self):
+        first = self.create_report(b'same', period='2025-W10')
+        second = self.create_report(b'same', period='2025-W11')
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.blob(b'same').ref_count, 1)
+        self.assertEqual(len(stored_blob_files()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(ReportBlob.objects.exists())
+        self.assertEqual(stored_blob_files(), [])
+
+
+class DownloadLogBufferTests(MediaTestCase):
+
+    def test_failed_flush_keeps_entries_for_retry(self):
+        report = self.create_report()
+        buffer = DownloadLogBuffer(flush_size=10)
+        buffer._pending = [ReportDownloadLog(report_id=report.id, downloader_id=self.employee.id)]
+
+        with mock.patch.object(ReportDownloadLog.objects, 'bulk_create', side_effect=OperationalError('gone')):
+            self.assertFalse(buffer.flush())
+        self.assertEqual(len(buffer._pending), 1)
+
+        self.assertTrue(buffer.flush())
+        self.assertEqual(buffer._pending, [])
+        self.assertEqual(ReportDownloadLog.objects.filter(report=report).count(), 1)
+
+
+class BulkDownloadTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.manager = User.objects.create_user(
+            username='manager', password='x', role=User.Role.TASK_AREA_MANAGER, task_area_fk=self.task_area
+        )
+        self.client.force_login(self.manager)
+
+    def test_stream_contains_selected_reports(self):
+        first = self.create_report(b'first', period='2025-W10')
+        second = self.create_report(b'second', period='2025-W11', name='report.doc')
+        response = self.client.post(reverse('reports:bulk_download'), {'report_ids': [first.pk, second.pk]})
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            contents = {archive.read(name) for name in archive.namelist()}
+        self.assertEqual(contents, {b'first', b'second'})
+
+    def test_missing_file_is_reported_before_streaming(self):
+        report = self.create_report(b'gone')
+        report.file.storage.delete(report.file.name)
+        response = self.client.post(reverse('reports:bulk_download'), {'report_ids': [report.pk]})
+        self.assertRedirects(response, reverse('reports:manage_reports'), fetch_redirect_response=False)
+
+    def test_iter_zip_skips_files_missing_while_streaming(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        present = os.path.join(directory, 'present.pdf')
+        with open(present, 'wb') as f:
+            f.write(b'present')
+        entries = [('missing.pdf', os.path.join(directory, 'missing.pdf'), None), ('present.pdf', present, None)]
+        for read_ahead in (0, 2):
+            with self.subTest(read_ahead=read_ahead):
+                data = b''.join(iter_zip(entries, read_ahead=read_ahead))
+                with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                    self.assertEqual(archive.namelist(), ['present.pdf'])
+                    self.assertIsNone(archive.testzip())
+
+
+class ReportPermissionFilterTests(MediaTestCase):
+    """批量权限检查：可审批的报告不含本人上传的其他任务区报告，可下载的报告含本人上传的"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_area = TaskArea.objects.create(name='二区')
+        self.manager = User.objects.create_user(
+            username='manager', role=User.Role.TASK_AREA_MANAGER, task_area_fk=self.task_area
+        )
+        self.local = self.create_report(b'local')
+        self.remote = Report.objects.create(
+            uploader=User.objects.create_user(username='remote', role=User.Role.EMPLOYEE, task_area_fk=self.other_area),
+            report_type=Report.ReportType.WEEKLY,
+            report_period='2025-W10',
+            task_area=self.other_area,
+            file=ContentFile(b'remote', name='report.pdf'),
+        )
+        self.own_remote = Report.objects.create(
+            uploader=self.manager,
+            report_type=Report.ReportType.WEEKLY,
+            report_period='2025-W10',
+            task_area=self.other_area,
+            file=ContentFile(b'own', name='report.pdf'),
+        )
+
+    def test_filter_approvable(self):
+        approvable, denied_ids = filter_approvable(self.manager, Report.objects.all())
+        self.assertEqual(list(approvable), [self.local])
+        self.assertEqual(denied_ids, {self.remote.pk, self.own_remote.pk})
+
+    def test_filter_downloadable_includes_own_reports(self):
+        downloadable, denied_ids = filter_downloadable(self.manager, Report.objects.all())
+        self.assertEqual(set(downloadable), {self.local, self.own_remote})
+        self.assertEqual(denied_ids, {self.remote.pk})
+
+    def test_superuser_is_denied_nothing(self):
+        superuser = User.objects.create_user(username='admin', role=User.Role.SUPERUSER)
+        approvable, denied_ids = filter_approvable(superuser, Report.objects.all())
+        self.assertEqual(approvable.count(), 3)
+        self.assertEqual(denied_ids, set())
+
+
+class PackageContentHashTests(MediaTestCase):
+    """下载包按内容哈希复用，压缩包内文件名用到的姓名或任务区名称变化后哈希随之变化"""
+
+    def setUp(self):
+        super().setUp()
+        self.create_report()
+
+    def content_hash(self):
+        return package_content_hash(Report.objects.all())
+
+    def test_unchanged_reports_keep_hash(self):
+        self.assertEqual(self.content_hash(), self.content_hash())
+
+    def test_task_area_rename_changes_hash(self):
+        before = self.content_hash()
+        self.task_area.name = '新一区'
+        self.task_area.save()
+        self.assertNotEqual(self.content_hash(), before)
+
+    def test_uploader_rename_changes_hash(self):
+        before = self.content_hash()
+        self.employee.first_name = '四'
+        self.employee.save()
+        self.assertNotEqual(self.content_hash(), before)
+
+
+@mock.patch('reports.views.record_download')
+class RangeDownloadTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.employee)
+        self.content = bytes(range(256)) * 4
+
+    def download(self, report, **headers):
+        response = self.client.get(reverse('reports:download_report', args=[report.pk]), **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_download(self, record_download):
+        response, body = self.download(self.create_report(self.content))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        record_download.assert_called_once()
+
+    def test_byte_range(self, record_download):
+        report = self.create_report(self.content)
+        response, body = self.download(report, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '10')
+        # 续传请求不重复记录下载日志
+        record_download.assert_not_called()
+
+        response, body = self.download(report, HTTP_RANGE='bytes=-5')
+        self.assertEqual(body, self.content[-5:])
+
+    def test_range_from_start_is_logged(self, record_download):
+        response, _ = self.download(self.create_report(self.content), HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        record_download.assert_called_once()
+
+    def test_unsatisfiable_range(self, record_download):
+        response, _ = self.download(self.create_report(self.content), HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_stale_if_range_returns_full_file(self, record_download):
+        response, body = self.download(
+            self.create_report(self.content), HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+
+    def test_if_none_match_returns_304(self, record_download):
+        report = self.create_report(self.content)
+        response, _ = self.download(report)
+        response, _ = self.download(report, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(record_download.call_count, 1)
+
+    def test_range_of_compressed_file(self, record_download):
+        report = self.create_report(self.content, name='report.doc')
+        self.assertTrue(report.file.storage.compression(report.file.name))
+        response, body = self.download(report, HTTP_RANGE='bytes=100-299')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.content[100:300])
+
+    @override_settings(FILE_DOWNLOAD_OFFLOAD='nginx')
+    def test_offload_to_nginx(self, record_download):
+        report = self.create_report(self.content)
+        response, body = self.download(report)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b'')
+        self.assertTrue(response['X-Accel-Redirect'].endswith(report.file.name))
+
+
+class RetentionPurgeTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        old_date = timezone.now() - timedelta(days=400)
+        self.old = [self.create_report(f'old{index}'.encode(), period=f'2024-W{index + 10}') for index in range(5)]
+        # 与未到期报告共用内容的到期报告
+        self.shared = self.create_report(b'shared', period='2024-W30')
+        Report.objects.filter(pk__in=[report.pk for report in [*self.old, self.shared]]).update(upload_date=old_date)
+        self.recent = self.create_report(b'shared', period='2025-W10')
+        self.cutoff = timezone.now() - timedelta(days=180)
+
+    def start(self, dry_run=False):
+        purge = request_purge(None, self.cutoff, dry_run=dry_run)
+        self.assertTrue(claim_purge(purge))
+        return purge
+
+    def assertPurged(self):
+        self.assertEqual(list(Report.objects.all()), [self.recent])
+        self.assertEqual(ReportBlob.objects.get().ref_count, 1)
+        self.assertEqual(stored_blob_files(), [os.path.basename(self.recent.file.name)])
+
+    def test_purge_deletes_expired_reports_and_files(self):
+        purge = run_purge(self.start(), batch_size=2, workers=2)
+        self.assertEqual(purge.status, RetentionPurge.Status.COMPLETED)
+        self.assertEqual((purge.deleted_reports, purge.deleted_files, purge.failed_files), (6, 5, 0))
+        self.assertEqual(purge.task_area_stats[self.task_area.name]['reports'], 6)
+        self.assertPurged()
+
+    def test_failed_purge_resumes_after_last_batch(self):
+        real_release = release_blobs
+        calls = []
+
+        def fail_second_batch(counts):
+            calls.append(counts)
+            if len(calls) == 2:
+                raise OSError('disk gone')
+            return real_release(counts)
+
+        purge = self.start()
+        with mock.patch('reports.retention.release_blobs', side_effect=fail_second_batch):
+            with self.assertRaises(OSError):
+                run_purge(purge, batch_size=2, workers=1)
+        purge.refresh_from_db()
+        self.assertEqual(purge.status, RetentionPurge.Status.FAILED)
+        self.assertEqual(purge.deleted_reports, 2)
+        self.assertEqual(purge.last_report_id, self.old[1].pk)
+        self.assertEqual(Report.objects.count(), 5)
+
+        resumed = self.start()
+        self.assertEqual(resumed.pk, purge.pk)
+        resumed = run_purge(resumed, batch_size=2, workers=1)
+        self.assertEqual(resumed.status, RetentionPurge.Status.COMPLETED)
+        self.assertEqual(resumed.deleted_reports, 6)
+        self.assertPurged()
+
+    def test_time_limit_requeues_purge(self):
+        purge = run_purge(self.start(), batch_size=2, workers=1, time_limit=1e-9)
+        self.assertEqual(purge.status, RetentionPurge.Status.PENDING)
+        self.assertEqual(purge.deleted_reports, 2)
+
+        purge = run_purge(self.start(), batch_size=10, workers=1)
+        self.assertEqual(purge.status, RetentionPurge.Status.COMPLETED)
+        self.assertPurged()
+
+    def test_dry_run_only_estimates(self):
+        purge = run_purge(self.start(dry_run=True), batch_size=2)
+        self.assertEqual(purge.status, RetentionPurge.Status.COMPLETED)
+        self.assertEqual(purge.deleted_reports, 6)
+        # 共用内容仍被未到期报告引用，不计入可回收空间
+        self.assertEqual(purge.deleted_files, 5)
+        self.assertEqual(Report.objects.count(), 7)
@@ -0,0 +1,120 @@
+"""
+分块上传（断点续传）
+
+客户端先创建上传会话，再按固定大小逐块上传（每块可附带 SHA-256 供服务器校验），
+连接中断后查询会话得到已收到的块，只补传缺少的块。
+分块保存在 CHUNKED_UPLOAD_ROOT/<上传ID>/ 下，全部收到后按顺序拼接成磁盘上的文件，
+拼接时流式计算整个文件的 SHA-256，再保存为报告文件。任何时候都不把整个文件读入内存。
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+
+from .models import Report
+
+# 分块大小
+CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 2 * 1024 * 1024)
+
+# 单个文件的最大大小
+MAX_UPLOAD_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+
+# 读写磁盘的块大小
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class ChunkError(ValueError):
+    """分块大小或校验和不正确"""
+
+
+def upload_root():
+    return getattr(settings, 'CHUNKED_UPLOAD_ROOT', os.path.join(settings.MEDIA_ROOT, 'chunked_uploads'))
+
+
+def session_dir(session):
+    return os.path.join(upload_root(), str(session.pk))
+
+
+def _chunk_path(session, index):
+    return os.path.join(session_dir(session), f'{index:06d}.part')
+
+
+def validate_filename(filename):
+    """按报告文件字段的校验规则检查扩展名，不符合时抛出 ValidationError"""
+    for validator in Report._meta.get_field('file').validators:
+        validator(File(None, name=filename))
+
+
+def received_chunks(session):
+    """已完整收到的块序号（块写完后才改为最终文件名，因此存在即完整）"""
+    try:
+        names = os.listdir(session_dir(session))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-5]) for name in names if name.endswith('.part'))
+
+
+def write_chunk(session, index, stream, checksum=None):
+    """
+    从 stream 读取第 index 块写入磁盘，返回该块的 SHA-256
+    长度或校验和不符时丢弃并抛出 ChunkError；重复上传的块会覆盖原来的块
+    """
+    if not 0 <= index < session.total_chunks:
+        raise ChunkError(f'块序号超出范围: {index}')
+    expected = session.chunk_length(index)
+
+    directory = session_dir(session)
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    length = 0
+    with tempfile.NamedTemporaryFile(dir=directory, suffix='.tmp', delete=False) as part:
+        try:
+            while True:
+                data = stream.read(COPY_BUFFER_SIZE)
+                if not data:
+                    break
+                length += len(data)
+                if length > expected:
+                    break
+                digest.update(data)
+                part.write(data)
+        except Exception:
+            os.remove(part.name)
+            raise
+
+    if length != expected:
+        os.remove(part.name)
+        raise ChunkError(f'第 {index} 块大小不正确：应为 {expected} 字节')
+    if checksum and checksum.lower() != digest.hexdigest():
+        os.remove(part.name)
+        raise ChunkError(f'第 {index} 块校验失败')
+    os.replace(part.name, _chunk_path(session, index))
+    return digest.hexdigest()
+
+
+def assemble(session):
+    """按顺序拼接所有块，返回 (合并后的文件路径, SHA-256)"""
+    missing = sorted(set(range(session.total_chunks)) - set(received_chunks(session)))
+    if missing:
+        raise ChunkError(f'还有 {len(missing)} 块未上传')
+
+    path = os.path.join(session_dir(session), 'assembled')
+    digest = hashlib.sha256()
+    with open(path, 'wb') as output:
+        for index in range(session.total_chunks):
+            with open(_chunk_path(session, index), 'rb') as part:
+                while True:
+                    data = part.read(COPY_BUFFER_SIZE)
+                    if not data:
+                        break
+                    digest.update(data)
+                    output.write(data)
+    return path, digest.hexdigest()
+
+
+def discard(session):
+    """删除会话的分块文件"""
+    shutil.rmtree(session_dir(session), ignore_errors=True)
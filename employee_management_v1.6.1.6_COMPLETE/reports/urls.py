@@ -6,14 +6,20 @@ app_name = 'reports'
 urlpatterns = [
     # 个人报告管理
     path('upload/', views.upload_report, name='upload'),
+    path('uploads/', views.upload_session_create, name='upload_session_create'),
+    path('uploads/<uuid:upload_id>/', views.upload_session_detail, name='upload_session'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>/', views.upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:upload_id>/complete/', views.upload_session_complete, name='upload_session_complete'),
     path('my-reports/', views.my_reports, name='my_reports'),
     path('<int:report_id>/', views.report_detail, name='report_detail'),
     path('<int:report_id>/download/', views.download_report, name='download_report'),
     
     # 管理功能
     path('manage/', views.manage_reports, name='manage_reports'),
+    path('compliance/', views.compliance_matrix, name='compliance_matrix'),
     path('bulk-download/', views.bulk_download, name='bulk_download'),
     path('bulk-download/<int:package_id>/', views.download_package, name='download_package'),
+    path('bulk-download/<int:package_id>/status/', views.package_status, name='package_status'),
     
     # 维护功能
     path('cleanup/', views.cleanup_old_reports, name='cleanup_old_reports'),
@@ -4,24 +4,51 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse, FileResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.db.models import Q, Count, Sum
 from django.core.paginator import Paginator
 from django.core.management import call_command
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.template.defaultfilters import filesizeformat
+from django.core.files import File
+from django.db import IntegrityError, transaction
 from django.urls import reverse
+from django.utils.http import content_disposition_header
+from datetime import date
 import os
-import zipfile
-from io import BytesIO
 import logging
 
-from .models import Report, ReportDownloadLog, BulkDownloadPackage, PackageReport
+from .models import Report, BulkDownloadPackage, RetentionPurge, UploadSession
+from .archive import iter_zip, missing_reports, report_entries
+from .compliance import (
+    PERIODIC_TYPES, STATUS_LABELS, compliance_matrix as compliance_matrix_data, get_compliance_scope,
+)
+from .download_logs import record_download
+from .downloads import file_response, is_new_download
+from .packages import can_access_package, request_bulk_package, run_package_job
+from .periods import parse_period_bound
+from .retention import REQUEST_TIME_LIMIT, RETENTION_DAYS, claim_purge, default_cutoff, request_purge, run_purge
+from .uploads import (
+    CHUNK_SIZE as UPLOAD_CHUNK_SIZE, MAX_UPLOAD_SIZE,
+    ChunkError, assemble, discard, received_chunks, validate_filename, write_chunk,
+)
 from accounts.models import User, TaskArea
-from accounts.permissions import role_required
+from accounts.permissions import role_required, split_by_permission
+from accounts.scope import get_scope_resolver
 
 logger = logging.getLogger(__name__)
 
+# 下载包是否由后台工作进程（run_bulk_packages 命令）生成，关闭时在请求内生成
+BULK_PACKAGES_ASYNC = getattr(settings, 'BULK_PACKAGES_ASYNC', True)
+
+# 清理旧报告是否由 purge_old_reports --queued（cron）执行，关闭时在请求内分批执行
+REPORT_PURGE_ASYNC = getattr(settings, 'REPORT_PURGE_ASYNC', False)
+
+# 提交情况矩阵最多显示的周期数
+MAX_COMPLIANCE_PERIODS = 52
+
 
 @login_required
 def upload_report(request):
@@ -39,22 +66,9 @@ def upload_report(request):
                 messages.error(request, '请填写所有必填字段')
                 return redirect('reports:upload')
             
-            # 根据当前用户自动分配任务区
-            task_area = request.user.task_area_fk
-            if not task_area:
-                messages.error(request, '用户未设置任务区，请联系管理员')
-                return redirect('reports:upload')
-            
-            # 检查是否已存在相同报告
-            existing_report = Report.objects.filter(
-                uploader=request.user,
-                report_type=report_type,
-                report_period=report_period,
-                task_area=task_area
-            ).first()
-            
-            if existing_report:
-                messages.error(request, f'您已经上传过 {report_type} 的 {report_period} 报告')
+            task_area, error = check_report_upload(request.user, report_type, report_period)
+            if error:
+                messages.error(request, error)
                 return redirect('reports:upload')
             
             # 创建报告记录
@@ -77,10 +91,174 @@ def upload_report(request):
     
     context = {
         'report_types': Report.ReportType.choices,
+        'max_upload_mb': MAX_UPLOAD_SIZE // 1024 // 1024,
     }
     return render(request, 'reports/upload_report.html', context)
 
 
+@login_required
+def upload_session_create(request):
+    """
+    创建分块上传会话
+    参数：report_type、report_period、filename、file_size，可选 sha256（整个文件的校验和）
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': '无效的请求方法'}, status=405)
+    
+    report_type = request.POST.get('report_type')
+    report_period = request.POST.get('report_period')
+    filename = os.path.basename(request.POST.get('filename', ''))
+    try:
+        file_size = int(request.POST.get('file_size', ''))
+    except ValueError:
+        file_size = 0
+    
+    if not all([report_type, report_period, filename]) or file_size <= 0:
+        return JsonResponse({'success': False, 'message': '请填写所有必填字段'}, status=400)
+    if report_type not in Report.ReportType.values:
+        return JsonResponse({'success': False, 'message': '无效的报告类型'}, status=400)
+    if len(report_period) > UploadSession._meta.get_field('report_period').max_length:
+        return JsonResponse({'success': False, 'message': '报告周期过长'}, status=400)
+    if file_size > MAX_UPLOAD_SIZE:
+        return JsonResponse({
+            'success': False,
+            'message': f'文件不能超过 {MAX_UPLOAD_SIZE // 1024 // 1024} MB'
+        }, status=400)
+    try:
+        validate_filename(filename)
+    except ValidationError:
+        return JsonResponse({'success': False, 'message': '不支持的文件格式'}, status=400)
+    
+    task_area, error = check_report_upload(request.user, report_type, report_period)
+    if error:
+        return JsonResponse({'success': False, 'message': error}, status=400)
+    
+    session = UploadSession.objects.create(
+        uploader=request.user,
+        report_type=report_type,
+        report_period=report_period,
+        task_area=task_area,
+        filename=filename,
+        file_size=file_size,
+        chunk_size=UPLOAD_CHUNK_SIZE,
+        sha256=request.POST.get('sha256', '').lower(),
+    )
+    return JsonResponse(upload_session_data(session), status=201)
+
+
+@login_required
+def upload_session_detail(request, upload_id):
+    """
+    上传会话状态（断点续传时查询已收到的块）
+    """
+    session = get_object_or_404(UploadSession, id=upload_id, uploader=request.user)
+    return JsonResponse(upload_session_data(session))
+
+
+@login_required
+def upload_chunk(request, upload_id, index):
+    """
+    上传一块（请求体为该块的原始数据，X-Chunk-SHA256 头为该块的校验和）
+    """
+    if request.method not in ('PUT', 'POST'):
+        return JsonResponse({'success': False, 'message': '无效的请求方法'}, status=405)
+    
+    session = get_object_or_404(UploadSession, id=upload_id, uploader=request.user)
+    if session.status != UploadSession.Status.UPLOADING:
+        return JsonResponse({'success': False, 'message': '上传已结束'}, status=409)
+    
+    try:
+        checksum = write_chunk(session, index, request, request.headers.get('X-Chunk-SHA256'))
+    except ChunkError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    # 更新最后活动时间（清理过期会话时使用）
+    UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+    return JsonResponse({'success': True, 'index': index, 'sha256': checksum})
+
+
+@login_required
+def upload_session_complete(request, upload_id):
+    """
+    所有块上传完成后合并文件并创建报告
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': '无效的请求方法'}, status=405)
+    
+    session = get_object_or_404(UploadSession, id=upload_id, uploader=request.user)
+    if session.status == UploadSession.Status.COMPLETED:
+        return JsonResponse(upload_session_data(session))
+    
+    # 条件更新，重复提交时只合并一次
+    claimed = UploadSession.objects.filter(
+        pk=session.pk, status=UploadSession.Status.UPLOADING
+    ).update(status=UploadSession.Status.ASSEMBLING)
+    if not claimed:
+        return JsonResponse({'success': False, 'message': '文件正在合并，请稍候'}, status=409)
+    
+    try:
+        path, sha256 = assemble(session)
+        if session.sha256 and session.sha256 != sha256:
+            discard(session)
+            session.status = UploadSession.Status.UPLOADING
+            session.save(update_fields=['status', 'updated_at'])
+            return JsonResponse({'success': False, 'message': '文件校验失败，请重新上传'}, status=400)
+        
+        with open(path, 'rb') as assembled:
+            with transaction.atomic():
+                # Report.save 在保存点中插入，报告已存在时只回滚插入，
+                # 本事务照常提交，其中包括释放本次保存的文件内容
+                try:
+                    report = Report.objects.create(
+                        uploader=session.uploader,
+                        report_type=session.report_type,
+                        report_period=session.report_period,
+                        task_area=session.task_area,
+                        file=File(assembled, name=session.filename),
+                        file_size=session.file_size
+                    )
+                except IntegrityError as e:
+                    duplicate = e
+                else:
+                    duplicate = None
+                    session.report = report
+                    session.sha256 = sha256
+                    session.status = UploadSession.Status.COMPLETED
+                    session.save()
+        if duplicate is not None:
+            raise duplicate
+    except (ChunkError, IntegrityError) as e:
+        UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.Status.UPLOADING)
+        message = str(e) if isinstance(e, ChunkError) else '该报告已存在'
+        return JsonResponse({'success': False, 'message': message}, status=400)
+    except Exception as e:
+        UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.Status.UPLOADING)
+        logger.error(f"报告上传失败: {e}")
+        return JsonResponse({'success': False, 'message': '合并文件失败，请重试'}, status=500)
+    
+    discard(session)
+    messages.success(request, '报告上传成功！')
+    return JsonResponse(upload_session_data(session))
+
+
+def upload_session_data(session):
+    """上传会话的 JSON 数据"""
+    received = received_chunks(session) if session.status != UploadSession.Status.COMPLETED else []
+    data = {
+        'success': True,
+        'upload_id': str(session.pk),
+        'status': session.status,
+        'chunk_size': session.chunk_size,
+        'total_chunks': session.total_chunks,
+        'received': received,
+    }
+    if session.status == UploadSession.Status.COMPLETED:
+        data['sha256'] = session.sha256
+        data['report_id'] = session.report_id
+        data['redirect_url'] = reverse('reports:my_reports')
+    return data
+
+
 @login_required
 def my_reports(request):
     """
@@ -95,15 +273,15 @@ def my_reports(request):
     
     if user.role == User.Role.EMPLOYEE:
         # 普通员工：只能看到自己上传的报告
-        reports = Report.objects.filter(uploader=user).order_by('-upload_date')
+        reports = Report.objects.visible_to(user).order_by('-upload_date')
         can_upload = True
         title = '我的报告'
         subtitle = '查看和管理您上传的报告'
         
     elif user.role == User.Role.TASK_AREA_MANAGER:
         # 任务区负责人:可以看到本任务区普通员工上传的报告,也可以上传自己的报告给总部
-        reports = Report.objects.filter(
-            Q(task_area=user.task_area_fk, uploader__role=User.Role.EMPLOYEE) |  # 普通员工的报告
+        reports = Report.objects.visible_to(user).filter(
+            Q(uploader__role=User.Role.EMPLOYEE) |  # 普通员工的报告
             Q(uploader=user)  # 自己上传的报告
         ).order_by('-upload_date')
         can_upload = True
@@ -113,9 +291,7 @@ def my_reports(request):
         
     elif user.role == User.Role.HEAD_MANAGER:
         # 总部负责人：可以看到管辖任务区任务区负责人上传的报告
-        managed_areas = user.managed_task_areas.all()
-        reports = Report.objects.filter(
-            task_area__in=managed_areas,
+        reports = Report.objects.visible_to(user, include_own=False).filter(
             uploader__role=User.Role.TASK_AREA_MANAGER  # 只显示任务区负责人上传的报告
         ).order_by('-upload_date')
         title = '总部报告管理'
@@ -123,7 +299,7 @@ def my_reports(request):
         
     elif user.role == User.Role.SUPERUSER:
         # 超级管理员：可以看到所有任务区负责人提交的报告
-        reports = Report.objects.filter(
+        reports = Report.objects.visible_to(user, include_own=False).filter(
             uploader__role=User.Role.TASK_AREA_MANAGER  # 只显示任务区负责人上传的报告
         ).order_by('-upload_date')
         title = '系统报告管理'
@@ -135,6 +311,8 @@ def my_reports(request):
     status = request.GET.get('status')
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
+    period_from = request.GET.get('period_from')
+    period_to = request.GET.get('period_to')
     task_area_filter = request.GET.get('task_area')
     name_filter = request.GET.get('name')
     
@@ -159,6 +337,9 @@ def my_reports(request):
     if date_to:
         reports = reports.filter(upload_date__lte=date_to)
     
+    # 报告周期筛选（如 2025-W10 至 2025-W20，或日期）
+    reports = filter_by_period(reports, period_from, period_to)
+    
     # 按任务区筛选（仅总部负责人和超级管理员）
     if task_area_filter and user.role in [User.Role.HEAD_MANAGER, User.Role.SUPERUSER]:
         reports = reports.filter(task_area_id=task_area_filter)
@@ -207,8 +388,11 @@ def my_reports(request):
         'subtitle': subtitle,
         'date_from': date_from,
         'date_to': date_to,
+        'period_from': period_from,
+        'period_to': period_to,
         'task_area_filter': task_area_filter,
         'name_filter': name_filter,
+        'query_string': pagination_query(request),
     }
     return render(request, 'reports/role_based_reports.html', context)
 
@@ -219,21 +403,8 @@ def manage_reports(request):
     """
     管理报告（任务区负责人、总部负责人）
     """
-    # 根据角色获取可管理的报告
-    if request.user.role == User.Role.TASK_AREA_MANAGER:
-        # 任务区负责人：只能看本任务区的报告
-        reports = Report.objects.filter(
-            task_area=request.user.task_area_fk
-        ).order_by('-upload_date')
-    elif request.user.role == User.Role.HEAD_MANAGER:
-        # 总部负责人：看管辖任务区的报告
-        managed_areas = request.user.managed_task_areas.all()
-        reports = Report.objects.filter(
-            task_area__in=managed_areas
-        ).order_by('-upload_date')
-    else:
-        # 超级管理员：看所有报告
-        reports = Report.objects.all().order_by('-upload_date')
+    # 根据角色获取可管理的报告（任务区负责人：本任务区；总部负责人：管辖任务区；超级管理员：全部）
+    reports = Report.objects.visible_to(request.user, include_own=False).order_by('-upload_date')
     
     # 搜索和筛选
     search = request.GET.get('search')
@@ -242,6 +413,8 @@ def manage_reports(request):
     task_area = request.GET.get('task_area')
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
+    period_from = request.GET.get('period_from')
+    period_to = request.GET.get('period_to')
     
     if search:
         reports = reports.filter(
@@ -266,6 +439,8 @@ def manage_reports(request):
     if date_to:
         reports = reports.filter(upload_date__lte=date_to)
     
+    reports = filter_by_period(reports, period_from, period_to)
+    
     # 分页
     paginator = Paginator(reports, 15)
     page_number = request.GET.get('page')
@@ -294,6 +469,7 @@ def manage_reports(request):
         'task_areas': task_areas,
         'report_types': Report.ReportType.choices,
         'status_choices': Report.ReportStatus.choices,
+        'query_string': pagination_query(request),
     }
     return render(request, 'reports/manage_reports.html', context)
 
@@ -315,11 +491,7 @@ def report_detail(request, report_id):
         report.mark_as_viewed(request.user)
         
         # 记录下载日志
-        ReportDownloadLog.objects.create(
-            report=report,
-            downloader=request.user,
-            ip_address=get_client_ip(request)
-        )
+        record_download(report, request.user, get_client_ip(request))
     
     # 获取下载日志
     download_logs = report.download_logs.select_related('downloader').order_by('-download_time')[:10]
@@ -346,24 +518,12 @@ def download_report(request, report_id):
         return redirect('reports:my_reports')
     
     try:
-        # 记录下载日志
-        ReportDownloadLog.objects.create(
-            report=report,
-            downloader=request.user,
-            ip_address=get_client_ip(request)
-        )
-        
-        # 生成下载文件名: "姓名+任务区+时间段+报告类型"
-        task_area_name = report.task_area.name if report.task_area else "未知任务区"
-        file_extension = os.path.splitext(report.file.name)[1]
-        filename = f"{report.uploader.get_full_name()}_{task_area_name}_{report.report_period}_{report.get_report_type_display()}{file_extension}"
-        
-        # 返回文件
-        response = FileResponse(
-            report.file.open('rb'),
-            as_attachment=True,
-            filename=filename
-        )
+        # 返回文件，下载文件名: "姓名+任务区+时间段+报告类型"
+        response = file_response(request, report.file, report.archive_name())
+
+        # 记录下载日志（条件请求命中 304 和断点续传的后续请求不记录）
+        if is_new_download(request, response):
+            record_download(report, request.user, get_client_ip(request))
         return response
         
     except Exception as e:
@@ -382,43 +542,48 @@ def bulk_download(request):
         # 获取选中的报告ID
         report_ids = request.POST.getlist('report_ids')
         package_name = request.POST.get('package_name', f'报告下载_{timezone.now().strftime("%Y%m%d_%H%M%S")}')
+        # stream: 边打包边下载；package: 生成下载包保存在服务器上
+        mode = request.POST.get('mode', 'stream')
         
         if not report_ids:
             messages.error(request, '请选择要下载的报告')
             return redirect('reports:manage_reports')
         
         try:
-            # 获取报告列表
-            reports = Report.objects.filter(id__in=report_ids)
-            
-            # 检查权限
-            for report in reports:
-                if not can_download_report(request.user, report):
-                    messages.error(request, f'您没有权限下载 {report.get_display_name()}')
-                    return redirect('reports:manage_reports')
-            
-            # 创建批量下载包
-            bulk_package = BulkDownloadPackage.objects.create(
-                creator=request.user,
-                package_name=package_name,
-                total_reports=reports.count()
+            # 获取报告列表并批量检查权限
+            reports, denied_ids = filter_downloadable(
+                request.user, Report.objects.filter(id__in=report_ids)
             )
+            if denied_ids:
+                messages.error(request, f'您没有权限下载所选报告中的 {len(denied_ids)} 份')
+                return redirect('reports:manage_reports')
+            
+            # 流式下载在响应头发出后无法再提示错误，打包前检查文件是否存在
+            selected = list(reports.select_related('uploader', 'task_area').order_by('-upload_date'))
+            missing = missing_reports(selected)
+            if missing:
+                names = '、'.join(report.get_display_name() for report in missing[:3])
+                messages.error(request, f'{len(missing)} 份报告的文件不存在：{names}')
+                return redirect('reports:manage_reports')
             
-            # 添加报告到包中
-            for report in reports:
-                PackageReport.objects.create(
-                    package=bulk_package,
-                    report=report
+            if mode == 'stream':
+                # 直接以流的方式返回 ZIP，不在服务器上生成文件
+                response = StreamingHttpResponse(
+                    iter_zip(report_entries(selected)),
+                    content_type='application/zip'
                 )
+                response['Content-Disposition'] = content_disposition_header(True, f'{package_name}.zip')
+                return response
             
-            # 异步生成ZIP文件（在实际应用中应该使用Celery）
-            # 这里简化处理，立即生成
-            if bulk_package.generate_zip():
-                messages.success(request, f'下载包 "{package_name}" 已生成完成')
+            # 创建下载包，由后台工作进程生成；所选报告未变化时复用已生成的下载包
+            bulk_package = request_bulk_package(request.user, reports, package_name)
+            if bulk_package.status == BulkDownloadPackage.PackageStatus.PENDING and not BULK_PACKAGES_ASYNC:
+                run_package_job(bulk_package.pk)
+                bulk_package.refresh_from_db()
+            
+            if bulk_package.zip_available:
                 return redirect('reports:download_package', package_id=bulk_package.id)
-            else:
-                messages.error(request, '下载包生成失败，请重试')
-                return redirect('reports:manage_reports')
+            return redirect('reports:package_status', package_id=bulk_package.id)
                 
         except Exception as e:
             logger.error(f"批量下载失败: {e}")
@@ -427,13 +592,7 @@ def bulk_download(request):
     
     # GET请求，显示批量下载页面
     # 获取可选的报告列表
-    if request.user.role == User.Role.TASK_AREA_MANAGER:
-        reports = Report.objects.filter(task_area=request.user.task_area_fk)
-    elif request.user.role == User.Role.HEAD_MANAGER:
-        managed_areas = request.user.managed_task_areas.all()
-        reports = Report.objects.filter(task_area__in=managed_areas)
-    else:
-        reports = Report.objects.all()
+    reports = Report.objects.visible_to(request.user, include_own=False)
     
     context = {
         'reports': reports.order_by('-upload_date')[:100],  # 限制显示数量
@@ -449,21 +608,16 @@ def download_package(request, package_id):
     package = get_object_or_404(BulkDownloadPackage, id=package_id)
     
     # 权限检查
-    if request.user != package.creator and request.user.role != User.Role.SUPERUSER:
+    if not can_access_package(request.user, package):
         messages.error(request, '您没有权限下载此包')
         return redirect('reports:my_reports')
     
-    if package.status != BulkDownloadPackage.PackageStatus.COMPLETED:
+    if not package.zip_available:
         messages.error(request, '下载包还未生成完成')
-        return redirect('reports:my_reports')
+        return redirect('reports:package_status', package_id=package.id)
     
     try:
-        response = FileResponse(
-            package.zip_file.open('rb'),
-            as_attachment=True,
-            filename=os.path.basename(package.zip_file.name)
-        )
-        return response
+        return file_response(request, package.zip_file, f"{package.package_name}.zip")
         
     except Exception as e:
         logger.error(f"下载包失败: {e}")
@@ -471,49 +625,151 @@ def download_package(request, package_id):
         return redirect('reports:my_reports')
 
 
+@login_required
+def package_status(request, package_id):
+    """
+    下载包生成进度（页面或 JSON）
+    """
+    package = get_object_or_404(BulkDownloadPackage, id=package_id)
+    if not can_access_package(request.user, package):
+        messages.error(request, '您没有权限查看此下载包')
+        return redirect('reports:my_reports')
+    
+    download_url = reverse('reports:download_package', args=[package.pk]) if package.zip_available else None
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'status': package.status,
+            'status_display': package.get_status_display(),
+            'total_reports': package.total_reports,
+            'finished': package.is_finished,
+            'download_url': download_url,
+            'error': package.error,
+        })
+    
+    context = {
+        'package': package,
+        'download_url': download_url,
+    }
+    return render(request, 'reports/package_status.html', context)
+
+
+@login_required
+@role_required([User.Role.TASK_AREA_MANAGER, User.Role.HEAD_MANAGER, User.Role.SUPERUSER])
+def compliance_matrix(request):
+    """
+    报告提交情况矩阵：权限范围内的用户 × 最近若干个周期
+    参数：report_type（weekly/monthly）、periods（周期数，最多52）、until（截至日期）、task_area；
+    format=json 返回 JSON
+    """
+    report_type = request.GET.get('report_type') or Report.ReportType.WEEKLY
+    if report_type not in PERIODIC_TYPES:
+        report_type = Report.ReportType.WEEKLY
+    try:
+        count = min(max(int(request.GET.get('periods', 12)), 1), MAX_COMPLIANCE_PERIODS)
+    except ValueError:
+        count = 12
+    try:
+        until = date.fromisoformat(request.GET['until']) if request.GET.get('until') else None
+    except ValueError:
+        until = None
+    try:
+        task_area_id = int(request.GET.get('task_area') or 0)
+    except ValueError:
+        task_area_id = 0
+    
+    scope = get_compliance_scope(request.user, task_area_id)
+    matrix = compliance_matrix_data(scope, report_type, count, until)
+    
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'success': True,
+            'report_type': report_type,
+            'statuses': STATUS_LABELS,
+            'periods': [
+                {'period': p['period'], 'start': p['start'].isoformat(), 'end': p['end'].isoformat()}
+                for p in matrix['periods']
+            ],
+            'rows': matrix['rows'],
+            'totals': matrix['totals'],
+        })
+    
+    # 用户多时分页显示
+    paginator = Paginator(matrix['rows'], 100)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    if request.user.role == User.Role.HEAD_MANAGER:
+        task_areas = request.user.managed_task_areas.all()
+    elif request.user.role == User.Role.SUPERUSER:
+        task_areas = TaskArea.objects.all()
+    else:
+        task_areas = [request.user.task_area_fk] if request.user.task_area_fk else []
+    
+    context = {
+        'matrix': matrix,
+        'rows': page_obj,
+        'report_type': report_type,
+        'report_types': [(value, label) for value, label in Report.ReportType.choices if value in PERIODIC_TYPES],
+        'period_count': count,
+        'until': until,
+        'task_areas': task_areas,
+        'selected_task_area': task_area_id,
+        'statuses': STATUS_LABELS,
+    }
+    return render(request, 'reports/compliance_matrix.html', context)
+
+
 @login_required
 @role_required([User.Role.SUPERUSER])
 def cleanup_old_reports(request):
     """
-    清理6个月前的报告（仅超级管理员）
+    清理超过保留期的报告（仅超级管理员）
+    提交后创建清理任务，由 purge_old_reports 命令在后台分批执行（REPORT_PURGE_ASYNC），
+    否则在请求内分批执行，每次最多 REQUEST_TIME_LIMIT 秒，未完成的任务再次提交时继续，见 reports.retention
     """
     if request.method == 'POST':
+        dry_run = request.POST.get('action') == 'dry_run'
         try:
-            # 计算6个月前的日期
-            cutoff_date = timezone.now() - timezone.timedelta(days=180)
-            
-            # 查找要删除的报告
-            old_reports = Report.objects.filter(upload_date__lt=cutoff_date)
-            count = old_reports.count()
-            
-            if count == 0:
-                messages.info(request, '没有找到需要清理的报告')
-                return redirect('reports:manage_reports')
-            
-            # 删除文件
-            for report in old_reports:
-                if report.file:
-                    if os.path.exists(report.file.path):
-                        os.remove(report.file.path)
-            
-            # 删除数据库记录
-            old_reports.delete()
-            
-            messages.success(request, f'成功清理了 {count} 份报告')
-            return redirect('reports:manage_reports')
-            
+            purge = request_purge(request.user, default_cutoff(), dry_run=dry_run)
         except Exception as e:
-            logger.error(f"清理报告失败: {e}")
-            messages.error(request, '清理报告失败，请重试')
-            return redirect('reports:manage_reports')
+            logger.error(f"提交清理任务失败: {e}")
+            messages.error(request, '提交清理任务失败，请重试')
+            return redirect('reports:cleanup_old_reports')
+        
+        # 没有后台执行时在请求内执行（包括继续未完成、失败或已中断的任务）
+        if not REPORT_PURGE_ASYNC and claim_purge(purge):
+            try:
+                run_purge(purge, time_limit=REQUEST_TIME_LIMIT)
+            except Exception:
+                messages.error(request, '清理失败，请稍后重新提交（将从已完成的进度继续）')
+                return redirect('reports:cleanup_old_reports')
+            if purge.status == RetentionPurge.Status.PENDING:
+                messages.info(
+                    request, f'已处理 {purge.deleted_reports} 份报告，尚未完成，请点击"继续"从当前进度继续执行'
+                )
+            elif dry_run:
+                messages.success(request, '试运行完成，各任务区可回收的空间显示在下方')
+            else:
+                messages.success(
+                    request, f'已删除 {purge.deleted_reports} 份报告，释放 {filesizeformat(purge.reclaimed_bytes)}'
+                )
+        elif purge.status == RetentionPurge.Status.RUNNING:
+            messages.info(request, '已有清理任务正在执行，请等待完成')
+        elif dry_run:
+            messages.success(request, '试运行任务已提交，完成后将在下方显示各任务区可回收的空间')
+        else:
+            messages.success(request, '清理任务已提交，将在后台分批删除')
+        return redirect('reports:cleanup_old_reports')
     
     # GET请求显示确认页面
-    cutoff_date = timezone.now() - timezone.timedelta(days=180)
+    cutoff_date = default_cutoff()
     old_count = Report.objects.filter(upload_date__lt=cutoff_date).count()
     
     context = {
         'old_count': old_count,
         'cutoff_date': cutoff_date,
+        'retention_days': RETENTION_DAYS,
+        'purges': RetentionPurge.objects.select_related('requested_by')[:10],
+        'purge_async': REPORT_PURGE_ASYNC,
     }
     return render(request, 'reports/cleanup_confirm.html', context)
 
@@ -522,15 +778,9 @@ def cleanup_old_reports(request):
 
 def can_view_report(user, report):
     """检查用户是否可以查看报告"""
-    if user == report.uploader:
-        return True
-    if user.role == User.Role.SUPERUSER:
+    if user.id == report.uploader_id:
         return True
-    if user.role == User.Role.TASK_AREA_MANAGER:
-        return report.task_area == user.task_area_fk
-    if user.role == User.Role.HEAD_MANAGER:
-        return report.task_area in user.managed_task_areas.all()
-    return False
+    return can_approve_report(user, report)
 
 
 def can_download_report(user, report):
@@ -542,13 +792,67 @@ def can_approve_report(user, report):
     """检查用户是否可以审批报告"""
     if user.role == User.Role.SUPERUSER:
         return True
-    if user.role == User.Role.TASK_AREA_MANAGER:
-        return report.task_area == user.task_area_fk
-    if user.role == User.Role.HEAD_MANAGER:
-        return report.task_area in user.managed_task_areas.all()
+    if user.role in (User.Role.TASK_AREA_MANAGER, User.Role.HEAD_MANAGER):
+        return get_scope_resolver(user).can_access_task_area(report.task_area_id)
     return False
 
 
+def check_report_upload(user, report_type, report_period):
+    """检查能否上传报告，返回 (任务区, 错误信息)"""
+    # 根据当前用户自动分配任务区
+    task_area = user.task_area_fk
+    if not task_area:
+        return None, '用户未设置任务区，请联系管理员'
+    
+    # 检查是否已存在相同报告
+    if Report.objects.filter(
+        uploader=user,
+        report_type=report_type,
+        report_period=report_period,
+        task_area=task_area
+    ).exists():
+        return task_area, f'您已经上传过 {report_type} 的 {report_period} 报告'
+    return task_area, None
+
+
+def pagination_query(request):
+    """当前的筛选条件（不含页码），分页链接中保留"""
+    params = request.GET.copy()
+    params.pop('page', None)
+    return params.urlencode()
+
+
+def filter_by_period(reports, period_from, period_to):
+    """
+    按报告周期筛选：报告周期与 period_from 的开始到 period_to 的结束之间的范围有重叠
+    （周期开始日期不晚于范围结束，周期结束日期不早于范围开始；period_start 使用索引范围扫描）
+    """
+    start = parse_period_bound(period_from)
+    if start:
+        reports = reports.filter(period_end__gte=start[0])
+    end = parse_period_bound(period_to)
+    if end:
+        reports = reports.filter(period_start__lte=end[1])
+    return reports
+
+
+def report_permission_q(user, include_own=True):
+    """报告访问权限的查询条件（与 can_view_report / can_approve_report 规则一致）"""
+    return get_scope_resolver(user).filter_q(
+        'task_area_id', owner_field='uploader_id' if include_own else None
+    )
+
+
+def filter_downloadable(user, queryset):
+    """批量检查下载权限，返回 (可下载的查询集, 无权限的报告ID集合)"""
+    return split_by_permission(queryset, report_permission_q(user))
+
+
+def filter_approvable(user, queryset):
+    """批量检查审批权限，返回 (可审批的查询集, 无权限的报告ID集合)，供批量审批使用"""
+    return split_by_permission(queryset, report_permission_q(user, include_own=False))
+
+
 def get_client_ip(request):
     """获取客户端IP地址"""
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -1,3 +1,23 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.models import TaskArea, User
+
+
+class UserListPaginationTests(TestCase):
+
+    def test_filters_are_urlencoded_in_page_links(self):
+        area = TaskArea.objects.create(name='一区&二区')
+        admin = User.objects.create_user(username='admin', role=User.Role.SUPERUSER)
+        for index in range(21):
+            User.objects.create_user(username=f'a&b#{index}', task_area_fk=area)
+        self.client.force_login(admin)
+
+        response = self.client.get(reverse('usermanagement:user_list'), {'q': 'a&b#', 'company': '一区&'})
+        self.assertEqual(len(response.context['page_obj']), 20)
+        self.assertContains(response, '?cursor=last&q=a%26b%23&company=%E4%B8%80%E5%8C%BA%26')
+
+        next_page = self.client.get(reverse('usermanagement:user_list'), {
+            'cursor': response.context['page_obj'].next_cursor, 'q': 'a&b#', 'company': '一区&',
+        })
+        self.assertEqual(len(next_page.context['page_obj']), 1)
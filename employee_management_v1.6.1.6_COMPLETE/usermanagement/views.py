@@ -4,11 +4,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.contrib.auth.hashers import make_password
 from django.http import JsonResponse
 from accounts.models import User, TaskArea
+from accounts.pagination import KeysetPaginator
 from .forms import UserCreateForm, UserEditForm
 
 
@@ -71,8 +71,6 @@ def user_list(request):
     else:
         users = User.objects.none()
     
-    users = users.order_by('-created_at')
-    
     # 搜索功能
     query = request.GET.get('q', '')
     role_filter = request.GET.get('role', '')
@@ -92,10 +90,12 @@ def user_list(request):
     if company_filter:
         users = users.filter(task_area_fk__name__icontains=company_filter)
     
-    # 分页
-    paginator = Paginator(users, 20)  # 每页20个用户
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 键集分页（按创建时间倒序，ID 保证排序键唯一），每页20个用户
+    total_users = users.count()
+    paginator = KeysetPaginator(
+        users.select_related('task_area_fk'), ['-created_at', '-id'], per_page=20
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     # 获取所有公司名称用于筛选
     task_areas = User.objects.exclude(
@@ -109,7 +109,7 @@ def user_list(request):
         'company_filter': company_filter,
         'role_choices': User.Role.choices,
         'task_areas': task_areas,
-        'total_users': users.count()
+        'total_users': total_users
     }
     
     return render(request, 'usermanagement/user_list.html', context)